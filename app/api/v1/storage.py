@@ -1,10 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from starlette.requests import ClientDisconnect
 from app.core.security import get_current_user_id
-from app.core.storage import storage_service
+from app.core.storage import storage_service, async_storage_service
+from app.core.config import settings
 from app.schemas.responses import UnifiedResponse
+from app.schemas.storage import (
+    MultipartComplete,
+    MultipartPartUrlsOut,
+    MultipartPartUrlsRequest,
+    MultipartStart,
+    MultipartStartOut,
+    MultipartUploadedPart,
+)
 
 router = APIRouter()
 
+def _user_upload_key(user_id: str, object_name: str) -> str:
+    """
+    Uploads may only write under the caller's own prefix; a ".." path
+    segment could otherwise escape it (the local backend only confines keys
+    to its root). Dots inside a name, as in "clip..final.mp4", are fine.
+    """
+    if not object_name.startswith(f"users/{user_id}/uploads/") or ".." in object_name.split("/"):
+        raise HTTPException(status_code=403, detail="Not allowed to access this object")
+    return object_name
+
 @router.get("/upload-url")
 async def get_upload_url(
     filename: str,
@@ -14,10 +37,9 @@ async def get_upload_url(
     """
     Get a presigned URL to upload a file directly to Backblaze B2
     """
+    # Create a unique path for the user's file
+    object_name = _user_upload_key(current_user_id, f"users/{current_user_id}/uploads/{filename}")
     try:
-        # Create a unique path for the user's file
-        object_name = f"users/{current_user_id}/uploads/{filename}"
-        
         result = storage_service.generate_upload_url(
             object_name=object_name,
             content_type=content_type
@@ -43,9 +65,9 @@ async def upload_file(
     """
     Proxy upload to B2 to avoid CORS issues
     """
+    object_name = _user_upload_key(current_user_id, f"users/{current_user_id}/uploads/{file.filename}")
     try:
-        object_name = f"users/{current_user_id}/uploads/{file.filename}"
-        file_url = storage_service.upload_file(
+        file_url = await async_storage_service.upload_file(
             file.file,
             object_name=object_name,
             content_type=file.content_type
@@ -61,3 +83,181 @@ async def upload_file(
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/upload/stream")
+async def stream_upload_file(
+    request: Request,
+    filename: str,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Streaming proxy upload. The raw request body (not a multipart form) is
+    piped into a B2 multipart upload as it arrives, so memory per request is
+    capped by STORAGE_STREAM_MAX_MEMORY whatever the file size.
+    """
+    object_name = _user_upload_key(current_user_id, f"users/{current_user_id}/uploads/{filename}")
+    content_type = request.headers.get("content-type", "application/octet-stream")
+    try:
+        async with async_storage_service.open_multipart_writer(object_name, content_type) as writer:
+            async for chunk in request.stream():
+                await writer.write(chunk)
+            file_url = await writer.complete()
+    except ClientDisconnect:
+        # The writer has already aborted the multipart upload
+        logger.info(f"Client disconnected during streaming upload of {object_name}")
+        raise HTTPException(status_code=400, detail="Client disconnected")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return UnifiedResponse(
+        status="success",
+        message="File uploaded successfully",
+        data={
+            "file_url": file_url,
+            "object_name": object_name,
+            "size": writer.bytes_written
+        }
+    )
+
+@router.post("/multipart", response_model=UnifiedResponse[MultipartStartOut])
+async def start_multipart_upload(
+    data: MultipartStart,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Start a multipart upload that the browser sends straight to B2.
+    Flow: start -> request part URLs in batches -> PUT parts in parallel
+    (keeping each part's ETag) -> complete. GET /multipart/parts tells a
+    resuming client which parts B2 already has.
+    """
+    object_name = _user_upload_key(current_user_id, f"users/{current_user_id}/uploads/{data.filename}")
+    try:
+        upload_id = await async_storage_service.create_multipart_upload(object_name, data.content_type)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return UnifiedResponse(data=MultipartStartOut(
+        upload_id=upload_id,
+        object_name=object_name,
+        file_url=storage_service.file_url(object_name),
+        part_size=settings.STORAGE_DIRECT_PART_SIZE,
+    ))
+
+@router.post("/multipart/parts", response_model=UnifiedResponse[MultipartPartUrlsOut])
+async def get_multipart_part_urls(
+    data: MultipartPartUrlsRequest,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Presigned PUT URLs for a batch of part numbers (1-10000).
+    """
+    object_name = _user_upload_key(current_user_id, data.object_name)
+    if any(n < 1 or n > 10000 for n in data.part_numbers):
+        raise HTTPException(status_code=422, detail="Part numbers must be between 1 and 10000")
+    try:
+        urls = storage_service.generate_upload_part_urls(object_name, data.upload_id, data.part_numbers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return UnifiedResponse(data=MultipartPartUrlsOut(urls=urls))
+
+@router.get("/multipart/parts", response_model=UnifiedResponse[List[MultipartUploadedPart]])
+async def list_multipart_parts(
+    object_name: str,
+    upload_id: str,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Parts already stored, so an interrupted client only re-sends the rest.
+    """
+    object_name = _user_upload_key(current_user_id, object_name)
+    try:
+        parts = await async_storage_service.list_parts(object_name, upload_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return UnifiedResponse(data=parts)
+
+@router.post("/multipart/complete")
+async def complete_multipart_upload(
+    data: MultipartComplete,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    object_name = _user_upload_key(current_user_id, data.object_name)
+    parts = [
+        {"PartNumber": part.part_number, "ETag": part.etag}
+        for part in sorted(data.parts, key=lambda p: p.part_number)
+    ]
+    try:
+        file_url = await async_storage_service.complete_multipart_upload(object_name, data.upload_id, parts)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return UnifiedResponse(
+        status="success",
+        message="File uploaded successfully",
+        data={
+            "file_url": file_url,
+            "object_name": object_name
+        }
+    )
+
+@router.delete("/multipart")
+async def abort_multipart_upload(
+    object_name: str,
+    upload_id: str,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    object_name = _user_upload_key(current_user_id, object_name)
+    try:
+        await async_storage_service.abort_multipart_upload(object_name, upload_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return UnifiedResponse(data={"aborted": True})
+
+def _local_signer():
+    signer = getattr(storage_service.backend, "signer", None)
+    if signer is None:
+        # Only the local and memory backends serve objects through the API
+        raise HTTPException(status_code=404, detail="Not found")
+    return signer
+
+@router.get("/local/{object_name:path}")
+async def get_local_object(object_name: str, request: Request):
+    """
+    Presigned GET for the local/memory storage backends.
+    """
+    if not _local_signer().verify("GET", object_name, dict(request.query_params)):
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+    try:
+        chunks = await async_storage_service.run(storage_service.open_stream, object_name)
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=404, detail="Not found")
+    # Starlette iterates sync iterators on its thread pool
+    return StreamingResponse(chunks, media_type=storage_service.backend.content_type(object_name))
+
+@router.put("/local/{object_name:path}")
+async def put_local_object(object_name: str, request: Request):
+    """
+    Presigned PUT (whole object or one multipart part) for the local/memory
+    storage backends; mirrors the S3 responses browsers rely on (ETag header).
+    """
+    params = dict(request.query_params)
+    if not _local_signer().verify("PUT", object_name, params):
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+    try:
+        if "uploadId" in params:
+            body = await request.body()
+            etag = await async_storage_service.upload_part(
+                object_name, params["uploadId"], int(params["partNumber"]), body
+            )
+            return Response(status_code=200, headers={"ETag": etag})
+
+        content_type = request.headers.get("content-type", "application/octet-stream")
+        async with async_storage_service.open_multipart_writer(object_name, content_type) as writer:
+            async for chunk in request.stream():
+                await writer.write(chunk)
+            await writer.complete()
+    except ClientDisconnect:
+        raise HTTPException(status_code=400, detail="Client disconnected")
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(status_code=200)
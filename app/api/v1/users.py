@@ -1,29 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+import time
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Any, Optional
 
+from app.core.config import settings
+from app.core.etag import etag_matches, make_etag
 from app.db.session import get_db
 from app.core.security import get_current_user_id
 from app.schemas.identity import UserOut, UserProfileUpdate
-from app.schemas.responses import UnifiedResponse
+from app.schemas.responses import UnifiedResponse, unified_json
+from app.domains.identity.cache import profile_cache
 from app.domains.identity.service import user_service
+from app.domains.vibes.events import video_event_hub
 
 router = APIRouter()
 
 @router.get("/me", response_model=UnifiedResponse[UserOut])
 async def get_my_profile(
-    response: Response,
+    videos: int = Query(settings.PROFILE_RECENT_VIDEOS, ge=0, le=settings.VIDEO_PAGE_SIZE_MAX),
+    wait: float = Query(0, ge=0, le=settings.LONG_POLL_MAX_WAIT),
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_current_user_id)
 ) -> Any:
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
-    user = await user_service.get_user_with_profile(db, user_id=user_id)
-    if not user:
-        # If user doesn't exist in our DB yet but exists in Supabase, create it
-        user = await user_service.sync_user_from_supabase(db, user_id=user_id)
-    return UnifiedResponse(data=user)
+    """
+    Profile plus the `videos` most recent videos (0 for profile only).
+    Older videos are listed with GET /vibes. Served from the profile cache;
+    304 if If-None-Match matches, and with ?wait=N such a request is held
+    up to N seconds for the profile to change.
+    """
+    async def load() -> Optional[str]:
+        user = await user_service.get_user_with_profile(db, user_id=user_id, videos_limit=videos)
+        if not user or not user.profile:
+            # If user doesn't exist in our DB yet but exists in Supabase, create it
+            user = await user_service.provision_user(db, user_id=user_id, videos_limit=videos)
+        return UserOut.model_validate(user, from_attributes=True).model_dump_json() if user else None
+
+    async with video_event_hub.watch(f"user:{user_id}", user_id, enabled=bool(wait and if_none_match)) as changes:
+        payload = await profile_cache.get_or_load(user_id, videos, load)
+        deadline = time.monotonic() + wait
+        while changes is not None and etag_matches(if_none_match, make_etag(payload)):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Hand the connection back to the pool while waiting
+            await db.commit()
+            if not await video_event_hub.wait(changes, remaining):
+                break
+            db.expunge_all()
+            payload = await profile_cache.get_or_load(user_id, videos, load)
+
+    etag = make_etag(payload)
+    # Clients may keep the payload but must revalidate it on every use
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=unified_json(payload or "null"),
+        media_type="application/json",
+        headers=headers,
+    )
 
 @router.post("/sync", response_model=UnifiedResponse[UserOut])
 async def sync_profile(
@@ -31,5 +67,7 @@ async def sync_profile(
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_current_user_id)
 ) -> Any:
-    user = await user_service.sync_user_from_supabase(db, user_id=user_id, referred_by_code=referral_code)
+    user = await user_service.sync_user_from_supabase(
+        db, user_id=user_id, referred_by_code=referral_code, videos_limit=settings.PROFILE_RECENT_VIDEOS
+    )
     return UnifiedResponse(data=user)
@@ -1,13 +1,24 @@
-from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import time
+from typing import List, Any, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, BackgroundTasks, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
-from app.db.session import get_db
-from app.core.security import get_current_user_id
-from app.schemas.vibes import VideoCreate, VideoOut, WebhookData
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, get_db
+from app.core.etag import etag_matches
+from app.core.security import (
+    get_current_user_id,
+    get_stream_user_id,
+    issue_stream_ticket,
+    optional_oauth2,
+    verify_webhook_token,
+)
+from app.schemas.vibes import StreamTicket, VideoCreate, VideoOut, VideoPage, WebhookData
 from app.schemas.responses import UnifiedResponse
-from app.domains.vibes.service import vibe_service
+from app.domains.vibes.events import parse_event_id, video_event_hub
+from app.domains.vibes.service import VIDEO_STATUSES, vibe_service, video_etag
 
 router = APIRouter()
 
@@ -24,26 +35,121 @@ async def initiate_vibe_generation(
     video = await vibe_service.initiate_generation(db, user_id=user_id, vibe_in=vibe_in)
     return UnifiedResponse(data=video)
 
+@router.get("", response_model=UnifiedResponse[VideoPage])
+async def list_vibes(
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.VIDEO_PAGE_SIZE, ge=1, le=settings.VIDEO_PAGE_SIZE_MAX),
+    status: Optional[List[str]] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_current_user_id)
+) -> Any:
+    """
+    The caller's videos, newest first. Pass next_cursor back as cursor for
+    the following page; repeat status to filter on several statuses.
+    """
+    if status and any(s not in VIDEO_STATUSES for s in status):
+        raise HTTPException(status_code=422, detail=f"status must be one of {', '.join(VIDEO_STATUSES)}")
+    videos, next_cursor = await vibe_service.list_videos(
+        db, user_id=user_id, limit=limit, cursor=cursor, statuses=status
+    )
+    return UnifiedResponse(data=VideoPage(items=videos, next_cursor=next_cursor))
+
 @router.get("/{video_id}", response_model=UnifiedResponse[VideoOut])
 async def get_vibe_status(
     video_id: UUID,
+    response: Response,
+    wait: float = Query(0, ge=0, le=settings.LONG_POLL_MAX_WAIT),
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_current_user_id)
 ) -> Any:
-    video = await vibe_service.get_video(db, video_id=video_id, user_id=user_id)
+    """
+    A video's current state; 304 if If-None-Match still matches its ETag.
+    With ?wait=N such a request is held up to N seconds for a change.
+    """
+    async with video_event_hub.watch(str(video_id), user_id, enabled=bool(wait and if_none_match)) as changes:
+        video = await vibe_service.get_video(db, video_id=video_id, user_id=user_id)
+        deadline = time.monotonic() + wait
+        while video and changes is not None and etag_matches(if_none_match, video_etag(video)):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Hand the connection back to the pool while waiting
+            await db.commit()
+            if not await video_event_hub.wait(changes, remaining):
+                break
+            db.expunge_all()
+            video = await vibe_service.get_video(db, video_id=video_id, user_id=user_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
+
+    etag = video_etag(video)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     return UnifiedResponse(data=video)
 
+@router.post("/{video_id}/events/ticket", response_model=UnifiedResponse[StreamTicket])
+async def vibe_events_ticket(
+    video_id: UUID,
+    user_id: str = Depends(get_current_user_id),
+) -> Any:
+    """
+    Ticket for opening GET /{video_id}/events from an EventSource, which
+    cannot send the Authorization header. Each ticket opens one stream.
+    """
+    ticket = await issue_stream_ticket(user_id, scope=str(video_id))
+    return UnifiedResponse(data=StreamTicket(ticket=ticket, expires_in=settings.VIDEO_EVENTS_TICKET_TTL))
+
+@router.get("/{video_id}/events")
+async def vibe_events(
+    video_id: UUID,
+    ticket: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+    last_event_id_query: Optional[str] = Query(None, alias="last_event_id"),
+    token: Optional[str] = Depends(optional_oauth2),
+) -> Any:
+    """
+    Server-sent events for one video: its current state, then each status
+    change until it is ready, failed or deleted. Reconnecting with
+    Last-Event-ID replays what was missed.
+
+    Authenticate with the Authorization header or ?ticket= from
+    POST /{video_id}/events/ticket. Tickets are single-use, so an
+    EventSource reconnects by fetching a new ticket and passing the last
+    id it saw as ?last_event_id=.
+    """
+    user_id = await get_stream_user_id(str(video_id), token, ticket)
+    last_event_id = last_event_id or last_event_id_query
+    video_event_hub.check_capacity(user_id)
+    resumed = parse_event_id(last_event_id) is not None
+    since = last_event_id if resumed else await video_event_hub.latest_id(str(video_id))
+    # Not get_db: its session would stay open for as long as the stream
+    async with AsyncSessionLocal() as db:
+        video = await vibe_service.get_video(db, video_id=video_id, user_id=user_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    return StreamingResponse(
+        video_event_hub.stream(video, user_id, since, resumed),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/webhook", response_model=UnifiedResponse[None])
 async def ai_provider_webhook(
     data: WebhookData,
+    video_id: UUID,
+    token: str,
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """
-    Secure endpoint to receive completion pings from AI providers.
+    Completion pings from fal.ai. The URL, including video_id and its token,
+    is generated by the worker when it submits the job.
     """
-    await vibe_service.process_webhook(db, data=data)
+    if not verify_webhook_token(str(video_id), token):
+        raise HTTPException(status_code=401, detail="Invalid webhook token")
+    await vibe_service.process_webhook(db, video_id=video_id, data=data)
     return UnifiedResponse(data=None)
 
 @router.delete("/{video_id}", response_model=UnifiedResponse[bool])
@@ -53,13 +159,7 @@ async def delete_vibe(
     user_id: str = Depends(get_current_user_id)
 ) -> Any:
     """
-    Delete a video record and its associated storage file.
+    Delete a video; its storage files are removed in the background.
     """
-    from loguru import logger
-    logger.info(f"API: Received delete request for video {video_id}")
     success = await vibe_service.delete_video(db, video_id=video_id, user_id=user_id)
-    
-    # Final safety commit
-    await db.commit()
-    logger.info(f"API: Successfully committed deletion for video {video_id}")
     return UnifiedResponse(data=success)
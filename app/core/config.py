@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
 from pydantic import AnyHttpUrl, PostgresDsn, validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -14,18 +14,98 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str
+    # Celery worker engine (one persistent loop per worker process)
+    WORKER_DB_POOL_SIZE: int = 5
+    WORKER_DB_MAX_OVERFLOW: int = 5
+    # Celery worker: "threads" runs WORKER_CONCURRENCY jobs on the shared loop
+    WORKER_POOL: str = "threads"
+    WORKER_CONCURRENCY: int = 8
+    WORKER_MEMORY_BUDGET: int = 128 * 1024 * 1024  # Ingest buffers across all in-flight jobs
+    WORKER_MAX_DOWNLOADS: int = 4  # Concurrent provider downloads per worker
+    WORKER_DRAIN_TIMEOUT: float = 25.0  # Seconds to finish jobs on shutdown before requeueing them
 
     # Redis (Celery Broker)
     REDIS_URL: str
+    # Task dispatch goes through the outbox table; the relay publishes it
+    OUTBOX_RELAY_IN_API: bool = True  # Run the relay inside each API process
+    OUTBOX_BATCH_SIZE: int = 200
+    OUTBOX_POLL_INTERVAL: float = 1.0  # Fallback when no NOTIFY arrives
+    OUTBOX_DEDUP_TTL: int = 24 * 3600  # How long a published task id is remembered
 
     # Supabase Auth
     SUPABASE_URL: str
     SUPABASE_PUBLISHABLE_KEY: str
     SUPABASE_SECRET_KEY: str
+    # local: verify JWTs in-process against the project's JWKS
+    # remote: call /auth/v1/user for every token
+    SUPABASE_JWT_VERIFICATION: str = "local"
+    SUPABASE_JWT_SECRET: Optional[str] = None  # Only for legacy HS256 projects
+    SUPABASE_JWT_AUDIENCE: str = "authenticated"
+    SUPABASE_JWT_ROLE: str = "authenticated"
+    SUPABASE_JWT_LEEWAY: int = 10  # Seconds of clock skew tolerated on exp/iat
+    SUPABASE_JWKS_CACHE_TTL: int = 600
+    SUPABASE_JWKS_MIN_REFRESH_INTERVAL: int = 30  # Throttle refreshes on unknown kid
+    SUPABASE_JWT_REMOTE_FALLBACK: bool = True  # Use /auth/v1/user when no signing key is available
+
+    # Token verification cache (entries never outlive the token's exp)
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_CACHE_MAX_TTL: int = 300
+    AUTH_CACHE_NEGATIVE_TTL: int = 10  # Failed verifications
+    AUTH_CACHE_REDIS: bool = False  # Share verifications across replicas
+
+    # GET /metrics needs "Authorization: Bearer <METRICS_TOKEN>"; unset, it is disabled
+    METRICS_TOKEN: Optional[str] = None
+    METRICS_DB_TTL: float = 30.0  # Sources that query the database run at most this often
+
+    # /users/me payload cache. Local entries are served for LOCAL_TTL seconds
+    # before being revalidated; with PROFILE_CACHE_REDIS, writes made in other
+    # processes (e.g. the worker) invalidate across replicas
+    PROFILE_CACHE_MAX_ENTRIES: int = 10000
+    PROFILE_CACHE_TTL: int = 300
+    PROFILE_CACHE_LOCAL_TTL: float = 5.0
+    PROFILE_CACHE_REDIS: bool = False
 
     # AI Providers (fal.ai + Kling 2.5 Turbo)
     FAL_KEY: Optional[str] = None
     KLING_MODEL: str = "fal-ai/kling-video/v2.5-turbo/pro/text-to-video"
+    FAL_QUEUE_URL: str = "https://queue.fal.run"
+    # Public base URL of this API (e.g. https://api.vibevids.xyz). When set,
+    # jobs are submitted with a webhook and polling becomes a safety net.
+    PUBLIC_API_URL: Optional[str] = None
+    FAL_WEBHOOK_SECRET: Optional[str] = None  # Signs webhook URLs; defaults to SUPABASE_SECRET_KEY
+
+    # fal.ai job poller (PROCESS_TYPE=poller): per-job backoff between
+    # MIN and MAX interval, global cap of POLLER_MAX_RPS status requests
+    POLLER_SCAN_INTERVAL: float = 5.0  # How often new jobs are picked up
+    POLLER_MIN_INTERVAL: float = 2.0
+    POLLER_MAX_INTERVAL: float = 30.0
+    POLLER_BACKOFF: float = 1.5
+    POLLER_MAX_RPS: float = 20.0
+    POLLER_CONCURRENCY: int = 16
+    POLLER_FLUSH_INTERVAL: float = 1.0
+    POLLER_JOB_TIMEOUT: int = 30 * 60
+    POLLER_SAFETY_NET_INTERVAL: float = 120.0  # Per-job poll interval while webhooks are enabled
+
+    # Stuck-job recovery (app.tasks.recovery, run by celery beat): videos
+    # pending/processing with no update for RECOVERY_STALE_AFTER seconds are
+    # resumed from their fal.ai request id, or dispatched again if they never
+    # got one. Still active RECOVERY_DEADLINE seconds after creation, they fail.
+    RECOVERY_INTERVAL: float = 120.0
+    RECOVERY_STALE_AFTER: int = 600
+    RECOVERY_DEADLINE: int = 3600
+    RECOVERY_BATCH_SIZE: int = 500
+    RECOVERY_CONCURRENCY: int = 8  # fal.ai status checks in parallel
+
+    # Outbound HTTP pools, one per upstream (HTTP/2 needs the httpx[http2] extra)
+    HTTP_SUPABASE_MAX_CONNECTIONS: int = 20
+    HTTP_SUPABASE_TIMEOUT: float = 10.0
+    HTTP_SUPABASE_HTTP2: bool = False
+    HTTP_FAL_MAX_CONNECTIONS: int = 10
+    HTTP_FAL_TIMEOUT: float = 30.0
+    HTTP_FAL_HTTP2: bool = False
+    HTTP_MEDIA_MAX_CONNECTIONS: int = 4
+    HTTP_MEDIA_TIMEOUT: float = 120.0
+    HTTP_MEDIA_HTTP2: bool = False
 
     # Payment (Razorpay Priority)
     RAZORPAY_KEY_ID: Optional[str] = None
@@ -33,16 +113,73 @@ class Settings(BaseSettings):
     STRIPE_API_KEY: Optional[str] = None
     STRIPE_WEBHOOK_SECRET: Optional[str] = None
 
-    # Storage (Backblaze B2 S3-Compatible)
+    # Storage: "b2" (Backblaze B2, S3-compatible), or "local" / "memory" to run
+    # and load-test without network; those serve signed URLs from
+    # /storage/local (STORAGE_PUBLIC_URL overrides the base URL)
+    STORAGE_BACKEND: Literal["b2", "local", "memory"] = "b2"
+    STORAGE_LOCAL_ROOT: str = "./.storage"
+    STORAGE_PUBLIC_URL: Optional[str] = None
+    STORAGE_LOCAL_SIGNING_KEY: Optional[str] = None  # Defaults to SUPABASE_SECRET_KEY
     B2_KEY_ID: Optional[str] = None
     B2_APPLICATION_KEY: Optional[str] = None
     B2_ENDPOINT: Optional[str] = None
     B2_BUCKET_NAME: Optional[str] = None
     B2_REGION_NAME: str = "us-west-004"
+    STORAGE_IO_CONCURRENCY: int = 8  # Threads for B2 calls made from the API
+    # Streaming uploads buffer at most STORAGE_STREAM_MAX_MEMORY per request
+    STORAGE_STREAM_PART_SIZE: int = 8 * 1024 * 1024
+    STORAGE_STREAM_MAX_MEMORY: int = 48 * 1024 * 1024
+    STORAGE_DIRECT_PART_SIZE: int = 16 * 1024 * 1024  # Suggested to browsers uploading parts to B2
+
+    # Storage garbage collection (app.tasks.storage): files of deleted videos
+    # are removed in DeleteObjects batches; failed deletes back off from
+    # STORAGE_GC_RETRY_BASE (doubling) and become dead letters after MAX_ATTEMPTS
+    STORAGE_GC_BATCH_SIZE: int = 1000
+    STORAGE_GC_MAX_ATTEMPTS: int = 8
+    STORAGE_GC_RETRY_BASE: float = 60.0
+    STORAGE_GC_RETRY_MAX: float = 6 * 3600
+    STORAGE_GC_INTERVAL: float = 300.0  # Periodic run (celery beat) that picks up retries
+    STORAGE_GC_PURGE_DELAY: int = 3600  # Soft-deleted rows are purged this long after deletion
+    # Orphan sweep: objects under these prefixes, older than MIN_AGE, that no
+    # video references. User uploads are not tied to videos and are never swept.
+    STORAGE_SWEEP_PREFIXES: List[str] = ["vibe_outputs/"]
+    STORAGE_SWEEP_MIN_AGE: int = 24 * 3600
+    STORAGE_SWEEP_INTERVAL: float = 24 * 3600
+
+    # Worker ingest of provider outputs (download streamed into B2)
+    INGEST_CHUNK_SIZE: int = 256 * 1024
+    INGEST_MAX_MEMORY: int = 24 * 1024 * 1024
+
+    # Presigned download URLs are signed per fixed window so they stay
+    # identical (and cacheable) for the whole window
+    PRESIGN_URL_EXPIRATION: int = 3600
+    PRESIGN_WINDOW: int = 900
+    PRESIGN_CACHE_MAX_ENTRIES: int = 10000
+
+    # Video listings (keyset-paginated GET /vibes and the /users/me preview)
+    VIDEO_PAGE_SIZE: int = 20
+    VIDEO_PAGE_SIZE_MAX: int = 100
+    PROFILE_RECENT_VIDEOS: int = 10  # Default for /users/me?videos=N; 0 = profile only
+
+    # Video status events (GET /vibes/{id}/events, server-sent events)
+    VIDEO_EVENTS_HEARTBEAT: float = 15.0
+    VIDEO_EVENTS_MAX_DURATION: float = 600.0  # Streams then end; clients resume with Last-Event-ID
+    VIDEO_EVENTS_MAX_CONNECTIONS: int = 2000  # Open streams per API process
+    VIDEO_EVENTS_MAX_PER_USER: int = 10
+    VIDEO_EVENTS_HISTORY: int = 32  # Events kept per video for resuming
+    VIDEO_EVENTS_TTL: int = 3600
+    VIDEO_EVENTS_TICKET_TTL: int = 30  # Seconds a single-use stream ticket stays redeemable
+    # Longest ?wait= on GET /vibes/{id} and /users/me (long-poll for a change)
+    LONG_POLL_MAX_WAIT: int = 30
 
     # Viral Referral
     REFERRAL_CODE_LENGTH: int = 7
 
+    # Bulk user backfill from the Supabase admin API (app.tasks.users)
+    BACKFILL_PAGE_SIZE: int = 500
+    BACKFILL_CONCURRENCY: int = 4  # Admin API pages fetched in parallel
+    BACKFILL_RATE_LIMIT_DELAY: int = 60  # Wait before resuming after a 429 without Retry-After
+
     BACKEND_CORS_ORIGINS: List[str] = [
         "http://localhost:5173",
         "http://localhost:3000",
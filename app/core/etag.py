@@ -0,0 +1,25 @@
+import hashlib
+from typing import Any, Optional
+
+from app.core.presign import presigned_url_cache
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Weak ETag over parts and the current presign window, since responses
+    embed download URLs signed for that window.
+    """
+    raw = ":".join(map(str, (*parts, presigned_url_cache.current_window())))
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match comparison (weak, as RFC 9110 requires for GET).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
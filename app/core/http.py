@@ -0,0 +1,193 @@
+import asyncio
+import weakref
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import metrics_registry
+
+
+@dataclass
+class UpstreamConfig:
+    base_url: str = ""
+    max_connections: int = 10
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    timeout: float = 30.0
+    pool_timeout: float = 10.0
+    http2: bool = False
+
+
+class PoolStats:
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self.requests = 0
+        self.in_use = 0
+        self.waits = 0
+        self.errors = 0
+        self.connections_opened = 0
+        self.open_connections = 0
+        self.idle_connections = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "max_connections": self.max_connections,
+            "requests": self.requests,
+            "in_use": self.in_use,
+            "waits": self.waits,
+            "errors": self.errors,
+            "open_connections": self.open_connections,
+            "idle_connections": self.idle_connections,
+            "connections_opened": self.connections_opened,
+            "reuse_ratio": round(1 - self.connections_opened / self.requests, 4) if self.requests else None,
+        }
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """
+    Response stream that reports back when the connection is handed back to the pool.
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, stats: PoolStats):
+        self._stream = stream
+        self._stats = stats
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._stats.in_use -= 1
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """
+    AsyncHTTPTransport that counts requests, pool waits and new connections.
+    """
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+        self._seen_connections: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self.stats
+        stats.requests += 1
+        if stats.in_use >= stats.max_connections:
+            stats.waits += 1
+        stats.in_use += 1
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            stats.in_use -= 1
+            stats.errors += 1
+            raise
+        self._track_connections()
+        response.stream = _ReleasingStream(response.stream, stats)
+        return response
+
+    def _track_connections(self) -> None:
+        connections = list(getattr(self._pool, "connections", []))
+        for connection in connections:
+            if connection not in self._seen_connections:
+                self._seen_connections.add(connection)
+                self.stats.connections_opened += 1
+        self.stats.open_connections = len(connections)
+        self.stats.idle_connections = sum(1 for c in connections if c.is_idle())
+
+
+class HTTPClientRegistry:
+    """
+    One pooled httpx.AsyncClient per upstream, shared by the whole process.
+
+    Clients are created lazily on the running event loop. Connections are
+    bound to that loop, so if a different loop asks for a client (the worker
+    runtime, a CLI using asyncio.run) the registry starts a fresh set for it.
+    """
+
+    def __init__(self, upstreams: Dict[str, UpstreamConfig]):
+        self.upstreams = upstreams
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, PoolStats] = {
+            name: PoolStats(config.max_connections) for name, config in upstreams.items()
+        }
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._clients = {}
+            self._loop = loop
+
+        client = self._clients.get(name)
+        if client is None:
+            client = self._build(name)
+            self._clients[name] = client
+        return client
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        config = self.upstreams[name]
+        limits = httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        )
+        transport = InstrumentedTransport(
+            self._stats[name],
+            limits=limits,
+            http2=config.http2,
+        )
+        return httpx.AsyncClient(
+            base_url=config.base_url,
+            transport=transport,
+            timeout=httpx.Timeout(
+                config.timeout,
+                connect=config.connect_timeout,
+                pool=config.pool_timeout,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        if self._loop is not None and self._loop is asyncio.get_running_loop():
+            for client in clients.values():
+                await client.aclose()
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+
+http_clients = HTTPClientRegistry({
+    "supabase": UpstreamConfig(
+        base_url=settings.SUPABASE_URL,
+        max_connections=settings.HTTP_SUPABASE_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_SUPABASE_MAX_CONNECTIONS,
+        timeout=settings.HTTP_SUPABASE_TIMEOUT,
+        http2=settings.HTTP_SUPABASE_HTTP2,
+    ),
+    "fal": UpstreamConfig(
+        base_url=settings.FAL_QUEUE_URL,
+        max_connections=settings.HTTP_FAL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_FAL_MAX_CONNECTIONS,
+        timeout=settings.HTTP_FAL_TIMEOUT,
+        http2=settings.HTTP_FAL_HTTP2,
+    ),
+    # Provider outputs and other large downloads from arbitrary hosts
+    "media": UpstreamConfig(
+        max_connections=settings.HTTP_MEDIA_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MEDIA_MAX_CONNECTIONS,
+        timeout=settings.HTTP_MEDIA_TIMEOUT,
+        http2=settings.HTTP_MEDIA_HTTP2,
+    ),
+})
+metrics_registry.register("http_pools", http_clients.stats)
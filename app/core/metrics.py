@@ -0,0 +1,59 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from loguru import logger
+
+
+class MetricsRegistry:
+    """
+    Named sources of runtime stats (cache hit ratios, pool usage, ...).
+    A source is a callable returning a JSON-serializable dict, sync or async.
+    Expensive sources (e.g. database queries) are registered with a ttl:
+    their last value is served for ttl seconds, so scrape frequency does
+    not drive query load.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Any]] = {}
+        self._ttls: Dict[str, float] = {}
+        self._cached: Dict[str, Tuple[float, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def register(self, name: str, source: Callable[[], Any], ttl: float = 0) -> None:
+        self._sources[name] = source
+        self._ttls[name] = ttl
+
+    async def snapshot(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        for name, source in self._sources.items():
+            if self._ttls[name]:
+                data[name] = await self._cached_value(name, source)
+            else:
+                data[name] = await self._value(name, source)
+        return data
+
+    async def _cached_value(self, name: str, source: Callable[[], Any]) -> Any:
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        # Concurrent scrapes wait for one refresh instead of each running it
+        async with lock:
+            cached = self._cached.get(name)
+            if cached is not None and cached[0] > time.monotonic():
+                return cached[1]
+            value = await self._value(name, source)
+            self._cached[name] = (time.monotonic() + self._ttls[name], value)
+            return value
+
+    async def _value(self, name: str, source: Callable[[], Any]) -> Any:
+        try:
+            value = source()
+            if inspect.isawaitable(value):
+                value = await value
+        except Exception as e:
+            logger.error(f"Metrics source {name} failed: {e}")
+            value = {"error": str(e)}
+        return value
+
+
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,97 @@
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.core.metrics import metrics_registry
+from app.core.storage import storage_service
+
+
+@lru_cache(maxsize=4096)
+def storage_object_key(url: Optional[str]) -> Optional[str]:
+    """
+    Object key of a URL in the configured storage backend, or None for
+    other URLs (e.g. provider-hosted outputs).
+    """
+    return storage_service.object_key(url)
+
+
+class PresignedURLCache:
+    """
+    Reuses presigned download URLs per object key.
+
+    Time is cut into fixed windows and every URL handed out during a window
+    is signed for that window, expiring at window_start + expiration. Within
+    a window the URL for a key is byte-identical, so browsers and CDNs can
+    cache the media, and it always has at least expiration - window left.
+    """
+
+    def __init__(self, expiration: int, window: int, maxsize: int):
+        if window >= expiration:
+            raise ValueError("Presign window must be shorter than the URL expiration")
+        self.expiration = expiration
+        self.window = window
+        self._cache: TTLCache[str] = TTLCache(maxsize=maxsize, ttl=window)
+        self.signed = 0
+        self.sign_seconds = 0.0
+
+    def current_window(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        return int(now - now % self.window)
+
+    def get(self, key: str) -> Optional[str]:
+        url = self._cache.get(key)
+        if url is not MISSING:
+            return url
+
+        now = time.time()
+        window_start = self.current_window(now)
+        started = time.perf_counter()
+        # Signing at the window start makes the URL identical across processes
+        url = storage_service.generate_presigned_url(
+            key, expiration=self.expiration, signing_time=datetime.utcfromtimestamp(window_start)
+        )
+        self.signed += 1
+        self.sign_seconds += time.perf_counter() - started
+
+        if url:
+            self._cache.set(key, url, ttl=window_start + self.window - now)
+        return url
+
+    def warm(self, keys: Iterable[str]) -> None:
+        """
+        Sign every uncached key in one batch so the per-item get() calls that
+        follow (e.g. while serializing UserOut.videos) are all hits.
+        """
+        missing = [key for key in dict.fromkeys(keys) if key not in self._cache]
+        if not missing:
+            return
+
+        now = time.time()
+        window_start = self.current_window(now)
+        started = time.perf_counter()
+        urls = storage_service.generate_presigned_urls(
+            missing, expiration=self.expiration, signing_time=datetime.utcfromtimestamp(window_start)
+        )
+        self.signed += len(urls)
+        self.sign_seconds += time.perf_counter() - started
+
+        for key, url in urls.items():
+            self._cache.set(key, url, ttl=window_start + self.window - now)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._cache.stats(),
+            "signed": self.signed,
+            "avg_sign_ms": round(self.sign_seconds / self.signed * 1000, 3) if self.signed else None,
+        }
+
+
+presigned_url_cache = PresignedURLCache(
+    expiration=settings.PRESIGN_URL_EXPIRATION,
+    window=settings.PRESIGN_WINDOW,
+    maxsize=settings.PRESIGN_CACHE_MAX_ENTRIES,
+)
+metrics_registry.register("presigned_urls", presigned_url_cache.stats)
@@ -0,0 +1,31 @@
+import asyncio
+from typing import Optional
+
+from redis import asyncio as aioredis
+
+from app.core.config import settings
+
+_client: Optional[aioredis.Redis] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_redis() -> aioredis.Redis:
+    """
+    Shared asyncio Redis client for the running event loop.
+    Connections are bound to the loop that opened them, so a different loop
+    (e.g. the worker runtime or a CLI using asyncio.run) gets a fresh client.
+    """
+    global _client, _loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _loop is not loop:
+        _client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        _loop = loop
+    return _client
+
+
+async def close_redis() -> None:
+    global _client, _loop
+    if _client is not None and _loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+    _loop = None
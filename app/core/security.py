@@ -1,58 +1,412 @@
+import asyncio
+import hashlib
+import hmac
+import secrets
+import time
 from datetime import datetime, timedelta
 from typing import Any, Union, Optional, Dict
-import httpx
 
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from loguru import logger
 from pydantic import ValidationError
 
+from app.core.cache import MISSING, TTLCache
 from app.core.config import settings
+from app.core.http import http_clients
+from app.core.metrics import metrics_registry
+from app.core.redis import get_redis
 from app.schemas.identity import TokenPayload
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
+optional_oauth2 = OAuth2PasswordBearer(
+    tokenUrl=f"{settings.API_V1_STR}/login/access-token", auto_error=False
+)
 
-async def verify_supabase_jwt(token: str) -> Optional[TokenPayload]:
+# Asymmetric algorithms Supabase publishes in its JWKS. HS256 is only accepted
+# when SUPABASE_JWT_SECRET is configured.
+JWKS_ALGORITHMS = ("RS256", "ES256")
+
+
+class SigningKeyUnavailable(Exception):
+    """
+    Raised when a token cannot be verified locally because we do not hold its
+    signing key (JWKS unreachable, unknown kid, or HS256 without a secret).
+    """
+
+
+class AuthUnavailable(Exception):
+    """
+    Raised when Supabase Auth could not answer (timeout, connection error,
+    5xx, rate limit); unlike a rejection this says nothing about the token
+    and must not be cached.
+    """
+
+
+class SupabaseJWKS:
+    """
+    In-process cache of the project's JWT signing keys.
+
+    Keys are refetched once the TTL passes, and immediately (throttled) when a
+    token names a kid we have not seen, which is how key rotation shows up.
+    If a refresh fails the previously fetched keys keep being served.
+    """
+
+    def __init__(self, url: str, ttl: int, min_refresh_interval: int):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, dict] = {}
+        self._fetched_at: float = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def get_key(self, kid: Optional[str]) -> Optional[dict]:
+        if time.monotonic() - self._fetched_at > self.ttl:
+            await self.refresh()
+
+        key = self._find(kid)
+        if key is None and time.monotonic() - self._fetched_at >= self.min_refresh_interval:
+            await self.refresh(force=True)
+            key = self._find(kid)
+        return key
+
+    async def refresh(self, force: bool = False) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another request may have refreshed while we waited for the lock
+            age = time.monotonic() - self._fetched_at
+            if (force and age < self.min_refresh_interval) or (not force and age <= self.ttl):
+                return
+            try:
+                response = await http_clients.get("supabase").get(self.url)
+                response.raise_for_status()
+                keys = {
+                    key.get("kid", ""): key
+                    for key in response.json().get("keys", [])
+                }
+                self._keys = keys
+                logger.info(f"Loaded {len(keys)} Supabase signing key(s) from JWKS")
+            except Exception as e:
+                logger.error(f"Failed to refresh Supabase JWKS: {e}")
+            # Stamp failures too so an unreachable JWKS is not retried per request
+            self._fetched_at = time.monotonic()
+
+    def _find(self, kid: Optional[str]) -> Optional[dict]:
+        if kid is not None:
+            return self._keys.get(kid)
+        if len(self._keys) == 1:
+            return next(iter(self._keys.values()))
+        return None
+
+
+supabase_jwks = SupabaseJWKS(
+    url=f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json",
+    ttl=settings.SUPABASE_JWKS_CACHE_TTL,
+    min_refresh_interval=settings.SUPABASE_JWKS_MIN_REFRESH_INTERVAL,
+)
+
+
+async def verify_supabase_jwt_locally(token: str) -> Optional[TokenPayload]:
+    """
+    Verify signature, exp, aud and role in-process.
+    Returns None for invalid tokens and raises SigningKeyUnavailable when the
+    token may be valid but we have no key to check it with.
+    """
+    try:
+        header = jwt.get_unverified_header(token)
+    except JWTError:
+        return None
+
+    algorithm = header.get("alg")
+    if algorithm == "HS256":
+        if not settings.SUPABASE_JWT_SECRET:
+            raise SigningKeyUnavailable("HS256 token but SUPABASE_JWT_SECRET is not set")
+        key: Union[str, dict] = settings.SUPABASE_JWT_SECRET
+    elif algorithm in JWKS_ALGORITHMS:
+        key = await supabase_jwks.get_key(header.get("kid"))
+        if key is None:
+            raise SigningKeyUnavailable(f"No JWKS key for kid {header.get('kid')}")
+        if key.get("alg", algorithm) != algorithm:
+            return None
+    else:
+        return None
+
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=settings.SUPABASE_JWT_AUDIENCE,
+            options={"require_exp": True, "leeway": settings.SUPABASE_JWT_LEEWAY},
+        )
+    except JWTError:
+        return None
+
+    if claims.get("role") != settings.SUPABASE_JWT_ROLE:
+        return None
+
+    try:
+        return TokenPayload(
+            sub=claims["sub"],
+            email=claims.get("email") or None,
+            role=claims.get("role"),
+            aud=settings.SUPABASE_JWT_AUDIENCE,
+            exp=claims.get("exp"),
+        )
+    except (KeyError, ValidationError):
+        return None
+
+
+async def verify_supabase_jwt_remotely(token: str) -> Optional[TokenPayload]:
     """
     Verify the token by calling Supabase Auth API directly.
     This is more reliable than manual JWT decoding as it handles all algorithms
     and project-specific logic.
+    Returns None only when Supabase rejects the token (401/403) and raises
+    AuthUnavailable when it gave no answer.
     """
+    headers = {
+        "apikey": settings.SUPABASE_PUBLISHABLE_KEY,
+        "Authorization": f"Bearer {token}"
+    }
     try:
-        headers = {
-            "apikey": settings.SUPABASE_PUBLISHABLE_KEY,
-            "Authorization": f"Bearer {token}"
-        }
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.SUPABASE_URL}/auth/v1/user",
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                user_data = response.json()
-                # Construct TokenPayload from Supabase user data
-                return TokenPayload(
-                    sub=user_data["id"],
-                    email=user_data.get("email"),
-                    role=user_data.get("role", "authenticated")
-                )
-            else:
-                print(f"Supabase Auth Verification Failed: {response.status_code} {response.text}")
-                return None
+        response = await http_clients.get("supabase").get(
+            "/auth/v1/user",
+            headers=headers
+        )
     except Exception as e:
-        print(f"Auth Verification Error: {e}")
+        raise AuthUnavailable(f"Supabase Auth request failed: {e}") from e
+
+    if response.status_code in (401, 403):
+        logger.info(f"Supabase Auth rejected token: {response.status_code} {response.text}")
         return None
+    if response.status_code != 200:
+        raise AuthUnavailable(f"Supabase Auth returned {response.status_code}")
+    try:
+        user_data = response.json()
+        # Construct TokenPayload from Supabase user data
+        return TokenPayload(
+            sub=user_data["id"],
+            email=user_data.get("email"),
+            role=user_data.get("role", "authenticated")
+        )
+    except (ValueError, KeyError, ValidationError) as e:
+        raise AuthUnavailable(f"Unexpected Supabase Auth response: {e}") from e
+
+
+async def verify_supabase_jwt(token: str) -> Optional[TokenPayload]:
+    if settings.SUPABASE_JWT_VERIFICATION == "local":
+        try:
+            return await verify_supabase_jwt_locally(token)
+        except SigningKeyUnavailable as e:
+            if not settings.SUPABASE_JWT_REMOTE_FALLBACK:
+                logger.warning(f"Rejecting token, local verification unavailable: {e}")
+                return None
+            logger.debug(f"Falling back to remote verification: {e}")
+    return await verify_supabase_jwt_remotely(token)
+
+
+class TokenVerificationCache:
+    """
+    Caches verification results by token hash so repeated requests with the
+    same bearer token skip verification.
+
+    Valid tokens are kept until their exp (capped at max_ttl), rejections for
+    negative_ttl; AuthUnavailable is passed through uncached. Concurrent
+    lookups of the same uncached token share a single verification. With use_redis the results are also shared across replicas.
+    """
+
+    REDIS_PREFIX = "auth:token:"
+
+    def __init__(self, maxsize: int, max_ttl: int, negative_ttl: int, use_redis: bool = False):
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.use_redis = use_redis
+        self._local: TTLCache[Optional[TokenPayload]] = TTLCache(maxsize=maxsize, ttl=max_ttl)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.redis_hits = 0
+        self.coalesced = 0
+        self.verifications = 0
+        self.rejections = 0
+
+    async def verify(self, token: str) -> Optional[TokenPayload]:
+        key = hashlib.sha256(token.encode()).hexdigest()
+        cached = self._local.get(key)
+        if cached is not MISSING:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, token))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shield so a cancelled request does not cancel the shared verification
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, token: str) -> Optional[TokenPayload]:
+        if self.use_redis:
+            cached = await self._redis_get(key)
+            if cached is not MISSING:
+                self.redis_hits += 1
+                self._local.set(key, cached, ttl=self._ttl_for(token, cached))
+                return cached
+
+        self.verifications += 1
+        payload = await verify_supabase_jwt(token)
+        if payload is None:
+            self.rejections += 1
+
+        ttl = self._ttl_for(token, payload)
+        self._local.set(key, payload, ttl=ttl)
+        if self.use_redis:
+            await self._redis_set(key, payload, ttl)
+        return payload
+
+    def _ttl_for(self, token: str, payload: Optional[TokenPayload]) -> float:
+        if payload is None:
+            return self.negative_ttl
+        exp = payload.exp
+        if exp is None:
+            # Remote verification does not return claims; exp is safe to read
+            # unverified here because the token has just been accepted.
+            try:
+                exp = jwt.get_unverified_claims(token).get("exp")
+            except JWTError:
+                exp = None
+        if exp is None:
+            return 0
+        return min(exp - time.time(), self.max_ttl)
+
+    async def _redis_get(self, key: str) -> Any:
+        try:
+            raw = await get_redis().get(self.REDIS_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"Token cache Redis read failed: {e}")
+            return MISSING
+        if raw is None:
+            return MISSING
+        if raw == "":
+            return None
+        return TokenPayload.model_validate_json(raw)
+
+    async def _redis_set(self, key: str, payload: Optional[TokenPayload], ttl: float) -> None:
+        if ttl < 1:
+            return
+        value = payload.model_dump_json() if payload else ""
+        try:
+            await get_redis().set(self.REDIS_PREFIX + key, value, ex=int(ttl))
+        except Exception as e:
+            logger.warning(f"Token cache Redis write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._local.stats(),
+            "redis_enabled": self.use_redis,
+            "redis_hits": self.redis_hits,
+            "coalesced": self.coalesced,
+            "verifications": self.verifications,
+            "rejections": self.rejections,
+            "inflight": len(self._inflight),
+        }
+
+
+token_cache = TokenVerificationCache(
+    maxsize=settings.AUTH_CACHE_MAX_ENTRIES,
+    max_ttl=settings.AUTH_CACHE_MAX_TTL,
+    negative_ttl=settings.AUTH_CACHE_NEGATIVE_TTL,
+    use_redis=settings.AUTH_CACHE_REDIS,
+)
+metrics_registry.register("auth_cache", token_cache.stats)
+
 
 async def get_current_user_id(
     token: str = Depends(reusable_oauth2)
 ) -> str:
-    token_data = await verify_supabase_jwt(token)
+    try:
+        token_data = await token_cache.verify(token)
+    except AuthUnavailable as e:
+        logger.error(f"Cannot verify token: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is temporarily unavailable",
+        )
     if not token_data:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
     return token_data.sub
+
+
+STREAM_TICKET_PREFIX = "stream:ticket:"
+
+
+async def issue_stream_ticket(user_id: str, scope: str) -> str:
+    """
+    Single-use ticket that authenticates one event stream request for
+    `scope`. EventSource cannot send an Authorization header, and a bearer
+    token in the URL would end up in access logs; a ticket is worthless
+    once redeemed or after VIDEO_EVENTS_TICKET_TTL.
+    """
+    ticket = secrets.token_urlsafe(32)
+    try:
+        await get_redis().set(
+            STREAM_TICKET_PREFIX + ticket, f"{scope} {user_id}", ex=settings.VIDEO_EVENTS_TICKET_TTL
+        )
+    except Exception as e:
+        logger.warning(f"Issuing stream ticket failed: {e}")
+        raise HTTPException(status_code=503, detail="Event streams unavailable; poll instead")
+    return ticket
+
+
+async def redeem_stream_ticket(ticket: str, scope: str) -> Optional[str]:
+    """
+    User id the ticket was issued to, or None if it is unknown, expired,
+    already used or issued for another scope.
+    """
+    try:
+        value = await get_redis().getdel(STREAM_TICKET_PREFIX + ticket)
+    except Exception as e:
+        logger.warning(f"Redeeming stream ticket failed: {e}")
+        raise HTTPException(status_code=503, detail="Event streams unavailable; poll instead")
+    if value is None:
+        return None
+    ticket_scope, user_id = value.split(" ", 1)
+    return user_id if hmac.compare_digest(ticket_scope, scope) else None
+
+
+async def get_stream_user_id(scope: str, token: Optional[str], ticket: Optional[str]) -> str:
+    """
+    get_current_user_id for event streams, which authenticate with either
+    an Authorization header or a ticket from issue_stream_ticket.
+    """
+    if token:
+        return await get_current_user_id(token)
+    user_id = await redeem_stream_ticket(ticket, scope) if ticket else None
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user_id
+
+
+def webhook_token(subject: str) -> str:
+    """
+    Token embedded in the webhook URLs we register with providers; subject
+    is what the URL is for (e.g. a video id), so a leaked URL only ever
+    authenticates events for that one job.
+    """
+    secret = (settings.FAL_WEBHOOK_SECRET or settings.SUPABASE_SECRET_KEY).encode("utf-8")
+    return hmac.new(secret, f"webhook:{subject}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def verify_webhook_token(subject: str, token: Optional[str]) -> bool:
+    return bool(token) and hmac.compare_digest(webhook_token(subject), token)
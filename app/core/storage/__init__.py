@@ -0,0 +1,20 @@
+from app.core.storage.base import LocalURLSigner, StorageBackend
+from app.core.storage.service import (
+    AsyncStorageService,
+    MultipartUploadWriter,
+    StorageService,
+    async_storage_service,
+    create_backend,
+    storage_service,
+)
+
+__all__ = [
+    "AsyncStorageService",
+    "LocalURLSigner",
+    "MultipartUploadWriter",
+    "StorageBackend",
+    "StorageService",
+    "async_storage_service",
+    "create_backend",
+    "storage_service",
+]
@@ -0,0 +1,184 @@
+import calendar
+import hashlib
+import hmac
+import mimetypes
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote, urlencode, urlsplit
+
+
+class StorageBackend(ABC):
+    """
+    Object storage used by StorageService.
+
+    Every backend offers the same semantics: presigned GET/PUT/part URLs,
+    uploads (single and multipart), chunked streaming reads, and single and
+    batch deletes. Keys are bucket-relative paths such as
+    "users/{id}/uploads/clip.mp4". Methods are blocking; async callers go
+    through AsyncStorageService.
+    """
+
+    name: str = "base"
+
+    # --- URLs -------------------------------------------------------------
+
+    @abstractmethod
+    def file_url(self, key: str) -> str:
+        """
+        Stable (unsigned) URL stored on records, e.g. Video.video_url.
+        """
+
+    @abstractmethod
+    def object_key(self, url: str) -> Optional[str]:
+        """
+        Inverse of file_url; None if the URL does not belong to this backend.
+        """
+
+    @abstractmethod
+    def presign_get_many(
+        self, keys: List[str], expires: int, signing_time: Optional[datetime] = None
+    ) -> List[str]:
+        ...
+
+    def presign_get(self, key: str, expires: int, signing_time: Optional[datetime] = None) -> str:
+        return self.presign_get_many([key], expires, signing_time)[0]
+
+    @abstractmethod
+    def presign_put(self, key: str, content_type: str, expires: int) -> str:
+        ...
+
+    @abstractmethod
+    def presign_upload_part(self, key: str, upload_id: str, part_number: int, expires: int) -> str:
+        ...
+
+    # --- Writes -----------------------------------------------------------
+
+    @abstractmethod
+    def upload_fileobj(self, file_obj: BinaryIO, key: str, content_type: str) -> None:
+        ...
+
+    @abstractmethod
+    def put_object(self, body: bytes, key: str, content_type: str) -> None:
+        ...
+
+    @abstractmethod
+    def create_multipart_upload(self, key: str, content_type: str) -> str:
+        ...
+
+    @abstractmethod
+    def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> str:
+        """
+        Returns the part's ETag.
+        """
+
+    @abstractmethod
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Dict[str, Any]]) -> None:
+        """
+        parts: [{"PartNumber": 1, "ETag": "..."}, ...] in ascending part order.
+        """
+
+    @abstractmethod
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def list_parts(self, key: str, upload_id: str) -> List[Dict[str, Any]]:
+        """
+        [{"part_number": 1, "etag": "...", "size": 123}, ...]
+        """
+
+    # --- Reads and deletes ------------------------------------------------
+
+    @abstractmethod
+    def open_stream(self, key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """
+        Object body in chunks. Raises KeyError if the object does not exist.
+        """
+
+    def content_type(self, key: str) -> str:
+        return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Deleting a missing key is not an error.
+        """
+
+    def delete_many(self, keys: List[str]) -> List[str]:
+        """
+        Delete several keys; returns the keys that could not be deleted.
+        """
+        failed = []
+        for key in keys:
+            try:
+                self.delete(key)
+            except Exception:
+                failed.append(key)
+        return failed
+
+    @abstractmethod
+    def list_keys(
+        self, prefix: str, start_after: Optional[str] = None, limit: int = 1000
+    ) -> List[Tuple[str, datetime]]:
+        """
+        One page of (key, last_modified) under prefix in key order, starting
+        after start_after. last_modified is naive UTC.
+        """
+
+
+class LocalURLSigner:
+    """
+    HMAC-signed URLs served by the API itself (/storage/local/...), used by
+    the backends that have no object store in front of them.
+
+    The expiry is absolute and derived from signing_time, so URLs signed for
+    the same window are identical, as with SigV4.
+    """
+
+    def __init__(self, base_url: str, secret: str):
+        self.base_url = base_url.rstrip("/")
+        self.secret = secret.encode("utf-8")
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{quote(key, safe='/~')}"
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        prefix = f"{self.base_url}/"
+        if not url or not url.startswith(prefix):
+            return None
+        return unquote(urlsplit(url[len(prefix):]).path) or None
+
+    def sign(
+        self,
+        method: str,
+        key: str,
+        expires: int,
+        signing_time: Optional[datetime] = None,
+        params: Iterable[tuple] = (),
+    ) -> str:
+        # Naive datetimes are UTC, as everywhere else in this codebase
+        start = calendar.timegm(signing_time.utctimetuple()) if signing_time else time.time()
+        query = list(params) + [("expires", int(start + expires))]
+        signature = self.signature(method, key, query)
+        return f"{self.url(key)}?{urlencode(query + [('signature', signature)])}"
+
+    def signature(self, method: str, key: str, query: Iterable[tuple]) -> str:
+        payload = "\n".join([method.upper(), key] + [f"{k}={v}" for k, v in query])
+        return hmac.new(self.secret, payload.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def verify(self, method: str, key: str, query: Dict[str, str]) -> bool:
+        """
+        query: the request's query params, including expires and signature.
+        """
+        try:
+            expires = int(query["expires"])
+            signature = query["signature"]
+        except (KeyError, ValueError):
+            return False
+        if expires < time.time():
+            return False
+        params = [(k, v) for k, v in query.items() if k not in ("expires", "signature")]
+        expected = self.signature(method, key, params + [("expires", expires)])
+        return hmac.compare_digest(expected, signature)
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from app.core.storage.base import LocalURLSigner, StorageBackend
+
+
+class LocalBackend(StorageBackend):
+    """
+    Objects stored as files under root, read back through mmap.
+
+    Writes go to a temp file in the same directory and are renamed into
+    place, so readers never see a partial object. Multipart parts are kept
+    under root/.multipart/{upload_id}/ until the upload is completed.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str, signer: LocalURLSigner):
+        self.root = Path(root).resolve()
+        self.signer = signer
+        self.uploads_dir = self.root / ".multipart"
+        self.uploads_dir.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root not in path.parents or self.uploads_dir in path.parents or path == self.uploads_dir:
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def file_url(self, key: str) -> str:
+        return self.signer.url(key)
+
+    def object_key(self, url: str) -> Optional[str]:
+        return self.signer.key_from_url(url)
+
+    def presign_get_many(
+        self, keys: List[str], expires: int, signing_time: Optional[datetime] = None
+    ) -> List[str]:
+        return [self.signer.sign("GET", key, expires, signing_time) for key in keys]
+
+    def presign_put(self, key: str, content_type: str, expires: int) -> str:
+        return self.signer.sign("PUT", key, expires)
+
+    def presign_upload_part(self, key: str, upload_id: str, part_number: int, expires: int) -> str:
+        return self.signer.sign(
+            "PUT", key, expires, params=[("uploadId", upload_id), ("partNumber", part_number)]
+        )
+
+    def upload_fileobj(self, file_obj: BinaryIO, key: str, content_type: str) -> None:
+        with self._atomic_write(self.path(key)) as out:
+            shutil.copyfileobj(file_obj, out, 1024 * 1024)
+
+    def put_object(self, body: bytes, key: str, content_type: str) -> None:
+        with self._atomic_write(self.path(key)) as out:
+            out.write(body)
+
+    def create_multipart_upload(self, key: str, content_type: str) -> str:
+        self.path(key)
+        upload_id = uuid.uuid4().hex
+        upload_dir = self.uploads_dir / upload_id
+        upload_dir.mkdir()
+        (upload_dir / "upload.json").write_text(json.dumps({"key": key, "content_type": content_type}))
+        return upload_id
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> str:
+        upload_dir = self._upload_dir(key, upload_id)
+        with self._atomic_write(upload_dir / f"{part_number:05d}.part") as out:
+            out.write(body)
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Dict[str, Any]]) -> None:
+        upload_dir = self._upload_dir(key, upload_id)
+        uploaded = {part["part_number"]: part["etag"] for part in self.list_parts(key, upload_id)}
+        for part in parts:
+            if uploaded.get(part["PartNumber"]) != part["ETag"]:
+                raise ValueError(f"Invalid part {part['PartNumber']} for upload {upload_id}")
+        with self._atomic_write(self.path(key)) as out:
+            for part in parts:
+                with open(upload_dir / f"{part['PartNumber']:05d}.part", "rb") as src:
+                    shutil.copyfileobj(src, out, 1024 * 1024)
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        try:
+            upload_dir = self._upload_dir(key, upload_id)
+        except KeyError:
+            return
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+    def list_parts(self, key: str, upload_id: str) -> List[Dict[str, Any]]:
+        upload_dir = self._upload_dir(key, upload_id)
+        parts = []
+        for part_path in sorted(upload_dir.glob("*.part")):
+            digest = hashlib.md5()
+            for chunk in self._read_chunks(part_path, 1024 * 1024):
+                digest.update(chunk)
+            parts.append({
+                "part_number": int(part_path.stem),
+                "etag": f'"{digest.hexdigest()}"',
+                "size": part_path.stat().st_size,
+            })
+        return parts
+
+    def open_stream(self, key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        path = self.path(key)
+        if not path.is_file():
+            raise KeyError(key)
+        return self._read_chunks(path, chunk_size)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def list_keys(
+        self, prefix: str, start_after: Optional[str] = None, limit: int = 1000
+    ) -> List[Tuple[str, datetime]]:
+        # Walks the whole tree per page; fine for the sizes this backend serves
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            # Skip in-progress multipart uploads and other hidden entries
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                path = Path(dirpath) / filename
+                key = path.relative_to(self.root).as_posix()
+                if key.startswith(prefix) and (start_after is None or key > start_after):
+                    entries.append((key, datetime.utcfromtimestamp(path.stat().st_mtime)))
+        entries.sort()
+        return entries[:limit]
+
+    def _upload_dir(self, key: str, upload_id: str) -> Path:
+        upload_dir = self.uploads_dir / upload_id
+        try:
+            meta = json.loads((upload_dir / "upload.json").read_text())
+        except (FileNotFoundError, ValueError):
+            meta = None
+        if not meta or meta["key"] != key or upload_dir.parent != self.uploads_dir:
+            raise KeyError(f"No such upload {upload_id} for {key}")
+        return upload_dir
+
+    @staticmethod
+    def _read_chunks(path: Path, chunk_size: int) -> Iterator[bytes]:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            # Mapped once instead of a read() syscall per chunk
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(0, size, chunk_size):
+                    yield mapped[offset:offset + chunk_size]
+
+    @staticmethod
+    def _atomic_write(path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return _AtomicFile(path)
+
+
+class _AtomicFile:
+    """
+    Write to a sibling temp file and rename it over path on success.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self) -> BinaryIO:
+        fd, self._tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.")
+        self._file = os.fdopen(fd, "wb")
+        return self._file
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._file.close()
+        if exc_type is None:
+            os.replace(self._tmp, self.path)
+        else:
+            os.unlink(self._tmp)
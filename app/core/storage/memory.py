@@ -0,0 +1,120 @@
+import hashlib
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from app.core.storage.base import LocalURLSigner, StorageBackend
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Objects held in a dict. For load tests and local runs with no network;
+    contents are lost on restart and are not shared between processes.
+    """
+
+    name = "memory"
+
+    def __init__(self, signer: LocalURLSigner):
+        self.signer = signer
+        self._objects: Dict[str, Tuple[bytes, str]] = {}
+        self._modified: Dict[str, datetime] = {}
+        self._uploads: Dict[str, Dict[str, Any]] = {}
+        # Calls arrive from the storage thread pool
+        self._lock = threading.Lock()
+
+    def file_url(self, key: str) -> str:
+        return self.signer.url(key)
+
+    def object_key(self, url: str) -> Optional[str]:
+        return self.signer.key_from_url(url)
+
+    def presign_get_many(
+        self, keys: List[str], expires: int, signing_time: Optional[datetime] = None
+    ) -> List[str]:
+        return [self.signer.sign("GET", key, expires, signing_time) for key in keys]
+
+    def presign_put(self, key: str, content_type: str, expires: int) -> str:
+        return self.signer.sign("PUT", key, expires)
+
+    def presign_upload_part(self, key: str, upload_id: str, part_number: int, expires: int) -> str:
+        return self.signer.sign(
+            "PUT", key, expires, params=[("uploadId", upload_id), ("partNumber", part_number)]
+        )
+
+    def upload_fileobj(self, file_obj: BinaryIO, key: str, content_type: str) -> None:
+        self.put_object(file_obj.read(), key, content_type)
+
+    def put_object(self, body: bytes, key: str, content_type: str) -> None:
+        with self._lock:
+            self._objects[key] = (bytes(body), content_type)
+            self._modified[key] = datetime.utcnow()
+
+    def create_multipart_upload(self, key: str, content_type: str) -> str:
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = {"key": key, "content_type": content_type, "parts": {}}
+        return upload_id
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> str:
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        with self._lock:
+            self._upload(key, upload_id)["parts"][part_number] = (etag, bytes(body))
+        return etag
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            upload = self._upload(key, upload_id)
+            chunks = []
+            for part in parts:
+                etag, body = upload["parts"].get(part["PartNumber"], (None, b""))
+                if etag != part["ETag"]:
+                    raise ValueError(f"Invalid part {part['PartNumber']} for upload {upload_id}")
+                chunks.append(body)
+            self._objects[key] = (b"".join(chunks), upload["content_type"])
+            self._modified[key] = datetime.utcnow()
+            del self._uploads[upload_id]
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+
+    def list_parts(self, key: str, upload_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            parts = self._upload(key, upload_id)["parts"]
+            return [
+                {"part_number": number, "etag": etag, "size": len(body)}
+                for number, (etag, body) in sorted(parts.items())
+            ]
+
+    def open_stream(self, key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        with self._lock:
+            body, _ = self._objects[key]
+        view = memoryview(body)
+        return (bytes(view[i:i + chunk_size]) for i in range(0, len(view), chunk_size))
+
+    def content_type(self, key: str) -> str:
+        with self._lock:
+            return self._objects[key][1]
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._objects.pop(key, None)
+            self._modified.pop(key, None)
+
+    def list_keys(
+        self, prefix: str, start_after: Optional[str] = None, limit: int = 1000
+    ) -> List[Tuple[str, datetime]]:
+        with self._lock:
+            entries = [
+                (key, modified) for key, modified in self._modified.items()
+                if key.startswith(prefix) and (start_after is None or key > start_after)
+            ]
+        entries.sort()
+        return entries[:limit]
+
+    def _upload(self, key: str, upload_id: str) -> Dict[str, Any]:
+        upload = self._uploads.get(upload_id)
+        if upload is None or upload["key"] != key:
+            raise KeyError(f"No such upload {upload_id} for {key}")
+        return upload
@@ -0,0 +1,154 @@
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from app.core.sigv4 import SigV4Presigner
+from app.core.storage.base import StorageBackend
+
+
+class S3Backend(StorageBackend):
+    """
+    Backblaze B2 (or any S3-compatible store) through boto3.
+    URL signing skips boto3 and uses the in-process SigV4Presigner.
+    """
+
+    name = "b2"
+
+    # DeleteObjects accepts at most 1000 keys per request
+    DELETE_BATCH_SIZE = 1000
+
+    def __init__(
+        self,
+        key_id: str,
+        application_key: str,
+        endpoint: str,
+        bucket: str,
+        region: str,
+        max_pool_connections: int = 10,
+    ):
+        self.bucket = bucket
+        self.endpoint = endpoint
+        self.host = urlparse(endpoint).netloc or endpoint
+        self.s3 = boto3.client(
+            's3',
+            endpoint_url=endpoint,
+            aws_access_key_id=key_id,
+            aws_secret_access_key=application_key,
+            config=Config(signature_version='s3v4', max_pool_connections=max_pool_connections),
+            region_name=region,
+        )
+        self.presigner = SigV4Presigner(
+            access_key=key_id,
+            secret_key=application_key,
+            region=region,
+            endpoint=endpoint,
+            bucket=bucket,
+        )
+
+    def file_url(self, key: str) -> str:
+        return f"https://{self.bucket}.{self.host}/{key}"
+
+    def object_key(self, url: str) -> Optional[str]:
+        if not url:
+            return None
+        parsed = urlparse(url)
+        if parsed.netloc != self.host and not parsed.netloc.endswith(f".{self.host}"):
+            return None
+        return parsed.path.lstrip('/') or None
+
+    def presign_get_many(
+        self, keys: List[str], expires: int, signing_time: Optional[datetime] = None
+    ) -> List[str]:
+        return self.presigner.presign_get_many(keys, expires, signing_time=signing_time)
+
+    def presign_put(self, key: str, content_type: str, expires: int) -> str:
+        return self.presigner.presign_put(key, content_type, expires)
+
+    def presign_upload_part(self, key: str, upload_id: str, part_number: int, expires: int) -> str:
+        return self.presigner.presign(
+            "PUT", key, expires, params=[("uploadId", upload_id), ("partNumber", part_number)]
+        )
+
+    def upload_fileobj(self, file_obj: BinaryIO, key: str, content_type: str) -> None:
+        self.s3.upload_fileobj(file_obj, self.bucket, key, ExtraArgs={'ContentType': content_type})
+
+    def put_object(self, body: bytes, key: str, content_type: str) -> None:
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType=content_type)
+
+    def create_multipart_upload(self, key: str, content_type: str) -> str:
+        response = self.s3.create_multipart_upload(Bucket=self.bucket, Key=key, ContentType=content_type)
+        return response["UploadId"]
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> str:
+        response = self.s3.upload_part(
+            Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=body
+        )
+        return response["ETag"]
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Dict[str, Any]]) -> None:
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        self.s3.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+    def list_parts(self, key: str, upload_id: str) -> List[Dict[str, Any]]:
+        parts: List[Dict[str, Any]] = []
+        marker = 0
+        while True:
+            response = self.s3.list_parts(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumberMarker=marker
+            )
+            for part in response.get("Parts", []):
+                parts.append({
+                    "part_number": part["PartNumber"],
+                    "etag": part["ETag"],
+                    "size": part["Size"],
+                })
+            if not response.get("IsTruncated"):
+                return parts
+            marker = response["NextPartNumberMarker"]
+
+    def open_stream(self, key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                raise KeyError(key) from e
+            raise
+        return response["Body"].iter_chunks(chunk_size)
+
+    def delete(self, key: str) -> None:
+        self.s3.delete_object(Bucket=self.bucket, Key=key)
+
+    def delete_many(self, keys: List[str]) -> List[str]:
+        failed: List[str] = []
+        for start in range(0, len(keys), self.DELETE_BATCH_SIZE):
+            batch = keys[start:start + self.DELETE_BATCH_SIZE]
+            try:
+                response = self.s3.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+            except Exception:
+                failed.extend(batch)
+                continue
+            failed.extend(error["Key"] for error in response.get("Errors", []))
+        return failed
+
+    def list_keys(
+        self, prefix: str, start_after: Optional[str] = None, limit: int = 1000
+    ) -> List[Tuple[str, datetime]]:
+        params = {"Bucket": self.bucket, "Prefix": prefix, "MaxKeys": limit}
+        if start_after:
+            params["StartAfter"] = start_after
+        response = self.s3.list_objects_v2(**params)
+        return [
+            (obj["Key"], obj["LastModified"].astimezone(timezone.utc).replace(tzinfo=None))
+            for obj in response.get("Contents", [])
+        ]
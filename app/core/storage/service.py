@@ -0,0 +1,388 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from app.core.config import settings
+from app.core.metrics import metrics_registry
+from app.core.storage.base import LocalURLSigner, StorageBackend
+from loguru import logger
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+def create_backend() -> Optional[StorageBackend]:
+    """
+    Storage backend selected by settings.STORAGE_BACKEND.
+    """
+    kind = settings.STORAGE_BACKEND
+    if kind == "b2":
+        if not all([settings.B2_KEY_ID, settings.B2_APPLICATION_KEY, settings.B2_ENDPOINT, settings.B2_BUCKET_NAME]):
+            logger.warning("STORAGE_BACKEND is b2 but the B2 settings are incomplete; storage is disabled")
+            return None
+        from app.core.storage.s3 import S3Backend
+        return S3Backend(
+            key_id=settings.B2_KEY_ID,
+            application_key=settings.B2_APPLICATION_KEY,
+            endpoint=settings.B2_ENDPOINT,
+            bucket=settings.B2_BUCKET_NAME,
+            region=settings.B2_REGION_NAME,
+            max_pool_connections=max(10, settings.STORAGE_IO_CONCURRENCY),
+        )
+
+    signer = LocalURLSigner(
+        base_url=settings.STORAGE_PUBLIC_URL or f"http://localhost:8000{settings.API_V1_STR}/storage/local",
+        secret=settings.STORAGE_LOCAL_SIGNING_KEY or settings.SUPABASE_SECRET_KEY,
+    )
+    if kind == "local":
+        from app.core.storage.local import LocalBackend
+        return LocalBackend(settings.STORAGE_LOCAL_ROOT, signer)
+    if kind == "memory":
+        from app.core.storage.memory import MemoryBackend
+        return MemoryBackend(signer)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {kind}")
+
+class StorageService:
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend = backend
+
+    def _require_backend(self) -> StorageBackend:
+        if not self.backend:
+            raise Exception("Storage service not configured")
+        return self.backend
+
+    def generate_presigned_url(
+        self, object_name: str, expiration: int = 3600, signing_time: Optional[datetime] = None
+    ) -> Optional[str]:
+        """
+        Generate a presigned URL to share an object (video download).
+        """
+        if not self.backend:
+            return None
+        try:
+            return self.backend.presign_get(object_name, expiration, signing_time=signing_time)
+        except Exception as e:
+            logger.warning(f"Failed to presign {object_name}: {e}")
+            return None
+
+    def generate_presigned_urls(
+        self, object_names: List[str], expiration: int = 3600, signing_time: Optional[datetime] = None
+    ) -> Dict[str, str]:
+        """
+        Presign download URLs for many objects in one batch (list serializations).
+        """
+        if not self.backend or not object_names:
+            return {}
+        urls = self.backend.presign_get_many(object_names, expiration, signing_time=signing_time)
+        return dict(zip(object_names, urls))
+
+    def generate_upload_url(self, object_name: str, content_type: str, expiration: int = 3600) -> dict:
+        """
+        Generate a presigned URL for PUT uploading a file.
+        """
+        backend = self._require_backend()
+        return {
+            "url": backend.presign_put(object_name, content_type, expiration),
+            "file_url": backend.file_url(object_name)
+        }
+
+    def generate_upload_part_urls(
+        self, object_name: str, upload_id: str, part_numbers: List[int], expiration: int = 3600
+    ) -> Dict[int, str]:
+        """
+        Presigned upload_part URLs so clients can PUT parts straight to storage.
+        """
+        backend = self._require_backend()
+        return {
+            part_number: backend.presign_upload_part(object_name, upload_id, part_number, expiration)
+            for part_number in part_numbers
+        }
+
+    def list_parts(self, object_name: str, upload_id: str) -> List[Dict[str, Any]]:
+        """
+        Parts storage has already received for a multipart upload.
+        """
+        return self._require_backend().list_parts(object_name, upload_id)
+
+    def upload_file(self, file_obj, object_name: str, content_type: str) -> str:
+        """
+        Upload a file directly from the backend to storage.
+        """
+        backend = self._require_backend()
+        backend.upload_fileobj(file_obj, object_name, content_type)
+        return backend.file_url(object_name)
+
+    def file_url(self, object_name: str) -> str:
+        return self._require_backend().file_url(object_name)
+
+    def object_key(self, url: Optional[str]) -> Optional[str]:
+        """
+        Object key of a URL produced by file_url, or None for foreign URLs.
+        """
+        if not self.backend or not url:
+            return None
+        return self.backend.object_key(url)
+
+    def put_object(self, body: bytes, object_name: str, content_type: str) -> str:
+        """
+        Single-request upload of an in-memory body (small files).
+        """
+        backend = self._require_backend()
+        backend.put_object(body, object_name, content_type)
+        return backend.file_url(object_name)
+
+    def create_multipart_upload(self, object_name: str, content_type: str) -> str:
+        return self._require_backend().create_multipart_upload(object_name, content_type)
+
+    def upload_part(self, object_name: str, upload_id: str, part_number: int, body: bytes) -> str:
+        return self._require_backend().upload_part(object_name, upload_id, part_number, body)
+
+    def complete_multipart_upload(self, object_name: str, upload_id: str, parts: List[Dict[str, Any]]) -> str:
+        """
+        parts: [{"PartNumber": 1, "ETag": "..."}, ...] in ascending part order.
+        """
+        backend = self._require_backend()
+        backend.complete_multipart_upload(object_name, upload_id, parts)
+        return backend.file_url(object_name)
+
+    def abort_multipart_upload(self, object_name: str, upload_id: str) -> None:
+        self._require_backend().abort_multipart_upload(object_name, upload_id)
+
+    def open_stream(self, object_name: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """
+        Object body in chunks; raises KeyError if it does not exist.
+        """
+        return self._require_backend().open_stream(object_name, chunk_size)
+
+    def delete_file(self, object_name: str) -> bool:
+        """
+        Delete a file from storage.
+        """
+        if not self.backend:
+            return False
+        try:
+            self.backend.delete(object_name)
+            return True
+        except Exception:
+            return False
+
+    def delete_files(self, object_names: List[str]) -> List[str]:
+        """
+        Batch delete; returns the names that could not be deleted.
+        """
+        if not self.backend:
+            return list(object_names)
+        return self.backend.delete_many(list(object_names))
+
+    def list_keys(
+        self, prefix: str, start_after: Optional[str] = None, limit: int = 1000
+    ) -> List[Tuple[str, datetime]]:
+        """
+        One page of (object_name, last_modified) under prefix, in name order.
+        """
+        return self._require_backend().list_keys(prefix, start_after, limit)
+
+class AsyncStorageService:
+    """
+    Non-blocking facade over StorageService for request handlers.
+    Backend calls run on a dedicated thread pool, so at most max_concurrency
+    transfers are in flight and the event loop never waits on storage.
+    The sync StorageService stays the API for the Celery worker.
+    """
+
+    def __init__(self, storage: StorageService, max_concurrency: int):
+        self.storage = storage
+        self.max_concurrency = max_concurrency
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="storage-io"
+            )
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        self.in_flight += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, partial(fn, *args, **kwargs)
+            )
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        return result
+
+    async def upload_file(self, file_obj, object_name: str, content_type: str) -> str:
+        return await self.run(self.storage.upload_file, file_obj, object_name, content_type)
+
+    async def delete_file(self, object_name: str) -> bool:
+        return await self.run(self.storage.delete_file, object_name)
+
+    async def delete_files(self, object_names: List[str]) -> List[str]:
+        return await self.run(self.storage.delete_files, object_names)
+
+    async def list_keys(
+        self, prefix: str, start_after: Optional[str] = None, limit: int = 1000
+    ) -> List[Tuple[str, datetime]]:
+        return await self.run(self.storage.list_keys, prefix, start_after, limit)
+
+    async def put_object(self, body: bytes, object_name: str, content_type: str) -> str:
+        return await self.run(self.storage.put_object, body, object_name, content_type)
+
+    async def create_multipart_upload(self, object_name: str, content_type: str) -> str:
+        return await self.run(self.storage.create_multipart_upload, object_name, content_type)
+
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, body: bytes) -> str:
+        return await self.run(self.storage.upload_part, object_name, upload_id, part_number, body)
+
+    async def complete_multipart_upload(self, object_name: str, upload_id: str, parts: List[Dict[str, Any]]) -> str:
+        return await self.run(self.storage.complete_multipart_upload, object_name, upload_id, parts)
+
+    async def abort_multipart_upload(self, object_name: str, upload_id: str) -> None:
+        await self.run(self.storage.abort_multipart_upload, object_name, upload_id)
+
+    async def list_parts(self, object_name: str, upload_id: str) -> List[Dict[str, Any]]:
+        return await self.run(self.storage.list_parts, object_name, upload_id)
+
+    def open_multipart_writer(
+        self, object_name: str, content_type: str, max_memory: Optional[int] = None
+    ) -> "MultipartUploadWriter":
+        part_size = settings.STORAGE_STREAM_PART_SIZE
+        max_memory = max_memory or settings.STORAGE_STREAM_MAX_MEMORY
+        return MultipartUploadWriter(
+            self,
+            object_name,
+            content_type,
+            part_size=part_size,
+            # One part is always being filled while the others upload
+            max_parallel_parts=max(1, max_memory // part_size - 1),
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.max_concurrency),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+class MultipartUploadWriter:
+    """
+    Streams bytes of unknown length into a multipart upload.
+
+    Incoming chunks are cut into part_size parts and up to max_parallel_parts
+    upload concurrently while more data arrives; write() waits when that many
+    are in flight, so memory stays under part_size * (max_parallel_parts + 1).
+    Bodies smaller than one part go up as a single PUT. Used as an async
+    context manager, the upload is aborted if the block raises.
+    """
+
+    # S3 rejects non-final parts smaller than 5 MiB
+    MIN_PART_SIZE = 5 * 1024 * 1024
+
+    def __init__(
+        self,
+        storage: AsyncStorageService,
+        object_name: str,
+        content_type: str,
+        part_size: int,
+        max_parallel_parts: int,
+    ):
+        self.storage = storage
+        self.object_name = object_name
+        self.content_type = content_type
+        self.part_size = max(part_size, self.MIN_PART_SIZE)
+        self.upload_id: Optional[str] = None
+        self.bytes_written = 0
+        self._buffer = bytearray()
+        self._slots = asyncio.Semaphore(max(1, max_parallel_parts))
+        self._tasks: List[asyncio.Task] = []
+        self._etags: Dict[int, str] = {}
+        self._finished = False
+
+    async def __aenter__(self) -> "MultipartUploadWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            await self.abort()
+
+    async def write(self, data: bytes) -> None:
+        self._raise_failed_parts()
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            await self._start_part(part)
+
+    async def complete(self) -> str:
+        if self.upload_id is None:
+            # Everything fit in one part
+            url = await self.storage.put_object(bytes(self._buffer), self.object_name, self.content_type)
+            self._buffer = bytearray()
+            self._finished = True
+            return url
+
+        if self._buffer or not self._tasks:
+            await self._start_part(bytes(self._buffer))
+            self._buffer = bytearray()
+        await asyncio.gather(*self._tasks)
+        parts = [
+            {"PartNumber": number, "ETag": etag}
+            for number, etag in sorted(self._etags.items())
+        ]
+        url = await self.storage.complete_multipart_upload(self.object_name, self.upload_id, parts)
+        self._finished = True
+        return url
+
+    async def abort(self) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        self._buffer = bytearray()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.upload_id is not None:
+            try:
+                await self.storage.abort_multipart_upload(self.object_name, self.upload_id)
+            except Exception as e:
+                logger.error(f"Failed to abort multipart upload {self.upload_id} for {self.object_name}: {e}")
+
+    async def _start_part(self, body: bytes) -> None:
+        if self.upload_id is None:
+            self.upload_id = await self.storage.create_multipart_upload(self.object_name, self.content_type)
+        await self._slots.acquire()
+        part_number = len(self._tasks) + 1
+        self._tasks.append(asyncio.create_task(self._upload_part(part_number, body)))
+
+    async def _upload_part(self, part_number: int, body: bytes) -> None:
+        try:
+            self._etags[part_number] = await self.storage.upload_part(
+                self.object_name, self.upload_id, part_number, body
+            )
+        finally:
+            self._slots.release()
+
+    def _raise_failed_parts(self) -> None:
+        for task in self._tasks:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+
+storage_service = StorageService(create_backend())
+async_storage_service = AsyncStorageService(storage_service, settings.STORAGE_IO_CONCURRENCY)
+metrics_registry.register("storage_io", async_storage_service.stats)
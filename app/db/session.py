@@ -1,15 +1,24 @@
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from app.core.config import settings
+from app.domains.identity.cache import profile_cache
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
-)
+def make_engine(pool_size: int = 10, max_overflow: int = 20) -> AsyncEngine:
+    """
+    Connections are bound to the event loop they were opened on; each
+    long-lived loop (API, worker runtime, poller) should use its own engine.
+    """
+    return create_async_engine(
+        settings.DATABASE_URL,
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+
+
+engine = make_engine()
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -25,6 +34,8 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         try:
             yield session
             await session.commit()
+            # Cache invalidations registered by the request's writes
+            await profile_cache.flush_marked(session)
         except Exception:
             await session.rollback()
             raise
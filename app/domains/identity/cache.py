@@ -0,0 +1,207 @@
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.core.metrics import metrics_registry
+from app.core.presign import presigned_url_cache
+from app.core.redis import get_redis
+
+# Every invalidated user id is announced here, waking /users/me long-polls
+PROFILE_CHANGES_CHANNEL = "profile-changes"
+
+@dataclass
+class _Entry:
+    payload: str
+    version: int
+    loaded_at: float
+    checked_at: float
+
+
+class ProfileCache:
+    """
+    Read-through cache of serialized /users/me payloads (UserOut JSON).
+
+    Entries are keyed by user, variant (e.g. how many videos are embedded)
+    and presign window, so embedded URLs are always those of the current
+    window. Each user has a version; write paths bump it after commit and
+    every older entry stops being served.
+
+    The in-process tier serves an entry for local_ttl without asking anyone.
+    With use_redis, payloads are shared under a per-user version counter in
+    Redis, which is also how the worker's writes reach the API processes;
+    local entries older than local_ttl are revalidated against it. Without
+    Redis, local_ttl bounds how stale another process's write can leave a
+    payload.
+    """
+
+    REDIS_PREFIX = "profile:"
+
+    def __init__(self, maxsize: int, ttl: int, local_ttl: float, use_redis: bool = False):
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.use_redis = use_redis
+        # user_id -> {(variant, window): _Entry}; one slot per user so that
+        # invalidation drops every variant at once
+        self._local: TTLCache[Dict[Tuple[Hashable, int], _Entry]] = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Loads that started before an invalidation must not store their result
+        self._seq = itertools.count(1)
+        self._invalidated: TTLCache[int] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.loads = 0
+        self.revalidated = 0
+        self.stale = 0
+        self.invalidations = 0
+        self.served = 0
+        self.served_age_total = 0.0
+        self.served_age_max = 0.0
+
+    async def get_or_load(
+        self, user_id: str, variant: Hashable, loader: Callable[[], Awaitable[Optional[str]]]
+    ) -> Optional[str]:
+        """
+        Cached payload, or loader() (whose result is cached unless None).
+        """
+        user_id = str(user_id)
+        now = time.time()
+        window = presigned_url_cache.current_window(now)
+        slot = (variant, window)
+        entries = self._local.get(user_id)
+        entry = entries.get(slot) if entries is not MISSING else None
+
+        if entry is not None and now - entry.checked_at < self.local_ttl:
+            self.local_hits += 1
+            return self._serve(entry, now)
+
+        started = next(self._seq)
+        version = await self._redis_version(user_id) if self.use_redis else 0
+        if entry is not None and self.use_redis and version is not None:
+            if entry.version == version:
+                self.revalidated += 1
+                entry.checked_at = now
+                return self._serve(entry, now)
+            # Another process changed this profile while the entry was served
+            self.stale += 1
+
+        key = f"{self.REDIS_PREFIX}{user_id}:{version}:{variant}:{window}"
+        if self.use_redis and version is not None:
+            payload = await self._redis_call("get", key)
+            if isinstance(payload, str) and payload:
+                self.redis_hits += 1
+                self._store(user_id, slot, _Entry(payload, version, now, now), started)
+                return payload
+
+        self.loads += 1
+        payload = await loader()
+        if payload is None:
+            return None
+        self._store(user_id, slot, _Entry(payload, version or 0, now, now), started)
+        if self.use_redis and version is not None:
+            ttl = int(min(self.ttl, window + presigned_url_cache.window - now))
+            if ttl >= 1:
+                await self._redis_call("set", key, payload, ex=ttl)
+        return payload
+
+    def mark(self, db: AsyncSession, *user_ids: Any) -> None:
+        """
+        Invalidate these users once db commits (see flush_marked). Dropping
+        entries before the commit would let a concurrent reader cache the
+        old rows again.
+        """
+        db.info.setdefault("profile_cache_users", set()).update(str(u) for u in user_ids if u)
+
+    async def flush_marked(self, db: AsyncSession) -> None:
+        user_ids = db.info.pop("profile_cache_users", None)
+        if user_ids:
+            await self.invalidate(*user_ids)
+
+    async def invalidate(self, *user_ids: Any) -> None:
+        """
+        Call after the write is committed.
+        """
+        for user_id in map(str, user_ids):
+            self.invalidations += 1
+            self.drop_local(user_id)
+            if self.use_redis:
+                version_key = f"{self.REDIS_PREFIX}{user_id}:version"
+                # Outlives every payload written under the previous version
+                if await self._redis_call("incr", version_key) is not None:
+                    await self._redis_call("expire", version_key, self.ttl * 2)
+            await self._redis_call("publish", PROFILE_CHANGES_CHANNEL, user_id)
+
+    def drop_local(self, user_id: str) -> None:
+        """
+        Forget this process's entries for a user (e.g. when another process
+        announces a change on PROFILE_CHANGES_CHANNEL).
+        """
+        self._local.pop(user_id)
+        self._invalidated.set(user_id, next(self._seq))
+
+    def _store(self, user_id: str, slot: Tuple[Hashable, int], entry: _Entry, started: int) -> None:
+        invalidated = self._invalidated.get(user_id, 0)
+        if invalidated > started:
+            return
+        entries = self._local.get(user_id)
+        if entries is MISSING:
+            entries = {}
+        else:
+            # Drop entries of past presign windows
+            entries = {s: e for s, e in entries.items() if s[1] == slot[1]}
+        entries[slot] = entry
+        self._local.set(user_id, entries)
+
+    def _serve(self, entry: _Entry, now: float) -> str:
+        age = now - entry.loaded_at
+        self.served += 1
+        self.served_age_total += age
+        self.served_age_max = max(self.served_age_max, age)
+        return entry.payload
+
+    async def _redis_version(self, user_id: str) -> Optional[int]:
+        raw = await self._redis_call("get", f"{self.REDIS_PREFIX}{user_id}:version")
+        if raw is MISSING:
+            return None
+        return int(raw or 0)
+
+    async def _redis_call(self, method: str, *args, **kwargs) -> Any:
+        """
+        Redis errors degrade to a local-only cache instead of failing requests.
+        """
+        try:
+            return await getattr(get_redis(), method)(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"Profile cache Redis {method} failed: {e}")
+            return MISSING if method == "get" else None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.revalidated + self.redis_hits + self.loads
+        return {
+            "users": len(self._local),
+            "redis_enabled": self.use_redis,
+            "local_hits": self.local_hits,
+            "revalidated": self.revalidated,
+            "redis_hits": self.redis_hits,
+            "loads": self.loads,
+            "hit_ratio": round(1 - self.loads / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            # Local entries found outdated when revalidated against Redis
+            "stale": self.stale,
+            # Seconds since the served payload was read from Postgres or Redis
+            "served_age_avg": round(self.served_age_total / self.served, 3) if self.served else None,
+            "served_age_max": round(self.served_age_max, 3),
+        }
+
+
+profile_cache = ProfileCache(
+    maxsize=settings.PROFILE_CACHE_MAX_ENTRIES,
+    ttl=settings.PROFILE_CACHE_TTL,
+    local_ttl=settings.PROFILE_CACHE_LOCAL_TTL,
+    use_redis=settings.PROFILE_CACHE_REDIS,
+)
+metrics_registry.register("profile_cache", profile_cache.stats)
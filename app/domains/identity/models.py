@@ -29,6 +29,8 @@ class UserProfile(Base):
     
     storage_limit = Column(Integer, default=5)
     storage_used = Column(Integer, default=0)
+    # Lifetime count; unlike storage_used it is not decremented on delete
+    videos_created = Column(Integer, default=0, server_default="0", nullable=False)
     
     subscription_tier = Column(String, default="free") # free, pro, ultra
     
@@ -1,78 +1,224 @@
-from typing import Optional
+import string
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from sqlalchemy import exists, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from uuid import UUID
-import httpx
 
 from app.domains.identity.models import User, UserProfile
+from app.domains.vibes.models import Video
 from app.domains.referrals.service import referral_service
 from app.core.config import settings
+from app.core.http import http_clients
+
+REFERRAL_CODE_ALPHABET = string.ascii_uppercase + string.digits
+PROVISION_ATTEMPTS = 3
+
+# User, profile and (optionally) referral in one round trip. The referral
+# code is drawn in SQL from a few random candidates, skipping codes already
+# taken; a code claimed concurrently by another signup makes the profile
+# insert DO NOTHING and the caller retries. All CTEs share one snapshot, so
+# "existed" reflects rows committed before the statement started.
+PROVISION_USER_SQL = text("""
+WITH referrer AS (
+    SELECT user_id FROM userprofile
+    WHERE referral_code = :referred_by_code AND user_id <> :user_id
+),
+new_user AS (
+    INSERT INTO "user" (id, email, is_active, created_at, updated_at)
+    VALUES (:user_id, :email, true, timezone('utc', now()), timezone('utc', now()))
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id
+),
+code AS (
+    SELECT candidate.value FROM (
+        SELECT (
+            SELECT string_agg(substr(:code_alphabet, 1 + floor(random() * length(:code_alphabet))::int, 1), '')
+            FROM generate_series(1, :code_length)
+            WHERE attempt.n IS NOT NULL  -- correlated, so each attempt draws anew
+        ) AS value
+        FROM generate_series(1, 5) AS attempt(n)
+    ) AS candidate
+    WHERE NOT EXISTS (SELECT 1 FROM userprofile p WHERE p.referral_code = candidate.value)
+    LIMIT 1
+),
+new_profile AS (
+    INSERT INTO userprofile (user_id, referral_code, referred_by_id, storage_limit, storage_used, subscription_tier)
+    SELECT :user_id, code.value, (SELECT user_id FROM referrer), :storage_limit, 0, 'free'
+    FROM code
+    ON CONFLICT DO NOTHING
+    RETURNING id
+),
+new_referral AS (
+    INSERT INTO referral (referrer_id, referee_id, is_successful, reward_granted, created_at)
+    SELECT referrer.user_id, :user_id, false, false, timezone('utc', now())
+    FROM referrer
+    WHERE EXISTS (SELECT 1 FROM new_profile)
+    ON CONFLICT (referee_id) DO NOTHING
+)
+SELECT
+    EXISTS (SELECT 1 FROM new_profile) AS created,
+    EXISTS (SELECT 1 FROM userprofile WHERE user_id = :user_id) AS existed
+""")
 
 class UserService:
-    async def get_user_with_profile(self, db: AsyncSession, *, user_id: str) -> Optional[User]:
+    async def get_user_with_profile(
+        self, db: AsyncSession, *, user_id: str, videos_limit: int = 0
+    ) -> Optional[User]:
+        """
+        User and profile, with User.videos set to the videos_limit most recent
+        videos (empty for 0). The full list is paginated via GET /vibes.
+        """
         result = await db.execute(
             select(User)
-            .options(
-                joinedload(User.profile),
-                joinedload(User.videos)
-            )
+            .options(joinedload(User.profile))
             .where(User.id == user_id)
         )
-        result = result.unique()
-        return result.scalar_one_or_none()
+        user = result.scalar_one_or_none()
+        if not user:
+            return None
 
-    async def sync_user_from_supabase(self, db: AsyncSession, *, user_id: str, referred_by_code: Optional[str] = None) -> User:
+        videos = []
+        if videos_limit > 0:
+            result = await db.execute(
+                select(Video)
+                .where(Video.user_id == user.id, Video.deleted_at.is_(None))
+                .order_by(Video.created_at.desc(), Video.id.desc())
+                .limit(videos_limit)
+            )
+            videos = list(result.scalars().all())
+        # Populate without marking the relationship dirty or lazy-loading it
+        set_committed_value(user, "videos", videos)
+        return user
+
+    async def sync_user_from_supabase(
+        self, db: AsyncSession, *, user_id: str, referred_by_code: Optional[str] = None, videos_limit: int = 0
+    ) -> User:
         # Check if exists
-        user = await self.get_user_with_profile(db, user_id=user_id)
-        if user:
+        user = await self.get_user_with_profile(db, user_id=user_id, videos_limit=videos_limit)
+        if user and user.profile:
             # If user exists but referral was provided later, record it if not already referred
             if referred_by_code and not user.profile.referred_by_id:
                 await referral_service.record_signup(db, user_id=user_id, referred_by_code=referred_by_code)
                 await db.commit()
                 # Reload to get updated profile
-                user = await self.get_user_with_profile(db, user_id=user_id)
+                user = await self.get_user_with_profile(db, user_id=user_id, videos_limit=videos_limit)
             return user
 
+        return await self.provision_user(
+            db, user_id=user_id, referred_by_code=referred_by_code, videos_limit=videos_limit
+        )
+
+    async def provision_user(
+        self, db: AsyncSession, *, user_id: str, referred_by_code: Optional[str] = None, videos_limit: int = 0
+    ) -> User:
+        """
+        Create the user, profile and referral attribution in one statement.
+        Safe to race: concurrent first requests of the same user converge on
+        the same rows instead of failing on the unique constraints.
+        """
+        email = await self._fetch_email(user_id)
+        params = {
+            "user_id": UUID(str(user_id)),
+            "email": email,
+            "storage_limit": 5,
+            "code_alphabet": REFERRAL_CODE_ALPHABET,
+            "code_length": settings.REFERRAL_CODE_LENGTH,
+            "referred_by_code": referred_by_code,
+        }
+        for _ in range(PROVISION_ATTEMPTS):
+            row = (await db.execute(PROVISION_USER_SQL, params)).one()
+            if row.created or row.existed:
+                break
+            # Lost a race (referral code taken, or a concurrent insert not yet
+            # visible to this statement's snapshot); a new statement sees it
+        else:
+            raise RuntimeError(f"Could not provision user {user_id}")
+        await db.commit()
+
+        if row.created:
+            # Brand new account: nothing else to load
+            user = await self.get_user_with_profile(db, user_id=user_id)
+        else:
+            user = await self.get_user_with_profile(db, user_id=user_id, videos_limit=videos_limit)
+        return user
+
+    async def bulk_upsert(self, db: AsyncSession, users: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        Insert many users (dicts with id, email, full_name) and their missing
+        profiles with multi-row INSERT ... ON CONFLICT DO NOTHING; existing rows
+        are left untouched. Returns (users_created, profiles_created).
+        """
+        if not users:
+            return 0, 0
+        now = datetime.utcnow()
+        result = await db.execute(
+            pg_insert(User)
+            .values([
+                {**user, "is_active": True, "created_at": now, "updated_at": now}
+                for user in users
+            ])
+            .on_conflict_do_nothing()
+            .returning(User.id)
+        )
+        users_created = len(result.all())
+
+        ids = [user["id"] for user in users]
+        # Users skipped above (e.g. email taken by another id) get no profile
+        missing_profiles = (
+            select(User.id)
+            .where(User.id.in_(ids), ~exists().where(UserProfile.user_id == User.id))
+        )
+        profiles_created = 0
+        for _ in range(PROVISION_ATTEMPTS):
+            missing = (await db.execute(missing_profiles)).scalars().all()
+            if not missing:
+                break
+            result = await db.execute(
+                pg_insert(UserProfile)
+                .values([
+                    {
+                        "user_id": user_id,
+                        "referral_code": referral_service.generate_code(settings.REFERRAL_CODE_LENGTH),
+                        "storage_limit": 5,
+                        "storage_used": 0,
+                        "subscription_tier": "free",
+                    }
+                    for user_id in missing
+                ])
+                # Rows whose referral code is taken are skipped and retried
+                .on_conflict_do_nothing()
+                .returning(UserProfile.user_id)
+            )
+            profiles_created += len(result.all())
+        else:
+            missing = (await db.execute(missing_profiles)).scalars().all()
+            if missing:
+                logger.warning(f"Could not create profiles for {len(missing)} users")
+        return users_created, profiles_created
+
+    async def _fetch_email(self, user_id: str) -> str:
         # Retrieve user info from Supabase Admin API
         user_email = f"user_{user_id}@example.com" # Fallback
-        
         try:
             headers = {
                 "apikey": settings.SUPABASE_SECRET_KEY,
                 "Authorization": f"Bearer {settings.SUPABASE_SECRET_KEY}"
             }
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{settings.SUPABASE_URL}/auth/v1/admin/users/{user_id}",
-                    headers=headers
-                )
-                if response.status_code == 200:
-                    user_data = response.json()
-                    user_email = user_data.get("email", user_email)
+            response = await http_clients.get("supabase").get(
+                f"/auth/v1/admin/users/{user_id}",
+                headers=headers
+            )
+            if response.status_code == 200:
+                user_data = response.json()
+                user_email = user_data.get("email", user_email)
         except Exception as e:
-            print(f"Error fetching user from Supabase Admin API: {e}")
-
-        new_user = User(id=user_id, email=user_email)
-        db.add(new_user)
-        await db.flush()
-
-        # Create Profile
-        referral_code = referral_service.generate_code()
-        profile = UserProfile(
-            user_id=user_id,
-            referral_code=referral_code,
-            storage_limit=5
-        )
-        db.add(profile)
-        
-        # 3. Record referral attribution if provided
-        if referred_by_code:
-            await referral_service.record_signup(db, user_id=user_id, referred_by_code=referred_by_code)
-        
-        await db.commit()
-        
-        # Return fully loaded user
-        return await self.get_user_with_profile(db, user_id=user_id)
+            logger.error(f"Error fetching user from Supabase Admin API: {e}")
+        return user_email
 
 user_service = UserService()
@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlalchemy import JSON, BigInteger, Column, DateTime, String
+
+from app.db.base_class import Base
+
+
+class OutboxMessage(Base):
+    """
+    A Celery task written in the same transaction as the rows it is about.
+    The relay (app.tasks.outbox) publishes it after commit and deletes it.
+    """
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    task_id = Column(String, nullable=False)
+    task_name = Column(String, nullable=False)
+    args = Column(JSON, nullable=False, default=list)
+    kwargs = Column(JSON, nullable=False, default=dict)
+    created_at = Column(DateTime, default=datetime.utcnow)
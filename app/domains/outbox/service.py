@@ -0,0 +1,24 @@
+from uuid import uuid4
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.domains.outbox.models import OutboxMessage
+
+# LISTEN channel the relay wakes up on; the notification is delivered on commit
+OUTBOX_CHANNEL = "outbox"
+
+
+class OutboxService:
+    async def enqueue(self, db: AsyncSession, task, *args, **kwargs) -> str:
+        """
+        Schedule task(*args, **kwargs) to be sent once db commits; nothing is
+        sent if it rolls back. Returns the Celery task id.
+        """
+        task_id = str(uuid4())
+        db.add(OutboxMessage(task_id=task_id, task_name=task.name, args=list(args), kwargs=kwargs))
+        await db.execute(text(f"NOTIFY {OUTBOX_CHANNEL}"))
+        return task_id
+
+
+outbox_service = OutboxService()
@@ -1,13 +1,12 @@
 import random
 import string
-from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func
 
 from app.domains.referrals.models import Referral
 from app.domains.identity.models import UserProfile, User
-from app.domains.vibes.models import Video
+from app.domains.identity.cache import profile_cache
 
 class ReferralService:
     def generate_code(self, length: int = 7) -> str:
@@ -75,32 +74,8 @@ class ReferralService:
         user_profile = user_profile_result.scalar_one_or_none()
         if user_profile:
             user_profile.referred_by_id = referrer_profile.user_id
-
-    async def check_and_activate_referral(self, db: AsyncSession, *, referee_id: str) -> None:
-        """
-        Called when a user creates their first video.
-        """
-        result = await db.execute(
-            select(Referral).where(Referral.referee_id == referee_id, Referral.is_successful == False)
-        )
-        referral = result.scalar_one_or_none()
-        
-        if not referral:
-            return
-
-        # Check if this is truly the first video
-        result = await db.execute(
-            select(func.count(Video.id)).where(Video.user_id == referee_id)
-        )
-        video_count = result.scalar() or 0
-        
-        if video_count == 1:
-            referral.is_successful = True
-            referral.successful_at = datetime.utcnow()
-            await db.commit()
-            
-            # Logic for rewarding can be triggered here or via a task
-            # self.apply_rewards(db, referral.referrer_id)
+        # Committed by the caller; get_db invalidates after the commit
+        profile_cache.mark(db, user_id)
 
     async def claim_rewards(self, db: AsyncSession, *, user_id: str) -> dict:
         # Credits are removed. This could be revamped for other perks later.
@@ -0,0 +1,320 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import metrics_registry
+from app.core.redis import get_redis
+from app.domains.identity.cache import PROFILE_CHANGES_CHANNEL, profile_cache
+from app.schemas.vibes import VideoStatusEvent
+
+VIDEO_EVENTS_CHANNEL = "video-events"
+# Streams end once one of these is sent
+FINAL_STATUSES = {"ready", "failed", "deleted"}
+# Reconnect delay suggested to EventSource clients, in ms
+RETRY_MS = 3000
+
+# Append the event to the video's history (what resuming clients replay)
+# and announce it with its stream id as "<video_id> <event_id> <json>"
+PUBLISH_EVENT = """
+local id = redis.call('xadd', KEYS[1], 'MAXLEN', ARGV[3], '*', 'data', ARGV[1])
+redis.call('expire', KEYS[1], ARGV[2])
+redis.call('publish', KEYS[2], ARGV[4] .. ' ' .. id .. ' ' .. ARGV[1])
+return id
+"""
+
+
+def event_payload(video: Any) -> Dict[str, Any]:
+    """
+    Event body for a Video, or any row with the same columns.
+    """
+    return {
+        "id": str(video.id),
+        "status": video.status,
+        "video_url": video.video_url,
+        "thumbnail_url": video.thumbnail_url,
+    }
+
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    (ms, seq) of a Redis stream id such as "1718000000000-0"; None if invalid.
+    """
+    try:
+        ms, seq = event_id.split("-")
+        return int(ms), int(seq)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _sse(event_id: str, data: str) -> str:
+    # Stored URLs are presigned as the event goes out, as in GET /vibes/{id}
+    body = VideoStatusEvent.model_validate_json(data).model_dump_json()
+    return f"id: {event_id}\nevent: status\ndata: {body}\n\n"
+
+
+class VideoEventHub:
+    """
+    Video status changes pushed to server-sent event streams.
+
+    Writers (worker, poller, webhook, delete) publish after they commit.
+    Each event is appended to a short per-video Redis stream, which is what
+    a client reconnecting with Last-Event-ID replays, and announced on one
+    pub/sub channel. Every API process holds a single subscription to that
+    channel and fans events out to its open streams by video id. Streams
+    send a heartbeat comment every `heartbeat` seconds, end after
+    max_duration (the client reconnects and resumes) and are capped per
+    process and per user.
+
+    Long-polls (GET /vibes/{id}?wait=, /users/me?wait=) wait on the same
+    subscription; profile changes announced by ProfileCache.invalidate are
+    delivered under "user:{id}".
+    """
+
+    def __init__(
+        self,
+        history: int,
+        ttl: int,
+        heartbeat: float,
+        max_duration: float,
+        max_connections: int,
+        max_per_user: int,
+    ):
+        self.history = history
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        self.max_duration = max_duration
+        self.max_connections = max_connections
+        self.max_per_user = max_per_user
+        self._queues: Dict[str, Set[asyncio.Queue]] = {}
+        self._per_user: Dict[str, int] = {}
+        self._connections = 0
+        self._listener: Optional[asyncio.Task] = None
+        self.published = 0
+        self.publish_errors = 0
+        self.received = 0
+        self.delivered = 0
+        self.resubscribes = 0
+        self.rejected = 0
+
+    # --- Writers ----------------------------------------------------------
+
+    async def publish(self, *events: Dict[str, Any]) -> None:
+        """
+        Announce committed status changes. Best effort: a client that misses
+        one still sees the state on its next reconnect or GET.
+        """
+        if not events:
+            return
+        try:
+            redis = get_redis()
+            publish_event = redis.register_script(PUBLISH_EVENT)
+            pipe = redis.pipeline(transaction=False)
+            for event in events:
+                await publish_event(
+                    keys=[f"video:events:{event['id']}", VIDEO_EVENTS_CHANNEL],
+                    args=[json.dumps(event), self.ttl, self.history, event["id"]],
+                    client=pipe,
+                )
+            await pipe.execute()
+            self.published += len(events)
+        except Exception as e:
+            self.publish_errors += 1
+            logger.warning(f"Publishing {len(events)} video events failed: {e}")
+
+    # --- Readers ----------------------------------------------------------
+
+    async def latest_id(self, video_id: str) -> str:
+        try:
+            entries = await get_redis().xrevrange(f"video:events:{video_id}", count=1)
+        except Exception as e:
+            logger.warning(f"Video event history unavailable: {e}")
+            raise HTTPException(status_code=503, detail="Event streams unavailable; poll instead")
+        return entries[0][0] if entries else "0-0"
+
+    async def events_after(self, video_id: str, event_id: str) -> List[Tuple[str, str]]:
+        entries = await get_redis().xrange(f"video:events:{video_id}", min=event_id)
+        return [(entry_id, fields["data"]) for entry_id, fields in entries if entry_id != event_id]
+
+    def check_capacity(self, user_id: str) -> None:
+        if self._connections >= self.max_connections:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Too many event streams; poll instead")
+        if self._per_user.get(user_id, 0) >= self.max_per_user:
+            self.rejected += 1
+            raise HTTPException(status_code=429, detail="Too many open event streams")
+
+    @asynccontextmanager
+    async def subscribe(self, key: str, user_id: str) -> AsyncIterator[asyncio.Queue]:
+        """
+        Queue of (event_id, data) for a video id, or of user ids for
+        "user:{id}". None is queued after the process (re)subscribes to
+        Redis: events may have been missed and should be replayed from the
+        stream.
+        """
+        self.check_capacity(user_id)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        queue: asyncio.Queue = asyncio.Queue()
+        self._queues.setdefault(key, set()).add(queue)
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        self._connections += 1
+        try:
+            yield queue
+        finally:
+            self._connections -= 1
+            self._per_user[user_id] -= 1
+            if not self._per_user[user_id]:
+                del self._per_user[user_id]
+            queues = self._queues[key]
+            queues.discard(queue)
+            if not queues:
+                del self._queues[key]
+
+    @asynccontextmanager
+    async def watch(self, key: str, user_id: str, enabled: bool = True) -> AsyncIterator[Optional[asyncio.Queue]]:
+        """
+        subscribe() for long-polls; None when disabled or over the
+        connection limits, in which case the request answers right away.
+        """
+        if enabled:
+            try:
+                self.check_capacity(user_id)
+            except HTTPException:
+                enabled = False
+        if not enabled:
+            yield None
+            return
+        async with self.subscribe(key, user_id) as queue:
+            yield queue
+
+    async def wait(self, queue: asyncio.Queue, timeout: float) -> bool:
+        """
+        Wait up to timeout for anything on queue; False on timeout.
+        """
+        try:
+            await asyncio.wait_for(queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        # Several events may arrive together; one re-read covers them all
+        while not queue.empty():
+            queue.get_nowait()
+        return True
+
+    async def stream(
+        self, video: Any, user_id: str, since: str, resumed: bool
+    ) -> AsyncIterator[str]:
+        """
+        SSE messages for one video. A new stream starts with the video's
+        current state, labelled with `since` (the stream id read before the
+        video was loaded); a resumed one replays what came after `since`.
+        Either way the stream follows live events until a final status.
+        """
+        video_id = str(video.id)
+        snapshot = VideoStatusEvent.model_validate(video, from_attributes=True)
+        deadline = time.monotonic() + self.max_duration
+        try:
+            async with self.subscribe(video_id, user_id) as queue:
+                yield f"retry: {RETRY_MS}\n\n"
+                missed = await self.events_after(video_id, since)
+                if not resumed or (not missed and video.status in FINAL_STATUSES):
+                    # History may have expired; the stored state is still accurate
+                    yield f"id: {since}\nevent: status\ndata: {snapshot.model_dump_json()}\n\n"
+                    if video.status in FINAL_STATUSES:
+                        return
+                pending = missed
+                while True:
+                    for event_id, data in pending:
+                        if parse_event_id(event_id) <= parse_event_id(since):
+                            continue
+                        since = event_id
+                        self.delivered += 1
+                        yield _sse(event_id, data)
+                        if json.loads(data).get("status") in FINAL_STATUSES:
+                            return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout=min(self.heartbeat, remaining))
+                    except asyncio.TimeoutError:
+                        pending = []
+                        yield ": ping\n\n"
+                        continue
+                    pending = await self.events_after(video_id, since) if item is None else [item]
+        except HTTPException as e:
+            # Over the limit after the route's capacity check passed
+            yield f"event: error\ndata: {json.dumps({'detail': e.detail})}\n\n"
+
+    async def _listen(self) -> None:
+        delay = 0.5
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(VIDEO_EVENTS_CHANNEL, PROFILE_CHANGES_CHANNEL)
+                delay = 0.5
+                self.resubscribes += 1
+                # Anything published before this point is only in the streams
+                for queues in self._queues.values():
+                    for queue in queues:
+                        queue.put_nowait(None)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._dispatch(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Video event subscription lost ({e}); retrying in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def _dispatch(self, channel: str, message: str) -> None:
+        self.received += 1
+        if channel == PROFILE_CHANGES_CHANNEL:
+            # Changed by another process: local entries must not be served until local_ttl
+            profile_cache.drop_local(message)
+            for queue in self._queues.get(f"user:{message}", ()):
+                queue.put_nowait(message)
+            return
+        video_id, event_id, data = message.split(" ", 2)
+        for queue in self._queues.get(video_id, ()):
+            queue.put_nowait((event_id, data))
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": self._connections,
+            "videos": len(self._queues),
+            "published": self.published,
+            "publish_errors": self.publish_errors,
+            "received": self.received,
+            "delivered": self.delivered,
+            "resubscribes": self.resubscribes,
+            "rejected": self.rejected,
+        }
+
+
+video_event_hub = VideoEventHub(
+    history=settings.VIDEO_EVENTS_HISTORY,
+    ttl=settings.VIDEO_EVENTS_TTL,
+    heartbeat=settings.VIDEO_EVENTS_HEARTBEAT,
+    max_duration=settings.VIDEO_EVENTS_MAX_DURATION,
+    max_connections=settings.VIDEO_EVENTS_MAX_CONNECTIONS,
+    max_per_user=settings.VIDEO_EVENTS_MAX_PER_USER,
+)
+metrics_registry.register("video_events", video_event_hub.stats)
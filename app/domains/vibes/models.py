@@ -1,7 +1,7 @@
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime, ForeignKey, String, Integer
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, String, Integer, text
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import relationship
 
@@ -25,5 +25,53 @@ class Video(Base):
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Set on delete; the row is purged once its files are gone from storage
+    deleted_at = Column(DateTime, nullable=True)
 
     user = relationship("app.domains.identity.models.User", back_populates="videos")
+
+    __table_args__ = (
+        # Serves per-user listings newest-first and their keyset cursors
+        Index("ix_video_user_id_created_at", user_id, created_at.desc(), id.desc()),
+        # Provider job ids are unique; looked up by the poller and webhooks
+        Index("ix_video_replicate_job_id", replicate_job_id, unique=True),
+        # Only in-flight videos: the stuck-job reaper and queue-age metrics
+        Index(
+            "ix_video_active_updated_at",
+            status,
+            updated_at,
+            postgresql_where=text("status IN ('pending', 'processing')"),
+        ),
+    )
+
+
+class WebhookEvent(Base):
+    """
+    One row per provider event applied; a redelivered event hits the
+    primary key and is dropped without touching the video.
+    """
+    id = Column(String, primary_key=True)  # {provider}:{request_id}
+    video_id = Column(PG_UUID(as_uuid=True), nullable=True)
+    status = Column(String, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow)
+
+
+class StorageDeletion(Base):
+    """
+    A storage object waiting to be deleted by the garbage collector
+    (app.tasks.storage). Failed deletes are retried at next_attempt_at;
+    after STORAGE_GC_MAX_ATTEMPTS the row stays as a dead letter (dead_at).
+    """
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    url = Column(String, nullable=False)  # As stored on the video; foreign URLs are skipped
+    video_id = Column(PG_UUID(as_uuid=True), nullable=True)  # None for swept orphans
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String, nullable=True)
+    dead_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_storagedeletion_due", next_attempt_at, postgresql_where=text("dead_at IS NULL")),
+        Index("ix_storagedeletion_video_id", video_id),
+    )
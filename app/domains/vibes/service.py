@@ -1,127 +1,276 @@
+import base64
 import httpx
-from urllib.parse import urlparse
-from typing import Optional
-from uuid import UUID
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+from uuid import UUID, uuid4
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import delete
+from sqlalchemy import or_, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from loguru import logger
 
-from app.domains.vibes.models import Video
+from app.domains.vibes.models import Video, WebhookEvent
 from app.domains.identity.models import UserProfile
 from app.schemas.vibes import VideoCreate, WebhookData
 from app.tasks.vibes import run_video_generation_task
-from app.domains.referrals.service import referral_service
-from app.core.storage import storage_service
+from app.tasks.poller import extract_video_url
+from app.tasks.storage import collect_storage_task
+from app.core.config import settings
+from app.core.etag import make_etag
+from app.core.metrics import metrics_registry
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.cache import profile_cache
+from app.domains.outbox.service import outbox_service
+from app.domains.vibes.events import event_payload, video_event_hub
 from fastapi import HTTPException
 
+VIDEO_STATUSES = ("pending", "processing", "ready", "failed")
+
+# Quota check, reservation, referral activation and insert in one round trip.
+# The UPDATE only matches while the profile is under its limit; it row-locks
+# the profile, so concurrent requests re-check against the committed count.
+# The user's first video ever (videos_created reaching 1) marks their pending
+# referral successful. The INSERT only runs if a slot was reserved.
+CREATE_VIDEO_SQL = text("""
+WITH reserved AS (
+    UPDATE userprofile
+    SET storage_used = storage_used + 1, videos_created = videos_created + 1
+    WHERE user_id = :user_id AND storage_used < storage_limit
+    RETURNING user_id, videos_created
+),
+activated AS (
+    UPDATE referral SET is_successful = true, successful_at = :now
+    FROM reserved
+    WHERE referral.referee_id = reserved.user_id
+      AND reserved.videos_created = 1
+      AND referral.is_successful = false
+    RETURNING referral.referrer_id
+)
+INSERT INTO video (id, user_id, title, prompt, quality, status, created_at, updated_at)
+SELECT :id, user_id, :title, :prompt, :quality, 'pending', :now, :now FROM reserved
+RETURNING *
+""")
+
+# Soft-deletes the row, releases its quota slot and queues its files for the
+# storage garbage collector in one round trip
+DELETE_VIDEO_SQL = text("""
+WITH gone AS (
+    UPDATE video SET deleted_at = :now, updated_at = :now
+    WHERE id = :video_id AND user_id = :user_id AND deleted_at IS NULL
+    RETURNING id, user_id, video_url, thumbnail_url
+),
+released AS (
+    UPDATE userprofile SET storage_used = userprofile.storage_used - 1
+    FROM gone
+    WHERE userprofile.user_id = gone.user_id AND userprofile.storage_used > 0
+    RETURNING userprofile.storage_used
+),
+queued AS (
+    INSERT INTO storagedeletion (url, video_id, attempts, next_attempt_at, created_at)
+    SELECT url, gone.id, 0, :now, :now
+    FROM gone, unnest(ARRAY[gone.video_url, gone.thumbnail_url]) AS url
+    WHERE url IS NOT NULL
+    RETURNING id
+)
+SELECT (SELECT count(*) FROM gone) AS deleted,
+       (SELECT storage_used FROM released) AS storage_used,
+       (SELECT count(*) FROM queued) AS queued
+""")
+
+# Age of in-flight videos since creation, per status; served from
+# ix_video_active_updated_at, whose predicate matches this WHERE
+VIDEO_QUEUE_AGE_SQL = text("""
+SELECT status, count(*) AS count,
+       percentile_cont(ARRAY[0.5, 0.9, 0.99]) WITHIN GROUP (ORDER BY extract(epoch FROM :now - created_at)) AS ages,
+       max(extract(epoch FROM :now - created_at)) AS max_age
+FROM video
+WHERE status IN ('pending', 'processing') AND deleted_at IS NULL
+GROUP BY status
+""")
+
+def encode_video_cursor(video: Video) -> str:
+    """
+    Opaque keyset cursor for the (created_at, id) position of a video.
+    """
+    raw = f"{video.created_at.isoformat()}|{video.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_video_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, video_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(video_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def video_etag(video: Video) -> str:
+    """
+    ETag of a video's GET representation.
+    """
+    return make_etag(video.id, video.status, video.updated_at.isoformat() if video.updated_at else "")
+
 class VibeService:
     async def initiate_generation(
         self, db: AsyncSession, *, user_id: str, vibe_in: VideoCreate
     ) -> Video:
-        # 0. Fetch profile for quota/metadata
-        result = await db.execute(select(UserProfile).where(UserProfile.user_id == user_id))
-        profile = result.scalar_one_or_none()
-        
-        if not profile:
-            raise HTTPException(status_code=404, detail="User profile not found")
-
-        # 2. Check storage quota
-        if profile.storage_used >= profile.storage_limit:
-            raise HTTPException(status_code=429, detail="Storage limit reached")
-        # 4. Create Video record
-        video = Video(
-            user_id=user_id,
-            title=vibe_in.title,
-            prompt=vibe_in.prompt,
-            quality=vibe_in.quality,
-            status="pending"
+        # 1. Reserve a storage slot, activate a pending referral on the first
+        #    video and create the Video record
+        now = datetime.utcnow()
+        result = await db.execute(
+            select(Video).from_statement(CREATE_VIDEO_SQL),
+            {
+                "id": uuid4(),
+                "user_id": user_id,
+                "title": vibe_in.title,
+                "prompt": vibe_in.prompt,
+                "quality": vibe_in.quality,
+                "now": now,
+            },
         )
-        db.add(video)
-        profile.storage_used += 1
-        await db.flush()
-
-        # 5. Check if this is the first video for referral activation
-        await referral_service.check_and_activate_referral(db, referee_id=user_id)
+        video = result.scalar_one_or_none()
+        if video is None:
+            # Only failed requests pay for telling the two cases apart
+            profile_id = await db.scalar(select(UserProfile.user_id).where(UserProfile.user_id == user_id))
+            if profile_id is None:
+                raise HTTPException(status_code=404, detail="User profile not found")
+            raise HTTPException(status_code=429, detail="Storage limit reached")
+        profile_cache.mark(db, user_id)
 
-        # 6. Dispatch Celery Task
-        run_video_generation_task.delay(str(video.id))
+        # 2. Dispatch Celery Task once the video row is committed
+        await outbox_service.enqueue(db, run_video_generation_task, str(video.id))
         
         return video
 
     async def get_video(self, db: AsyncSession, video_id: UUID, user_id: str) -> Optional[Video]:
         result = await db.execute(
-            select(Video).where(Video.id == video_id, Video.user_id == user_id)
+            select(Video).where(Video.id == video_id, Video.user_id == user_id, Video.deleted_at.is_(None))
         )
         return result.scalar_one_or_none()
 
-    async def process_webhook(self, db: AsyncSession, data: WebhookData) -> None:
-        # data.id would be replicate_job_id
+    async def list_videos(
+        self,
+        db: AsyncSession,
+        *,
+        user_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        statuses: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Video], Optional[str]]:
+        """
+        One page of a user's videos, newest first, and the cursor of the next
+        page (None on the last page). Keyset pagination over (created_at, id)
+        walks ix_video_user_id_created_at, so every page costs the same.
+        """
+        query = select(Video).where(Video.user_id == user_id, Video.deleted_at.is_(None))
+        if statuses:
+            query = query.where(Video.status.in_(statuses))
+        if cursor:
+            created_at, video_id = decode_video_cursor(cursor)
+            query = query.where(tuple_(Video.created_at, Video.id) < tuple_(created_at, video_id))
         result = await db.execute(
-            select(Video).where(Video.replicate_job_id == data.id)
+            query.order_by(Video.created_at.desc(), Video.id.desc()).limit(limit + 1)
         )
-        video = result.scalar_one_or_none()
-        
-        if not video:
-            return
-
-        if data.status == "succeeded":
-            video.status = "ready"
-            video.video_url = data.output
-            # In a real app, you might also trigger thumbnail generation here
-        elif data.status == "failed":
-            video.status = "failed"
-            # In a real app, you might refund credits here
-        
+        videos = list(result.scalars().all())
+        if len(videos) <= limit:
+            return videos, None
+        videos = videos[:limit]
+        return videos, encode_video_cursor(videos[-1])
+
+    async def process_webhook(self, db: AsyncSession, *, video_id: UUID, data: WebhookData) -> bool:
+        """
+        Apply a fal.ai completion event; False if it was dropped.
+
+        The event is recorded in webhookevent in the same transaction as the
+        update, so a redelivery conflicts on its key and stops there. The
+        update only moves a video that is still pending/processing and
+        belongs to this request, so a late or out-of-order event cannot
+        overwrite a result the poller (or an earlier event) already wrote.
+        """
+        event_id = f"fal:{data.request_id}"
+        recorded = await db.execute(
+            pg_insert(WebhookEvent)
+            .values(id=event_id, video_id=video_id, status=data.status, received_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=[WebhookEvent.id])
+            .returning(WebhookEvent.id)
+        )
+        if recorded.scalar_one_or_none() is None:
+            logger.info(f"Duplicate webhook {event_id} dropped")
+            return False
+
+        video_url = extract_video_url(data.payload or {}) if data.status.upper() == "OK" else None
+        changes = {
+            "status": "ready" if video_url else "failed",
+            # The webhook can beat the worker's commit of the request id
+            "replicate_job_id": data.request_id,
+            "updated_at": datetime.utcnow(),
+        }
+        if video_url:
+            changes["video_url"] = video_url
+        else:
+            logger.error(f"fal.ai job {data.request_id} for video {video_id} failed: {data.error or data.status}")
+        result = await db.execute(
+            update(Video)
+            .where(
+                Video.id == video_id,
+                Video.status.in_(("pending", "processing")),
+                Video.deleted_at.is_(None),
+                or_(Video.replicate_job_id == data.request_id, Video.replicate_job_id.is_(None)),
+            )
+            .values(**changes)
+            .returning(Video.id, Video.user_id, Video.status, Video.video_url, Video.thumbnail_url)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.one_or_none()
         await db.commit()
 
+        if row is None:
+            logger.info(f"Webhook {event_id} matched no in-flight video {video_id}")
+            return False
+        await profile_cache.invalidate(row.user_id)
+        await video_event_hub.publish(event_payload(row))
+        return True
+
     async def delete_video(self, db: AsyncSession, video_id: UUID, user_id: str) -> bool:
-        video = await self.get_video(db, video_id=video_id, user_id=user_id)
-        if not video:
+        """
+        Soft-delete a video and release its quota slot. Its files are
+        removed from storage afterwards by the garbage collector
+        (app.tasks.storage), which is enqueued in the same transaction.
+        """
+        result = await db.execute(
+            DELETE_VIDEO_SQL, {"video_id": video_id, "user_id": user_id, "now": datetime.utcnow()}
+        )
+        deleted, storage_used, queued = result.one()
+        if not deleted:
             logger.warning(f"Delete attempted for non-existent video: {video_id}")
             raise HTTPException(status_code=404, detail="Video not found")
-        
-        logger.info(f"Deleting video {video_id} for user {user_id}")
-
-        # 1. Delete from B2 if applicable
-        for url_attr in ["video_url", "thumbnail_url"]:
-            url = getattr(video, url_attr)
-            if url and "backblazeb2.com" in url:
-                try:
-                    parsed = urlparse(url)
-                    # The key is the path after the bucket name, but in B2 S3 API,
-                    # the bucket is often part of the hostname or first path part.
-                    # Our storage service handles the bucket name via settings.
-                    # We just need the actual object key.
-                    key = parsed.path.lstrip('/')
-                    # If the URL is bucket.endpoint/key, we might need to strip bucket if it's there
-                    # But usually lstrip('/') is enough for the key if we use the right endpoint.
-                    storage_service.delete_file(key)
-                    logger.info(f"Deleted {url_attr} from B2: {key}")
-                except Exception as e:
-                    logger.error(f"Error deleting {url_attr} from B2: {e}")
-
-        # 2. Update storage count first (while video object is still in session)
-        result = await db.execute(select(UserProfile).where(UserProfile.user_id == user_id))
-        profile = result.scalar_one_or_none()
-        if profile and profile.storage_used > 0:
-            profile.storage_used -= 1
-            logger.info(f"Updated storage_used for user {user_id}: {profile.storage_used}")
-
-        # 3. Delete from DB using raw SQL to ensure persistence bypasses any ORM session weirdness
-        await db.execute(delete(Video).where(Video.id == video_id))
-        
-        # Force immediate commit within the service
+        if queued:
+            await outbox_service.enqueue(db, collect_storage_task)
         await db.commit()
-        
-        # Expire the user in the session so that the next fetch for 'profile' 
-        # (which includes videos) is forced to reload from the DB.
-        result = await db.execute(select(UserProfile).where(UserProfile.user_id == user_id))
-        profile = result.scalar_one_or_none()
-        if profile:
-             db.expire(profile)
-
-        logger.info(f"Video {video_id} permanently deleted and committed.")
+        await profile_cache.invalidate(user_id)
+        await video_event_hub.publish({"id": str(video_id), "status": "deleted"})
+
+        logger.info(
+            f"Video {video_id} deleted ({queued} files queued); storage_used for user {user_id}: {storage_used}"
+        )
         return True
 
+async def video_queue_stats() -> dict:
+    """
+    Count and age percentiles (seconds) of pending and processing videos.
+    """
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(VIDEO_QUEUE_AGE_SQL, {"now": datetime.utcnow()})).all()
+    stats = {status: {"count": 0} for status in ("pending", "processing")}
+    for row in rows:
+        p50, p90, p99 = row.ages
+        stats[row.status] = {
+            "count": row.count,
+            "age_p50": round(p50, 1),
+            "age_p90": round(p90, 1),
+            "age_p99": round(p99, 1),
+            "age_max": round(float(row.max_age), 1),
+        }
+    return stats
+
 vibe_service = VibeService()
+metrics_registry.register("video_queue", video_queue_stats, ttl=settings.METRICS_DB_TTL)
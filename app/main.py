@@ -1,18 +1,45 @@
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+import hmac
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Depends, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 import time
 from loguru import logger
 
 from app.core.config import settings
+from app.core.http import http_clients
+from app.core.metrics import metrics_registry
+from app.core.redis import close_redis
+from app.core.storage import async_storage_service
+from app.domains.vibes.events import video_event_hub
 from app.api.v1 import vibes, users, referrals, payments, storage
+from app.tasks.outbox import outbox_relay
 from app.schemas.responses import UnifiedResponse, ErrorResponse
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stop_relay = asyncio.Event()
+    relay = asyncio.create_task(outbox_relay.run(stop_relay)) if settings.OUTBOX_RELAY_IN_API else None
+    yield
+    if relay is not None:
+        stop_relay.set()
+        await relay
+    await video_event_hub.close()
+    # Shared outbound pools live for the whole process
+    await http_clients.aclose()
+    await close_redis()
+    async_storage_service.shutdown()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # CORS configuration
@@ -74,3 +101,18 @@ app.include_router(storage.router, prefix=f"{settings.API_V1_STR}/storage", tags
 @app.get("/", tags=["health"])
 async def root():
     return {"status": "success", "message": "VibeVids API is alive"}
+
+def require_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """
+    /metrics exposes internals and runs database queries: only scrapers
+    holding METRICS_TOKEN may read it.
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if not authorization or not hmac.compare_digest(authorization.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+@app.get("/metrics", tags=["health"], dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    return UnifiedResponse(data=await metrics_registry.snapshot())
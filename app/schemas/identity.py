@@ -1,6 +1,6 @@
 from typing import Optional, List
-from app.schemas.vibes import VideoOut
-from pydantic import BaseModel, EmailStr
+from app.schemas.vibes import VideoOut, warm_video_urls
+from pydantic import BaseModel, EmailStr, validator
 from uuid import UUID
 
 class TokenPayload(BaseModel):
@@ -35,5 +35,10 @@ class UserOut(UserBase):
     profile: Optional[UserProfileBase] = None
     videos: List[VideoOut] = []
 
+    @validator("videos", pre=True)
+    def presign_video_urls(cls, v):
+        warm_video_urls(v)
+        return v
+
     class Config:
         from_attributes = True
@@ -17,6 +17,13 @@ class UnifiedResponse(BaseModel, Generic[T]):
     meta: Meta = Field(default_factory=Meta)
 
 
+def unified_json(data_json: str) -> str:
+    """
+    UnifiedResponse JSON around an already serialized data payload (cached responses).
+    """
+    return f'{{"status":"success","data":{data_json},"meta":{Meta().model_dump_json()}}}'
+
+
 class ErrorResponse(BaseModel):
     status: str = "error"
     message: str
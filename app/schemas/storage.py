@@ -0,0 +1,32 @@
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+
+class MultipartStart(BaseModel):
+    filename: str
+    content_type: str
+
+class MultipartStartOut(BaseModel):
+    upload_id: str
+    object_name: str
+    file_url: str
+    part_size: int
+
+class MultipartPartUrlsRequest(BaseModel):
+    object_name: str
+    upload_id: str
+    part_numbers: List[int] = Field(..., min_length=1, max_length=100)
+
+class MultipartPart(BaseModel):
+    part_number: int = Field(..., ge=1, le=10000)
+    etag: str
+
+class MultipartUploadedPart(MultipartPart):
+    size: Optional[int] = None
+
+class MultipartComplete(BaseModel):
+    object_name: str
+    upload_id: str
+    parts: List[MultipartPart] = Field(..., min_length=1)
+
+class MultipartPartUrlsOut(BaseModel):
+    urls: Dict[int, str]
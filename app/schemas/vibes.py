@@ -1,7 +1,40 @@
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, validator
 from uuid import UUID
 from datetime import datetime
+from loguru import logger
+
+from app.core.presign import storage_object_key, presigned_url_cache
+
+def warm_video_urls(videos) -> None:
+    """
+    Sign all uncached video URLs of a list in one batch, so that each
+    VideoOut validator that follows hits the presign cache.
+    """
+    try:
+        urls = [
+            video.get("video_url") if isinstance(video, dict) else getattr(video, "video_url", None)
+            for video in videos or []
+        ]
+        presigned_url_cache.warm(key for key in map(storage_object_key, urls) if key)
+    except Exception as e:
+        # The validators sign what is still missing one by one
+        logger.warning(f"Presigning video URLs in batch failed: {e}")
+
+def presign_video_url(url: Optional[str]) -> Optional[str]:
+    """
+    Presigned download URL for our storage URLs (reused for the current
+    presign window); other URLs are returned as they are.
+    """
+    key = storage_object_key(url)
+    if key:
+        try:
+            signed_url = presigned_url_cache.get(key)
+            if signed_url:
+                return signed_url
+        except Exception as e:
+            logger.warning(f"Presigning {key} failed, returning the unsigned URL: {e}")
+    return url
 
 class VideoBase(BaseModel):
     title: Optional[str] = None
@@ -25,28 +58,47 @@ class VideoOut(VideoBase):
 
     @validator("video_url", pre=True)
     def sign_b2_url(cls, v):
-        if v and "backblazeb2.com" in v:
-            try:
-                from urllib.parse import urlparse
-                from app.core.storage import storage_service
-                
-                parsed = urlparse(v)
-                # Remove leading slash to get the key
-                key = parsed.path.lstrip('/')
-                
-                # Generate presigned URL (valid for 1 hour)
-                signed_url = storage_service.generate_presigned_url(key)
-                if signed_url:
-                    return signed_url
-            except Exception:
-                pass
-        return v
+        return presign_video_url(v)
 
     class Config:
         from_attributes = True
 
+class VideoPage(BaseModel):
+    items: List[VideoOut]
+    next_cursor: Optional[str] = None
+
+    @validator("items", pre=True)
+    def presign_video_urls(cls, v):
+        warm_video_urls(v)
+        return v
+
+class VideoStatusEvent(BaseModel):
+    """
+    Body of a status event on GET /vibes/{id}/events.
+    """
+    id: UUID
+    status: str  # A video status, or "deleted"
+    video_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+
+    @validator("video_url", pre=True)
+    def sign_b2_url(cls, v):
+        return presign_video_url(v)
+
+class StreamTicket(BaseModel):
+    """
+    Single-use credential for opening GET /vibes/{id}/events?ticket=.
+    """
+    ticket: str
+    expires_in: int
+
 class WebhookData(BaseModel):
-    id: str
+    """
+    fal.ai queue webhook body. status is OK or ERROR; payload is the same
+    result the queue would return for the request.
+    """
+    request_id: str
+    gateway_request_id: Optional[str] = None
     status: str
-    output: Optional[str] = None
+    payload: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
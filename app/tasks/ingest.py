@@ -0,0 +1,45 @@
+import hashlib
+from dataclasses import dataclass
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.http import http_clients
+from app.core.storage import async_storage_service
+from app.tasks.runtime import runtime
+
+
+@dataclass
+class IngestResult:
+    url: str
+    size: int
+    sha256: str
+
+
+async def ingest_remote_file(source_url: str, object_name: str, content_type: str) -> IngestResult:
+    """
+    Stream a provider output straight into B2.
+
+    The response is read in INGEST_CHUNK_SIZE chunks and fed to a multipart
+    upload while it is hashed and counted; parts upload while the download
+    continues. Peak memory is bounded by INGEST_MAX_MEMORY rather than the
+    file size; in the worker that amount is reserved from the runtime's
+    memory budget for the duration of the transfer.
+    """
+    digest = hashlib.sha256()
+    async with runtime.reserve(settings.INGEST_MAX_MEMORY):
+        writer = async_storage_service.open_multipart_writer(
+            object_name, content_type, max_memory=settings.INGEST_MAX_MEMORY
+        )
+        async with writer:
+            async with http_clients.get("media").stream("GET", source_url) as response:
+                if response.status_code != 200:
+                    raise Exception(f"Failed to download {source_url}: HTTP {response.status_code}")
+                async for chunk in response.aiter_bytes(settings.INGEST_CHUNK_SIZE):
+                    digest.update(chunk)
+                    await writer.write(chunk)
+            url = await writer.complete()
+
+    result = IngestResult(url=url, size=writer.bytes_written, sha256=digest.hexdigest())
+    logger.info(f"Ingested {result.size} bytes into {object_name} (sha256 {result.sha256})")
+    return result
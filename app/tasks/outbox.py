@@ -0,0 +1,218 @@
+import asyncio
+import base64
+import json
+import signal
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import asyncpg
+from loguru import logger
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.metrics import metrics_registry
+from app.core.redis import close_redis, get_redis
+from app.db.session import AsyncSessionLocal, engine
+from app.domains.outbox.models import OutboxMessage
+from app.domains.outbox.service import OUTBOX_CHANNEL
+from app.tasks.worker import celery_app
+
+# LPUSH unless this task id was already published; the marker outlives any
+# relay crash between publishing a batch and deleting it from the outbox
+PUBLISH_ONCE = """
+if redis.call('set', KEYS[1], '1', 'NX', 'EX', ARGV[2]) then
+    return redis.call('lpush', KEYS[2], ARGV[1])
+end
+return 0
+"""
+
+
+def task_message(task_id: str, name: str, args: List[Any], kwargs: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    The (queue, payload) that apply_async would LPUSH through Celery's Redis
+    transport: a protocol 2 task message with a base64-encoded JSON body.
+    """
+    queue = celery_app.amqp.router.route({}, name)["queue"].name
+    headers, properties, body, _ = celery_app.amqp.as_task_v2(
+        task_id, name, args, kwargs, reply_to=celery_app.thread_oid
+    )
+    message = {
+        "body": base64.b64encode(json.dumps(body).encode("utf-8")).decode("ascii"),
+        "content-encoding": "utf-8",
+        "content-type": "application/json",
+        "headers": headers,
+        "properties": {
+            **properties,
+            "delivery_mode": 2,
+            # Celery sends to direct queues through the default exchange
+            "delivery_info": {"exchange": "", "routing_key": queue},
+            "priority": 0,
+            "body_encoding": "base64",
+            "delivery_tag": str(uuid4()),
+        },
+    }
+    return queue, json.dumps(message)
+
+
+class OutboxRelay:
+    """
+    Moves committed outbox rows to the Celery broker.
+
+    Each batch is claimed with FOR UPDATE SKIP LOCKED (so several relays can
+    run side by side), published in one Redis pipeline and deleted in the
+    same transaction. A per-task marker in Redis makes publishing
+    idempotent, so a batch retried after a crash is not delivered twice.
+    The relay wakes on NOTIFY from OutboxService.enqueue and falls back to
+    polling every poll_interval. A dropped LISTEN connection is reopened
+    with backoff, and it is checked every listen_check_interval so a
+    silently dead one is noticed too.
+    """
+
+    def __init__(self, batch_size: int, poll_interval: float, dedup_ttl: int, listen_check_interval: float = 30):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.dedup_ttl = dedup_ttl
+        self.listen_check_interval = listen_check_interval
+        self._wakeup = asyncio.Event()
+        self._listener: Optional[asyncpg.Connection] = None
+        self.listens = 0
+        self.batches = 0
+        self.published = 0
+        self.duplicates = 0
+        self.errors = 0
+
+    async def run(self, stop: asyncio.Event) -> None:
+        listener = asyncio.create_task(self._listen())
+        try:
+            while not stop.is_set():
+                self._wakeup.clear()
+                try:
+                    relayed = await self.relay_batch()
+                except Exception as e:
+                    self.errors += 1
+                    relayed = 0
+                    logger.error(f"Outbox relay failed, retrying: {e}")
+                if relayed == self.batch_size:
+                    continue
+                try:
+                    await asyncio.wait_for(self._wait(stop), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+    async def relay_batch(self) -> int:
+        """
+        Publish and delete up to batch_size messages; returns how many.
+        """
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(OutboxMessage)
+                .order_by(OutboxMessage.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )).scalars().all()
+            if not rows:
+                return 0
+
+            redis = get_redis()
+            publish_once = redis.register_script(PUBLISH_ONCE)
+            pipe = redis.pipeline(transaction=False)
+            for row in rows:
+                queue, payload = task_message(row.task_id, row.task_name, row.args, row.kwargs)
+                await publish_once(
+                    keys=[f"outbox:sent:{row.task_id}", queue], args=[payload, self.dedup_ttl], client=pipe
+                )
+            results = await pipe.execute()
+
+            await db.execute(delete(OutboxMessage).where(OutboxMessage.id.in_([row.id for row in rows])))
+            await db.commit()
+
+        self.batches += 1
+        self.published += sum(1 for r in results if r)
+        self.duplicates += sum(1 for r in results if not r)
+        return len(rows)
+
+    async def _wait(self, stop: asyncio.Event) -> None:
+        waiters = [asyncio.ensure_future(self._wakeup.wait()), asyncio.ensure_future(stop.wait())]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    async def _listen(self) -> None:
+        # Transaction-mode poolers (e.g. Supabase on 6543) do not support
+        # LISTEN; the relay then just polls
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        delay = 0.5
+        while True:
+            lost = asyncio.Event()
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(OUTBOX_CHANNEL, lambda *args: self._wakeup.set())
+                self._listener = connection
+                self.listens += 1
+                delay = 0.5
+                # Messages enqueued while we were not listening only show up on a poll
+                self._wakeup.set()
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=self.listen_check_interval)
+                    except asyncio.TimeoutError:
+                        await asyncio.wait_for(connection.execute("SELECT 1"), timeout=10)
+                logger.warning(f"Outbox relay LISTEN connection closed; reconnecting in {delay}s")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(
+                    f"Outbox relay cannot LISTEN ({e}); polling every {self.poll_interval}s, retrying in {delay}s"
+                )
+            finally:
+                self._listener = None
+                if connection is not None and not connection.is_closed():
+                    try:
+                        await connection.close(timeout=5)
+                    except Exception:
+                        connection.terminate()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "listening": self._listener is not None,
+            "listens": self.listens,
+            "batches": self.batches,
+            "published": self.published,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+        }
+
+
+outbox_relay = OutboxRelay(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL,
+    dedup_ttl=settings.OUTBOX_DEDUP_TTL,
+)
+metrics_registry.register("outbox", outbox_relay.stats)
+
+
+async def main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    logger.info("Starting outbox relay")
+    try:
+        await outbox_relay.run(stop)
+    finally:
+        await close_redis()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,371 @@
+import asyncio
+import heapq
+import random
+import signal
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import String, column, func, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.future import select
+
+import app.db.base  # Ensure all models are registered for SQLAlchemy
+from app.core.config import settings
+from app.core.http import http_clients
+from app.core.redis import close_redis
+from app.db.session import AsyncSessionLocal, engine
+from app.domains.identity.cache import profile_cache
+from app.domains.vibes.events import event_payload, video_event_hub
+from app.domains.vibes.models import Video
+
+# fal queue statuses; anything else that is not COMPLETED is treated as failed
+PENDING_STATUSES = {"IN_QUEUE", "IN_PROGRESS"}
+COMPLETED_STATUSES = {"COMPLETED", "OK", "SUCCEEDED"}
+
+
+def fal_app_id(model: str) -> str:
+    """
+    Queue status/result URLs use the app id (owner/app), not the full model
+    path: fal-ai/kling-video/v2.5-turbo/pro/text-to-video -> fal-ai/kling-video.
+    """
+    return "/".join(model.strip("/").split("/")[:2])
+
+
+def extract_video_url(data: Dict[str, Any]) -> Optional[str]:
+    return (data.get("video") or {}).get("url") or ((data.get("output") or {}).get("video") or {}).get("url")
+
+
+async def fal_job_state(app_id: str, request_id: str) -> Tuple[str, Optional[str]]:
+    """
+    Queue status of a fal.ai job and, once completed, its video URL (None
+    if the result has no video). HTTP errors raise, so callers retry later
+    rather than failing the video.
+    """
+    client = http_clients.get("fal")
+    headers = {"Authorization": f"Key {settings.FAL_KEY}"}
+    job_url = f"/{app_id}/requests/{request_id}"
+    response = await client.get(f"{job_url}/status", headers=headers)
+    response.raise_for_status()
+    status = (response.json().get("status") or "").upper()
+    if status not in COMPLETED_STATUSES:
+        return status, None
+    result = await client.get(job_url, headers=headers)
+    result.raise_for_status()
+    return status, extract_video_url(result.json())
+
+
+@dataclass(order=True)
+class _Job:
+    next_poll_at: float
+    video_id: UUID = field(compare=False)
+    user_id: UUID = field(compare=False)
+    request_id: str = field(compare=False)
+    submitted_at: float = field(compare=False)
+    interval: float = field(compare=False)
+    status: Optional[str] = field(default=None, compare=False)
+    polls: int = field(default=0, compare=False)
+    errors: int = field(default=0, compare=False)
+
+
+@dataclass
+class _Outcome:
+    video_id: UUID
+    status: str
+    video_url: Optional[str] = None
+
+
+class RateLimiter:
+    """
+    Token bucket: at most `rate` acquisitions per second, bursts up to `rate`.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class FalPoller:
+    """
+    Tracks every in-flight fal.ai job in one event loop.
+
+    Videos in "processing" with a replicate_job_id are picked up from the
+    database every scan_interval. Each job is polled on its own schedule:
+    the interval grows by `backoff` while its status is unchanged and drops
+    back to min_interval when it moves (IN_QUEUE -> IN_PROGRESS). All polls
+    share a global rate cap. Finished jobs are written back in one UPDATE
+    per flush_interval.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        scan_interval: float,
+        min_interval: float,
+        max_interval: float,
+        backoff: float,
+        max_rps: float,
+        concurrency: int,
+        flush_interval: float,
+        job_timeout: float,
+    ):
+        self.app_id = fal_app_id(model)
+        self.scan_interval = scan_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.flush_interval = flush_interval
+        self.job_timeout = job_timeout
+        self.rate_limiter = RateLimiter(max_rps)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._jobs: Dict[UUID, _Job] = {}
+        self._schedule: List[_Job] = []
+        self._outcomes: List[_Outcome] = []
+        self._wakeup = asyncio.Event()
+        self._polling: set = set()
+        self.polls = 0
+        self.poll_errors = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def run(self, stop: asyncio.Event) -> None:
+        loops = [
+            asyncio.create_task(self._every(self.scan_interval, self.scan, stop)),
+            asyncio.create_task(self._every(self.flush_interval, self.flush, stop)),
+            asyncio.create_task(self._every(60, self._log_stats, stop)),
+            asyncio.create_task(self._dispatch(stop)),
+        ]
+        await stop.wait()
+        for task in loops:
+            task.cancel()
+        await asyncio.gather(*loops, return_exceptions=True)
+        await asyncio.gather(*self._polling, return_exceptions=True)
+        await self.flush()
+
+    async def scan(self) -> None:
+        """
+        Start tracking jobs submitted since the last scan.
+        """
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(Video.id, Video.user_id, Video.replicate_job_id, Video.created_at)
+                .where(
+                    Video.status == "processing",
+                    Video.replicate_job_id.is_not(None),
+                    Video.deleted_at.is_(None),
+                )
+            )).all()
+        # Jobs finished elsewhere (e.g. by the webhook) are dropped; results
+        # waiting to be written stay tracked until flushed
+        finished = set(self._jobs) - {row.id for row in rows} - {o.video_id for o in self._outcomes}
+        for video_id in finished:
+            del self._jobs[video_id]
+
+        now = time.time()
+        added = 0
+        for video_id, user_id, request_id, created_at in rows:
+            if video_id in self._jobs:
+                continue
+            submitted_at = (created_at - datetime(1970, 1, 1)).total_seconds() if created_at else now
+            job = _Job(
+                # The webhook (if any) usually lands first; otherwise the
+                # first check is one interval after pickup
+                next_poll_at=time.monotonic() + self.min_interval,
+                video_id=video_id,
+                user_id=user_id,
+                request_id=request_id,
+                submitted_at=submitted_at,
+                interval=self.min_interval,
+            )
+            self._jobs[video_id] = job
+            heapq.heappush(self._schedule, job)
+            added += 1
+        if added:
+            logger.info(f"Poller tracking {added} new jobs ({len(self._jobs)} in flight)")
+            self._wakeup.set()
+
+    async def _dispatch(self, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            if not self._schedule:
+                delay = None
+            else:
+                delay = self._schedule[0].next_poll_at - time.monotonic()
+            if delay is None or delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job = heapq.heappop(self._schedule)
+            if self._jobs.get(job.video_id) is not job:
+                continue
+            await self.rate_limiter.acquire()
+            await self._slots.acquire()
+            task = asyncio.create_task(self._poll(job))
+            self._polling.add(task)
+            task.add_done_callback(self._polling.discard)
+
+    async def _poll(self, job: _Job) -> None:
+        try:
+            outcome = await self._check(job)
+        except Exception as e:
+            self.poll_errors += 1
+            job.errors += 1
+            job.interval = min(job.interval * self.backoff, self.max_interval)
+            logger.warning(f"Polling fal.ai job {job.request_id} failed: {e}")
+            outcome = None
+        finally:
+            self._slots.release()
+
+        if outcome is None and time.time() - job.submitted_at > self.job_timeout:
+            logger.warning(f"fal.ai job {job.request_id} for video {job.video_id} timed out")
+            outcome = _Outcome(job.video_id, "failed")
+        if outcome is not None:
+            # Stays in _jobs until flushed so the next scan does not re-add it
+            self._outcomes.append(outcome)
+            return
+        self._reschedule(job)
+
+    async def _check(self, job: _Job) -> Optional[_Outcome]:
+        self.polls += 1
+        job.polls += 1
+        status, video_url = await fal_job_state(self.app_id, job.request_id)
+
+        if status in PENDING_STATUSES:
+            if status == job.status:
+                job.interval = min(job.interval * self.backoff, self.max_interval)
+            else:
+                job.interval = self.min_interval
+            job.status = status
+            return None
+
+        if status in COMPLETED_STATUSES:
+            if video_url:
+                self.completed += 1
+                return _Outcome(job.video_id, "ready", video_url)
+            logger.error(f"fal.ai job {job.request_id} completed without a video")
+
+        self.failed += 1
+        logger.error(f"fal.ai job {job.request_id} for video {job.video_id} failed with status {status}")
+        return _Outcome(job.video_id, "failed")
+
+    def _reschedule(self, job: _Job) -> None:
+        # Jitter spreads out jobs that were submitted together
+        job.next_poll_at = time.monotonic() + job.interval * random.uniform(0.9, 1.1)
+        heapq.heappush(self._schedule, job)
+        self._wakeup.set()
+
+    async def flush(self) -> None:
+        """
+        Write finished jobs back in a single UPDATE ... FROM (VALUES ...).
+        Rows no longer "processing" (e.g. already set by the webhook) or
+        deleted meanwhile are left alone.
+        """
+        if not self._outcomes:
+            return
+        batch, self._outcomes = self._outcomes, []
+        changes = values(
+            column("id", PG_UUID(as_uuid=True)),
+            column("status", String),
+            column("video_url", String),
+            name="changes",
+        ).data([(o.video_id, o.status, o.video_url) for o in batch])
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    update(Video)
+                    .where(Video.id == changes.c.id, Video.status == "processing", Video.deleted_at.is_(None))
+                    .values(
+                        status=changes.c.status,
+                        video_url=func.coalesce(changes.c.video_url, Video.video_url),
+                        updated_at=datetime.utcnow(),
+                    )
+                    .returning(Video.id, Video.user_id, Video.status, Video.video_url, Video.thumbnail_url)
+                    .execution_options(synchronize_session=False)
+                )
+                written = result.all()
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Poller failed to write {len(batch)} results, retrying: {e}")
+            self._outcomes = batch + self._outcomes
+            return
+
+        for outcome in batch:
+            self._jobs.pop(outcome.video_id, None)
+        await profile_cache.invalidate(*{row.user_id for row in written})
+        await video_event_hub.publish(*map(event_payload, written))
+        logger.info(f"Poller wrote {len(batch)} finished jobs")
+
+    async def _every(self, interval: float, fn, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            try:
+                await fn()
+            except Exception:
+                logger.exception(f"Poller {fn.__name__} failed")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _log_stats(self) -> None:
+        logger.info(f"Poller stats: {self.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._jobs),
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+            "completed": self.completed,
+            "failed": self.failed,
+            "pending_writes": len(self._outcomes),
+        }
+
+
+async def main() -> None:
+    # Jobs submitted with a webhook only need an occasional check for lost deliveries
+    if settings.PUBLIC_API_URL:
+        min_interval = max_interval = settings.POLLER_SAFETY_NET_INTERVAL
+    else:
+        min_interval, max_interval = settings.POLLER_MIN_INTERVAL, settings.POLLER_MAX_INTERVAL
+    poller = FalPoller(
+        model=settings.KLING_MODEL,
+        scan_interval=settings.POLLER_SCAN_INTERVAL,
+        min_interval=min_interval,
+        max_interval=max_interval,
+        backoff=settings.POLLER_BACKOFF,
+        max_rps=settings.POLLER_MAX_RPS,
+        concurrency=settings.POLLER_CONCURRENCY,
+        flush_interval=settings.POLLER_FLUSH_INTERVAL,
+        job_timeout=settings.POLLER_JOB_TIMEOUT,
+    )
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    logger.info(f"Starting fal.ai poller for {poller.app_id}")
+    try:
+        await poller.run(stop)
+    finally:
+        await http_clients.aclose()
+        await close_redis()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,176 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import String, column, func, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.cache import profile_cache
+from app.domains.outbox.service import outbox_service
+from app.domains.vibes.events import event_payload, video_event_hub
+from app.domains.vibes.models import Video
+from app.domains.vibes.service import video_queue_stats
+from app.tasks.poller import COMPLETED_STATUSES, PENDING_STATUSES, fal_app_id, fal_job_state
+from app.tasks.runtime import runtime
+from app.tasks.vibes import run_video_generation_task
+from app.tasks.worker import celery_app
+
+ACTIVE_STATUSES = ("pending", "processing")
+
+
+class StuckJobReaper:
+    """
+    Recovers videos whose generation stopped making progress, e.g. because
+    the worker or poller handling them died.
+
+    Active videos not updated for stale_after seconds are found through
+    ix_video_active_updated_at. A video with a fal.ai request id is resumed
+    from it: a finished job is written back, a running one is touched so it
+    is only checked again after another stale_after. A video without one
+    never reached fal.ai; it is reset to pending and its generation task is
+    dispatched again. A video still active `deadline` seconds after
+    creation is marked failed.
+
+    Every write is guarded on the row still being active and stale, so
+    progress made meanwhile by the worker, poller or a webhook wins.
+    """
+
+    def __init__(self, model: str, stale_after: int, deadline: int, batch_size: int, concurrency: int):
+        self.app_id = fal_app_id(model)
+        self.stale_after = stale_after
+        self.deadline = deadline
+        self.batch_size = batch_size
+        self._slots = asyncio.Semaphore(concurrency)
+        self.resumed = 0
+        self.redispatched = 0
+        self.expired = 0
+
+    async def run(self) -> Dict[str, int]:
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=self.stale_after)
+        expired_before = now - timedelta(seconds=self.deadline)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(Video.id, Video.status, Video.replicate_job_id, Video.created_at)
+                .where(
+                    Video.status.in_(ACTIVE_STATUSES),
+                    Video.updated_at < stale_before,
+                    Video.deleted_at.is_(None),
+                )
+                .order_by(Video.updated_at)
+                .limit(self.batch_size)
+            )).all()
+        if not rows:
+            return {"stale": 0}
+
+        # (video id, new status, video url); the status is unchanged for a touch.
+        # Re-dispatched videos go back to pending, the status the generation
+        # task's claim accepts whatever their updated_at.
+        changes: List[Tuple] = []
+        redispatch = set()
+        checks = [self._resume(row) for row in rows if row.replicate_job_id]
+        for row, outcome in zip([row for row in rows if row.replicate_job_id], await asyncio.gather(*checks)):
+            if outcome is None:
+                outcome = ("failed", None) if row.created_at < expired_before else (row.status, None)
+            changes.append((row.id, *outcome))
+        for row in rows:
+            if row.replicate_job_id:
+                continue
+            if row.created_at < expired_before:
+                changes.append((row.id, "failed", None))
+            else:
+                changes.append((row.id, "pending", None))
+                redispatch.add(row.id)
+
+        written = await self._write(changes, redispatch, stale_before, now)
+        result = {
+            "stale": len(rows),
+            "written": len(written),
+            "ready": sum(1 for row in written if row.status == "ready"),
+            "failed": sum(1 for row in written if row.status == "failed"),
+            "redispatched": sum(1 for row in written if row.id in redispatch),
+        }
+        self.resumed += result["ready"]
+        self.expired += result["failed"]
+        self.redispatched += result["redispatched"]
+        logger.info(f"Recovered stuck videos: {result}")
+        return result
+
+    async def _resume(self, row) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        (status, video_url) for a finished job; None while it is still running
+        or its state could not be fetched.
+        """
+        async with self._slots:
+            try:
+                status, video_url = await fal_job_state(self.app_id, row.replicate_job_id)
+            except Exception as e:
+                logger.warning(f"Checking fal.ai job {row.replicate_job_id} for video {row.id} failed: {e}")
+                return None
+        if status in PENDING_STATUSES:
+            return None
+        if status in COMPLETED_STATUSES and video_url:
+            return "ready", video_url
+        logger.error(f"fal.ai job {row.replicate_job_id} for stuck video {row.id} ended with {status}")
+        return "failed", None
+
+    async def _write(self, changes: List[Tuple], redispatch: set, stale_before: datetime, now: datetime) -> List:
+        data = values(
+            column("id", PG_UUID(as_uuid=True)),
+            column("status", String),
+            column("video_url", String),
+            name="changes",
+        ).data(changes)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(Video)
+                .where(
+                    Video.id == data.c.id,
+                    Video.status.in_(ACTIVE_STATUSES),
+                    Video.updated_at < stale_before,
+                    Video.deleted_at.is_(None),
+                )
+                .values(
+                    status=data.c.status,
+                    video_url=func.coalesce(data.c.video_url, Video.video_url),
+                    updated_at=now,
+                )
+                .returning(Video.id, Video.user_id, Video.status, Video.video_url, Video.thumbnail_url)
+                .execution_options(synchronize_session=False)
+            )
+            written = result.all()
+            for row in written:
+                if row.id in redispatch:
+                    await outbox_service.enqueue(db, run_video_generation_task, str(row.id))
+            await db.commit()
+
+        await profile_cache.invalidate(*{row.user_id for row in written})
+        await video_event_hub.publish(*(event_payload(row) for row in written if row.status not in ACTIVE_STATUSES))
+        return written
+
+
+reaper = StuckJobReaper(
+    model=settings.KLING_MODEL,
+    stale_after=settings.RECOVERY_STALE_AFTER,
+    deadline=settings.RECOVERY_DEADLINE,
+    batch_size=settings.RECOVERY_BATCH_SIZE,
+    concurrency=settings.RECOVERY_CONCURRENCY,
+)
+
+
+async def recover_stuck_videos() -> Dict[str, int]:
+    result = await reaper.run()
+    logger.info(f"Video queue ages: {await video_queue_stats()}")
+    return result
+
+
+@celery_app.task(name="app.tasks.recovery.recover_stuck_videos_task")
+def recover_stuck_videos_task() -> Dict[str, int]:
+    """
+    Resume, re-dispatch or fail videos stuck in pending/processing.
+    """
+    return runtime.run(recover_stuck_videos(), name="stuck job recovery")
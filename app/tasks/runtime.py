@@ -0,0 +1,296 @@
+import asyncio
+import contextvars
+import os
+import resource
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, Set
+
+from celery.exceptions import Reject
+from celery.signals import (
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_shutdown,
+    worker_shutting_down,
+)
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.http import http_clients
+from app.core.redis import close_redis
+from app.db.session import AsyncSessionLocal, make_engine
+
+
+def rss_bytes() -> int:
+    """
+    Current resident set size (peak RSS where /proc is unavailable).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class TaskUsage:
+    name: str
+    started_at: float
+    reserved: int = 0
+    peak_reserved: int = 0
+
+
+_current_usage: contextvars.ContextVar[Optional[TaskUsage]] = contextvars.ContextVar(
+    "worker_task_usage", default=None
+)
+
+
+class MemoryBudget:
+    """
+    Byte budget shared by the tasks on one loop, plus a cap on how many hold
+    a reservation at once. A reservation larger than the whole budget is
+    still granted when nothing else is held, so it cannot wait forever.
+    """
+
+    def __init__(self, limit: int, max_holders: int):
+        self.limit = limit
+        self.max_holders = max_holders
+        self.used = 0
+        self.holders = 0
+        self.peak = 0
+        self.waits = 0
+        self._cond = asyncio.Condition()
+
+    def _fits(self, nbytes: int) -> bool:
+        if self.holders >= self.max_holders:
+            return False
+        return self.used == 0 or self.used + nbytes <= self.limit
+
+    async def acquire(self, nbytes: int) -> None:
+        async with self._cond:
+            if not self._fits(nbytes):
+                self.waits += 1
+                await self._cond.wait_for(lambda: self._fits(nbytes))
+            self.used += nbytes
+            self.holders += 1
+            self.peak = max(self.peak, self.used)
+
+    async def release(self, nbytes: int) -> None:
+        async with self._cond:
+            self.used -= nbytes
+            self.holders -= 1
+            self._cond.notify_all()
+
+
+class WorkerRuntime:
+    """
+    One long-lived event loop per worker process, run in a background thread.
+
+    Celery tasks are synchronous; they hand their coroutine to this loop and
+    block on the result. Because every task shares the loop, the DB pool,
+    HTTP clients and Redis client opened on it are reused across tasks
+    instead of being rebuilt (and leaked onto a dead loop) per task. The
+    worker gets its own engine, sized by WORKER_DB_POOL_SIZE, which
+    AsyncSessionLocal is rebound to on start.
+
+    With the threads pool, each of the WORKER_CONCURRENCY pool threads just
+    waits on its coroutine, so that many jobs are in flight on one loop.
+    Large buffers (downloads being streamed to storage) are reserved from a
+    shared MemoryBudget, and each task's reservations and the process RSS
+    are logged when it finishes.
+    """
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.engine: Optional[AsyncEngine] = None
+        self.budget: Optional[MemoryBudget] = None
+        self.draining = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._active: Set[Future] = set()
+        self.completed = 0
+        self.requeued = 0
+
+    @property
+    def running(self) -> bool:
+        # A forked child inherits the attributes but not the loop thread
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self.engine = make_engine(
+                pool_size=settings.WORKER_DB_POOL_SIZE,
+                max_overflow=settings.WORKER_DB_MAX_OVERFLOW,
+            )
+            AsyncSessionLocal.configure(bind=self.engine)
+            self.loop = asyncio.new_event_loop()
+            self.budget = MemoryBudget(settings.WORKER_MEMORY_BUDGET, settings.WORKER_MAX_DOWNLOADS)
+            self.draining = False
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run_loop, name="worker-loop", daemon=True)
+            self._thread.start()
+            logger.info(f"Worker event loop started (pid {self._pid})")
+
+    def run(self, coro: Awaitable[Any], name: str = "task", timeout: Optional[float] = None) -> Any:
+        """
+        Run coro on the worker loop and wait for its result.
+
+        A job cancelled because the worker is shutting down raises Reject,
+        so (with acks_late) its message goes back on the queue.
+        """
+        if not self.running:
+            self.start()
+        future: Future = asyncio.run_coroutine_threadsafe(self._tracked(coro, name), self.loop)
+        self._active.add(future)
+        try:
+            return future.result(timeout)
+        except CancelledError:
+            if self.draining:
+                self.requeued += 1
+                logger.warning(f"{name} interrupted by shutdown, requeueing")
+                raise Reject("worker shutting down", requeue=True) from None
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._active.discard(future)
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int) -> AsyncIterator[None]:
+        """
+        Hold nbytes of the worker memory budget (and a download slot).
+        Outside the worker loop (API process, scripts) this is a no-op.
+        """
+        if self.budget is None or asyncio.get_running_loop() is not self.loop:
+            yield
+            return
+        await self.budget.acquire(nbytes)
+        usage = _current_usage.get()
+        if usage is not None:
+            usage.reserved += nbytes
+            usage.peak_reserved = max(usage.peak_reserved, usage.reserved)
+        try:
+            yield
+        finally:
+            if usage is not None:
+                usage.reserved -= nbytes
+            await self.budget.release(nbytes)
+
+    def drain(self, timeout: float) -> None:
+        """
+        Let running jobs finish for up to timeout seconds, then cancel the
+        rest so they are requeued before the process exits.
+        """
+        if self.draining or not self.running:
+            return
+        self.draining = True
+        logger.info(f"Draining {len(self._active)} running jobs (timeout {timeout}s)")
+        timer = threading.Timer(timeout, self._cancel_active)
+        timer.daemon = True
+        timer.start()
+
+    def _cancel_active(self) -> None:
+        for future in list(self._active):
+            future.cancel()
+
+    async def _tracked(self, coro: Awaitable[Any], name: str) -> Any:
+        usage = TaskUsage(name=name, started_at=time.monotonic())
+        _current_usage.set(usage)
+        try:
+            return await coro
+        finally:
+            self.completed += 1
+            logger.info(
+                f"{name} finished in {time.monotonic() - usage.started_at:.1f}s, "
+                f"peak reserved {usage.peak_reserved / 2**20:.0f} MiB, "
+                f"{len(self._active)} in flight, rss {rss_bytes() / 2**20:.0f} MiB"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        budget = self.budget
+        return {
+            "running": self.running,
+            "in_flight": len(self._active),
+            "completed": self.completed,
+            "requeued": self.requeued,
+            "rss": rss_bytes(),
+            "budget_limit": budget.limit if budget else None,
+            "budget_used": budget.used if budget else 0,
+            "budget_peak": budget.peak if budget else 0,
+            "budget_waits": budget.waits if budget else 0,
+            "downloads": budget.holders if budget else 0,
+        }
+
+    def stop(self, timeout: float = 30) -> None:
+        with self._lock:
+            if not self.running:
+                return
+            closing = asyncio.run_coroutine_threadsafe(self._close(), self.loop)
+            try:
+                closing.result(timeout)
+            except Exception as e:
+                # Cancelled rather than abandoned, so it unwinds if the loop gets going again
+                closing.cancel()
+                logger.warning(f"Worker runtime shutdown failed: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Blocked in a callback; the loop closes itself if that ever
+                # returns. The thread is a daemon and ends with the process.
+                logger.warning(f"Worker event loop did not stop within {timeout}s; leaving it")
+            else:
+                logger.info("Worker event loop stopped")
+            self._thread = None
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            # As asyncio.run does: let whatever is still pending (e.g. a
+            # cancelled _close) unwind before closing the loop
+            pending = asyncio.all_tasks(self.loop)
+            for task in pending:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.loop.close()
+
+    async def _close(self) -> None:
+        await http_clients.aclose()
+        await close_redis()
+        await self.engine.dispose()
+
+
+runtime = WorkerRuntime()
+
+
+@worker_init.connect
+def _start_runtime(**kwargs) -> None:
+    # solo/threads pools run tasks in this process; prefork children start
+    # their own loop on worker_process_init (or lazily on the first task)
+    runtime.start()
+
+
+@worker_process_init.connect
+def _start_process_runtime(**kwargs) -> None:
+    runtime.start()
+
+
+@worker_shutting_down.connect
+def _drain_runtime(**kwargs) -> None:
+    runtime.drain(settings.WORKER_DRAIN_TIMEOUT)
+
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def _stop_runtime(**kwargs) -> None:
+    runtime.stop()
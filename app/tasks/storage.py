@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from loguru import logger
+from sqlalchemy import delete, exists, insert
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.presign import storage_object_key
+from app.core.redis import get_redis
+from app.core.storage import async_storage_service, storage_service
+from app.db.session import AsyncSessionLocal
+from app.domains.vibes.models import StorageDeletion, Video
+from app.tasks.runtime import runtime
+from app.tasks.worker import celery_app
+
+# Coalesces the GC task enqueued by every delete: one run at a time drains
+# the queue, later triggers only flag that another pass is needed
+GC_LOCK_KEY = "storage:gc:lock"
+GC_RERUN_KEY = "storage:gc:rerun"
+GC_LOCK_TTL = 600
+
+
+class StorageCollector:
+    """
+    Deletes the objects queued in storagedeletion.
+
+    Due rows are claimed with FOR UPDATE SKIP LOCKED, batch_size at a time,
+    and deleted with one DeleteObjects call per batch. Keys the store
+    reports as failed are retried with exponential backoff; after
+    max_attempts they stay in the table as dead letters. Soft-deleted
+    videos whose files are all gone are purged after purge_delay.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        max_attempts: int,
+        retry_base: float,
+        retry_max: float,
+        purge_delay: int,
+    ):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.purge_delay = purge_delay
+        self.deleted = 0
+        self.retried = 0
+        self.dead = 0
+        self.purged = 0
+
+    async def collect(self) -> Dict[str, int]:
+        """
+        Drain every due row, then purge finished soft-deleted videos.
+        """
+        if not storage_service.backend:
+            logger.warning("Storage is disabled; leaving queued deletions in place")
+            return {"batches": 0, "purged": 0}
+        batches = 0
+        while True:
+            claimed = await self.collect_batch()
+            batches += bool(claimed)
+            if claimed < self.batch_size:
+                break
+        return {"batches": batches, "purged": await self.purge()}
+
+    async def collect_batch(self) -> int:
+        """
+        Delete up to batch_size due objects; returns how many rows were claimed.
+        """
+        async with AsyncSessionLocal() as db:
+            now = datetime.utcnow()
+            rows = (await db.execute(
+                select(StorageDeletion)
+                .where(StorageDeletion.dead_at.is_(None), StorageDeletion.next_attempt_at <= now)
+                .order_by(StorageDeletion.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )).scalars().all()
+            if not rows:
+                return 0
+
+            # Foreign URLs (e.g. provider-hosted outputs) have no key and are just dropped
+            keys = {row.id: storage_object_key(row.url) for row in rows}
+            batch = sorted({key for key in keys.values() if key})
+            error = "DeleteObjects reported an error"
+            try:
+                failed = set(await async_storage_service.delete_files(batch)) if batch else set()
+            except Exception as e:
+                failed, error = set(batch), str(e)
+
+            done = [row.id for row in rows if keys[row.id] not in failed]
+            if done:
+                await db.execute(delete(StorageDeletion).where(StorageDeletion.id.in_(done)))
+            for row in rows:
+                if keys[row.id] in failed:
+                    self._retry_later(row, error, now)
+            await db.commit()
+
+        self.deleted += len(done)
+        logger.info(f"Storage GC deleted {len(done)} objects, {len(rows) - len(done)} failed")
+        return len(rows)
+
+    def _retry_later(self, row: StorageDeletion, error: str, now: datetime) -> None:
+        row.attempts += 1
+        row.last_error = error
+        if row.attempts >= self.max_attempts:
+            row.dead_at = now
+            self.dead += 1
+            logger.error(f"Giving up deleting {row.url} after {row.attempts} attempts: {error}")
+            return
+        delay = min(self.retry_base * 2 ** (row.attempts - 1), self.retry_max)
+        row.next_attempt_at = now + timedelta(seconds=delay)
+        self.retried += 1
+
+    async def purge(self) -> int:
+        """
+        Hard-delete soft-deleted videos with no storage deletions pending.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.purge_delay)
+        pending = exists().where(StorageDeletion.video_id == Video.id, StorageDeletion.dead_at.is_(None))
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(Video)
+                .where(Video.deleted_at < cutoff, ~pending)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        self.purged += result.rowcount
+        return result.rowcount
+
+    async def sweep(self, prefixes: List[str], min_age: int) -> int:
+        """
+        Queue objects under prefixes that no video row references.
+
+        Only objects older than min_age are considered, so an output that
+        was uploaded but whose video row is not written yet is left alone.
+        Returns how many objects were queued.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=min_age)
+        referenced = await self._referenced_keys()
+        queued = 0
+        for prefix in prefixes:
+            start_after: Optional[str] = None
+            while True:
+                page = await async_storage_service.list_keys(prefix, start_after, self.batch_size)
+                if not page:
+                    break
+                start_after = page[-1][0]
+                orphans = [key for key, modified in page if modified < cutoff and key not in referenced]
+                if orphans:
+                    async with AsyncSessionLocal() as db:
+                        await db.execute(insert(StorageDeletion), [
+                            {"url": storage_service.file_url(key), "next_attempt_at": datetime.utcnow()}
+                            for key in orphans
+                        ])
+                        await db.commit()
+                    queued += len(orphans)
+                if len(page) < self.batch_size:
+                    break
+        logger.info(f"Storage sweep queued {queued} orphaned objects under {prefixes}")
+        return queued
+
+    async def _referenced_keys(self) -> Set[str]:
+        # Soft-deleted videos count as referenced: their files are queued already
+        keys: Set[str] = set()
+        async with AsyncSessionLocal() as db:
+            for query in (
+                select(Video.video_url, Video.thumbnail_url),
+                select(StorageDeletion.url),
+            ):
+                async for urls in await db.stream(query.execution_options(yield_per=5000)):
+                    # Not storage_object_key: its LRU cache is sized for requests, not a full scan
+                    keys.update(key for key in map(storage_service.object_key, urls) if key)
+        return keys
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "deleted": self.deleted,
+            "retried": self.retried,
+            "dead": self.dead,
+            "purged": self.purged,
+        }
+
+
+storage_collector = StorageCollector(
+    batch_size=settings.STORAGE_GC_BATCH_SIZE,
+    max_attempts=settings.STORAGE_GC_MAX_ATTEMPTS,
+    retry_base=settings.STORAGE_GC_RETRY_BASE,
+    retry_max=settings.STORAGE_GC_RETRY_MAX,
+    purge_delay=settings.STORAGE_GC_PURGE_DELAY,
+)
+
+
+async def collect_storage() -> Dict[str, int]:
+    redis = get_redis()
+    if not await redis.set(GC_LOCK_KEY, 1, nx=True, ex=GC_LOCK_TTL):
+        await redis.set(GC_RERUN_KEY, 1, ex=GC_LOCK_TTL)
+        return {"batches": 0, "purged": 0}
+    try:
+        while True:
+            await redis.delete(GC_RERUN_KEY)
+            result = await storage_collector.collect()
+            # Rows committed while this pass was finishing
+            if not await redis.exists(GC_RERUN_KEY):
+                return result
+    finally:
+        await redis.delete(GC_LOCK_KEY)
+
+
+@celery_app.task(name="app.tasks.storage.collect_storage_task")
+def collect_storage_task() -> Dict[str, int]:
+    """
+    Delete queued storage objects; enqueued on video delete and run periodically.
+    """
+    return runtime.run(collect_storage(), name="storage gc")
+
+
+@celery_app.task(name="app.tasks.storage.sweep_storage_task")
+def sweep_storage_task() -> int:
+    """
+    Queue unreferenced objects for deletion and collect them.
+    """
+    queued = runtime.run(
+        storage_collector.sweep(settings.STORAGE_SWEEP_PREFIXES, settings.STORAGE_SWEEP_MIN_AGE),
+        name="storage sweep",
+    )
+    if queued:
+        runtime.run(collect_storage(), name="storage gc")
+    return queued
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+import httpx
+from loguru import logger
+
+from app.core.config import settings
+from app.core.http import http_clients
+from app.core.redis import get_redis
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.service import user_service
+from app.tasks.runtime import runtime
+from app.tasks.worker import celery_app
+
+
+@dataclass
+class BackfillResult:
+    pages: int = 0
+    users_seen: int = 0
+    users_created: int = 0
+    profiles_created: int = 0
+    resumed_from: int = 0
+    # Set when the run stopped on a 429: seconds to wait before resuming
+    retry_after: Optional[int] = None
+
+
+class RedisCheckpoint:
+    """
+    Last fully imported page, shared by every worker.
+    """
+
+    def __init__(self, key: str = "backfill:users:page"):
+        self.key = key
+
+    async def load(self) -> int:
+        return int(await get_redis().get(self.key) or 0)
+
+    async def save(self, page: int) -> None:
+        await get_redis().set(self.key, page)
+
+    async def clear(self) -> None:
+        await get_redis().delete(self.key)
+
+
+class FileCheckpoint:
+    """
+    Same as RedisCheckpoint, kept in a local file (CLI runs without Redis).
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    async def load(self) -> int:
+        try:
+            return int(json.loads(self.path.read_text())["page"])
+        except (FileNotFoundError, ValueError, KeyError):
+            return 0
+
+    async def save(self, page: int) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"page": page}))
+        os.replace(tmp, self.path)
+
+    async def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+async def fetch_admin_users_page(page: int, per_page: int) -> List[Dict[str, Any]]:
+    """
+    One page (1-based) of the Supabase admin users API.
+    """
+    response = await http_clients.get("supabase").get(
+        "/auth/v1/admin/users",
+        params={"page": page, "per_page": per_page},
+        headers={
+            "apikey": settings.SUPABASE_SECRET_KEY,
+            "Authorization": f"Bearer {settings.SUPABASE_SECRET_KEY}",
+        },
+    )
+    response.raise_for_status()
+    return response.json().get("users", [])
+
+
+def _retry_after(error: BaseException) -> Optional[int]:
+    """
+    Seconds to back off if error is the admin API rate limiting us, else None.
+    """
+    if not isinstance(error, httpx.HTTPStatusError) or error.response.status_code != 429:
+        return None
+    try:
+        return int(error.response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return settings.BACKFILL_RATE_LIMIT_DELAY
+
+
+def _user_row(admin_user: Dict[str, Any]) -> Dict[str, Any]:
+    user_id = admin_user["id"]
+    metadata = admin_user.get("user_metadata") or {}
+    return {
+        "id": UUID(user_id),
+        # Same fallback as first-login provisioning (phone-only accounts)
+        "email": admin_user.get("email") or f"user_{user_id}@example.com",
+        "full_name": metadata.get("full_name") or metadata.get("name"),
+    }
+
+
+async def backfill_users(
+    per_page: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    checkpoint=None,
+    max_pages: Optional[int] = None,
+) -> BackfillResult:
+    """
+    Import every Supabase auth user that has no local User/UserProfile yet.
+
+    Pages are fetched `concurrency` at a time; each page is written with
+    multi-row upserts in its own transaction. The checkpoint only advances
+    past pages that are all done, so an interrupted run resumes without gaps
+    (a partially imported page is simply upserted again). When the admin
+    API rate limits a page the run checkpoints what came before it and
+    stops, with result.retry_after set; other errors are raised after
+    checkpointing.
+    """
+    per_page = per_page or settings.BACKFILL_PAGE_SIZE
+    concurrency = concurrency or settings.BACKFILL_CONCURRENCY
+    checkpoint = checkpoint or RedisCheckpoint()
+    result = BackfillResult(resumed_from=await checkpoint.load())
+
+    async def import_page(page: int) -> int:
+        admin_users = await fetch_admin_users_page(page, per_page)
+        if admin_users:
+            async with AsyncSessionLocal() as db:
+                created, profiles = await user_service.bulk_upsert(db, [_user_row(u) for u in admin_users])
+                await db.commit()
+            result.users_created += created
+            result.profiles_created += profiles
+        result.users_seen += len(admin_users)
+        return len(admin_users)
+
+    next_page = result.resumed_from + 1
+    done = False
+    while not done and (max_pages is None or result.pages < max_pages):
+        window = range(next_page, next_page + concurrency)
+        if max_pages is not None:
+            window = window[:max_pages - result.pages]
+        counts = await asyncio.gather(*(import_page(page) for page in window), return_exceptions=True)
+        error = None
+        for page, count in zip(window, counts):
+            if isinstance(count, BaseException):
+                error = count
+                break
+            next_page = page + 1
+            if count:
+                result.pages += 1
+            if count < per_page:
+                # A short page is the last one; pages after it are empty
+                done = True
+                break
+        await checkpoint.save(next_page - 1)
+        logger.info(f"User backfill: through page {next_page - 1}, {result.users_seen} users seen")
+        if error is not None:
+            result.retry_after = _retry_after(error)
+            if result.retry_after is None:
+                raise error
+            logger.warning(f"User backfill rate limited at page {next_page}; resume in {result.retry_after}s")
+            break
+
+    if done:
+        await checkpoint.clear()
+    logger.info(f"User backfill finished: {asdict(result)}")
+    return result
+
+
+@celery_app.task(name="app.tasks.users.backfill_users_task", bind=True, max_retries=None)
+def backfill_users_task(self, per_page: Optional[int] = None, concurrency: Optional[int] = None) -> Dict[str, int]:
+    """
+    Pre-provision all Supabase users (e.g. after a migration); resumable.
+    A rate-limited run is retried from its checkpoint after Retry-After.
+    """
+    result = runtime.run(backfill_users(per_page, concurrency), name="user backfill")
+    if result.retry_after is not None:
+        raise self.retry(countdown=result.retry_after)
+    return asdict(result)
@@ -9,9 +9,39 @@ celery_app = Celery(
 
 celery_app.conf.task_routes = {
     "app.tasks.vibes.*": "vibe-queue",
+    "app.tasks.users.*": "maintenance-queue",
+    "app.tasks.storage.*": "maintenance-queue",
+    "app.tasks.recovery.*": "maintenance-queue",
 }
 
-celery_app.autodiscover_tasks(["app.tasks.vibes", "app.tasks.viral", "app.tasks.payments"])
+# Run by the beat scheduler embedded in the worker (celery worker -B)
+celery_app.conf.beat_schedule = {
+    # Retries of failed storage deletes and purging of soft-deleted videos
+    "storage-gc": {
+        "task": "app.tasks.storage.collect_storage_task",
+        "schedule": settings.STORAGE_GC_INTERVAL,
+    },
+    "storage-sweep": {
+        "task": "app.tasks.storage.sweep_storage_task",
+        "schedule": settings.STORAGE_SWEEP_INTERVAL,
+    },
+    # Videos left pending/processing by a crashed worker or poller
+    "video-recovery": {
+        "task": "app.tasks.recovery.recover_stuck_videos_task",
+        "schedule": settings.RECOVERY_INTERVAL,
+    },
+}
+
+celery_app.conf.update(
+    worker_pool=settings.WORKER_POOL,
+    worker_concurrency=settings.WORKER_CONCURRENCY,
+    # Ack after the job finishes, so one interrupted by shutdown is redelivered
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+)
+
+celery_app.autodiscover_tasks(["app.tasks.vibes", "app.tasks.viral", "app.tasks.payments", "app.tasks.users", "app.tasks.storage", "app.tasks.recovery"])
 
 # Ensure all models are loaded and mappers configured for the worker process
 import app.db.base
@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+from dataclasses import asdict
+
+from app.core.http import http_clients
+from app.core.redis import close_redis
+from app.db.session import engine
+from app.tasks.users import FileCheckpoint, RedisCheckpoint, backfill_users, backfill_users_task
+
+
+async def run(args):
+    checkpoint = FileCheckpoint(args.checkpoint_file) if args.checkpoint_file else RedisCheckpoint()
+    try:
+        if args.reset:
+            await checkpoint.clear()
+        result = await backfill_users(
+            per_page=args.per_page,
+            concurrency=args.concurrency,
+            checkpoint=checkpoint,
+            max_pages=args.max_pages,
+        )
+        print(asdict(result))
+    finally:
+        await http_clients.aclose()
+        await close_redis()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create User/UserProfile rows for all Supabase auth users.")
+    parser.add_argument("--per-page", type=int, help="Admin API page size (default BACKFILL_PAGE_SIZE)")
+    parser.add_argument("--concurrency", type=int, help="Pages fetched in parallel (default BACKFILL_CONCURRENCY)")
+    parser.add_argument("--max-pages", type=int, help="Stop after this many pages (resume later)")
+    parser.add_argument("--checkpoint-file", help="Keep the checkpoint in this file instead of Redis")
+    parser.add_argument("--reset", action="store_true", help="Ignore the checkpoint and start from page 1")
+    parser.add_argument("--enqueue", action="store_true", help="Run as a Celery task on the worker instead")
+    args = parser.parse_args()
+
+    if args.enqueue:
+        print(backfill_users_task.delay(args.per_page, args.concurrency).id)
+    else:
+        asyncio.run(run(args))
@@ -7,9 +7,23 @@ alembic upgrade head
 
 # Choose command based on PROCESS_TYPE env var
 if [ "$PROCESS_TYPE" = "worker" ]; then
-    echo "Starting Tame Celery Worker (Pool: Solo)..."
-    # --concurrency=1 and --pool=solo reduces memory overhead significantly for 512MB RAM
-    exec celery -A app.tasks.worker.celery_app worker --loglevel=info -Q vibe-queue --concurrency=1 --pool=solo
+    echo "Starting Celery Worker (Pool: ${WORKER_POOL:-threads})..."
+    # One process; jobs run as coroutines on a shared event loop (app.tasks.runtime),
+    # so WORKER_CONCURRENCY jobs fit in 512MB. WORKER_POOL=solo runs one at a time.
+    # -B embeds the beat scheduler (storage GC and orphan sweep); set
+    # WORKER_BEAT=false on all but one worker when running several.
+    BEAT_FLAG=""
+    if [ "${WORKER_BEAT:-true}" = "true" ]; then
+        BEAT_FLAG="-B -s /tmp/celerybeat-schedule"
+    fi
+    exec celery -A app.tasks.worker.celery_app worker --loglevel=info -Q vibe-queue,maintenance-queue $BEAT_FLAG
+elif [ "$PROCESS_TYPE" = "relay" ]; then
+    # Only needed with OUTBOX_RELAY_IN_API=false
+    echo "Starting outbox relay..."
+    exec python -m app.tasks.outbox
+elif [ "$PROCESS_TYPE" = "poller" ]; then
+    echo "Starting fal.ai job poller..."
+    exec python -m app.tasks.poller
 else
     # Ensure PORT is set
     APP_PORT=${PORT:-8000}
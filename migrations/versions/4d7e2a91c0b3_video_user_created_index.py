@@ -0,0 +1,48 @@
+"""Index video by user and creation time
+
+Revision ID: 4d7e2a91c0b3
+Revises: c1a2b9e18684
+Create Date: 2026-10-17 11:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d7e2a91c0b3'
+down_revision: Union[str, None] = 'c1a2b9e18684'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so the video table stays writable during the deploy
+    with op.get_context().autocommit_block():
+        # A failed concurrent build leaves an INVALID index that IF NOT
+        # EXISTS would keep; drop it so a retry builds it again
+        invalid = op.get_bind().execute(sa.text(
+            "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass('ix_video_user_id_created_at')"
+        )).scalar()
+        if invalid:
+            op.drop_index('ix_video_user_id_created_at', table_name='video', postgresql_concurrently=True)
+        op.create_index(
+            'ix_video_user_id_created_at',
+            'video',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_video_user_id_created_at',
+            table_name='video',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
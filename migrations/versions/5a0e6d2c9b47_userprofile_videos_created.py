@@ -0,0 +1,34 @@
+"""Lifetime video counter on userprofile
+
+Revision ID: 5a0e6d2c9b47
+Revises: e3c94a0b7f21
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a0e6d2c9b47'
+down_revision: Union[str, None] = 'e3c94a0b7f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant default does not rewrite the table
+    op.add_column('userprofile', sa.Column('videos_created', sa.Integer(), server_default='0', nullable=False))
+    # Deleted videos are gone, so existing users start from what they have now
+    op.execute("""
+        UPDATE userprofile
+        SET videos_created = counts.n
+        FROM (SELECT user_id, count(*) AS n FROM video GROUP BY user_id) AS counts
+        WHERE userprofile.user_id = counts.user_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('userprofile', 'videos_created')
@@ -0,0 +1,73 @@
+"""Webhook dedup table and unique index on video job id
+
+Revision ID: 8b5f3c17d2e6
+Revises: 4d7e2a91c0b3
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b5f3c17d2e6'
+down_revision: Union[str, None] = '4d7e2a91c0b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # The unique index cannot be built over duplicates; fail before changing
+    # anything rather than halfway through the concurrent build
+    duplicates = bind.execute(sa.text(
+        "SELECT replicate_job_id, count(*) FROM video WHERE replicate_job_id IS NOT NULL "
+        "GROUP BY replicate_job_id HAVING count(*) > 1 ORDER BY count(*) DESC LIMIT 10"
+    )).all()
+    if duplicates:
+        listed = ", ".join(f"{job_id} ({count} videos)" for job_id, count in duplicates)
+        raise RuntimeError(
+            f"video.replicate_job_id has duplicates: {listed}. Keep the job id on the video it "
+            "belongs to, set it to NULL on the others and run the migration again."
+        )
+
+    # The table is committed before the index build below, so a retry after
+    # a failed build finds it already there
+    if not sa.inspect(bind).has_table('webhookevent'):
+        op.create_table('webhookevent',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('video_id', sa.UUID(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    # Built concurrently so the video table stays writable during the deploy
+    with op.get_context().autocommit_block():
+        # A failed concurrent build (e.g. a duplicate inserted meanwhile)
+        # leaves an INVALID index that IF NOT EXISTS would keep; drop it
+        invalid = bind.execute(sa.text(
+            "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass('ix_video_replicate_job_id')"
+        )).scalar()
+        if invalid:
+            op.drop_index('ix_video_replicate_job_id', table_name='video', postgresql_concurrently=True)
+        op.create_index(
+            'ix_video_replicate_job_id',
+            'video',
+            ['replicate_job_id'],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_video_replicate_job_id',
+            table_name='video',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_table('webhookevent')
@@ -0,0 +1,43 @@
+"""Soft-deleted videos and the storage deletion queue
+
+Revision ID: 9c2d71e4a5f8
+Revises: 5a0e6d2c9b47
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c2d71e4a5f8'
+down_revision: Union[str, None] = '5a0e6d2c9b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('video', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_table('storagedeletion',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('url', sa.String(), nullable=False),
+    sa.Column('video_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('dead_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_storagedeletion_due', 'storagedeletion', ['next_attempt_at'], unique=False, postgresql_where=sa.text('dead_at IS NULL'))
+    op.create_index('ix_storagedeletion_video_id', 'storagedeletion', ['video_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_storagedeletion_video_id', table_name='storagedeletion')
+    op.drop_index('ix_storagedeletion_due', table_name='storagedeletion', postgresql_where=sa.text('dead_at IS NULL'))
+    op.drop_table('storagedeletion')
+    op.drop_column('video', 'deleted_at')
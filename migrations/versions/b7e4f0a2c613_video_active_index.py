@@ -0,0 +1,48 @@
+"""Partial index on in-flight videos
+
+Revision ID: b7e4f0a2c613
+Revises: 9c2d71e4a5f8
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4f0a2c613'
+down_revision: Union[str, None] = '9c2d71e4a5f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so the video table stays writable during the deploy
+    with op.get_context().autocommit_block():
+        # A failed concurrent build leaves an INVALID index that IF NOT
+        # EXISTS would keep; drop it so a retry builds it again
+        invalid = op.get_bind().execute(sa.text(
+            "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass('ix_video_active_updated_at')"
+        )).scalar()
+        if invalid:
+            op.drop_index('ix_video_active_updated_at', table_name='video', postgresql_concurrently=True)
+        op.create_index(
+            'ix_video_active_updated_at',
+            'video',
+            ['status', 'updated_at'],
+            postgresql_where=sa.text("status IN ('pending', 'processing')"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_video_active_updated_at',
+            table_name='video',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,105 @@
+import os
+import uuid
+
+import pytest
+import pytest_asyncio
+
+# Tests marked "db" run against DATABASE_URL, migrated to head (alembic
+# upgrade head), and those marked "redis" against REDIS_URL; each is skipped
+# without it. The other settings only need to be present: nothing here
+# calls Supabase, and elsewhere Redis errors are absorbed by the best-effort
+# cache and event paths.
+HAS_DB = bool(os.environ.get("DATABASE_URL"))
+HAS_REDIS = bool(os.environ.get("REDIS_URL"))
+
+# Engines connect lazily, so this only satisfies Settings for the other tests
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://test@127.0.0.1:1/test")
+os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:6379/0")
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_PUBLISHABLE_KEY", "test")
+os.environ.setdefault("SUPABASE_SECRET_KEY", "test")
+os.environ["OUTBOX_RELAY_IN_API"] = "false"
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "db: needs DATABASE_URL pointing at a migrated database")
+    config.addinivalue_line("markers", "redis: needs REDIS_URL pointing at a Redis server")
+
+
+def pytest_collection_modifyitems(config, items):
+    missing = {"db": not HAS_DB and "DATABASE_URL", "redis": not HAS_REDIS and "REDIS_URL"}
+    for item in items:
+        for marker, setting in missing.items():
+            if setting and marker in item.keywords:
+                item.add_marker(pytest.mark.skip(reason=f"{setting} is not set"))
+
+
+@pytest_asyncio.fixture
+async def db_engine():
+    """
+    The app's engine and Redis client, released after the test: both are
+    bound to the event loop that opened them, and each test gets a new one.
+    """
+    from app.core.redis import close_redis
+    from app.db.session import engine
+
+    yield engine
+    await close_redis()
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def make_user(db_engine, monkeypatch):
+    """
+    Factory for fresh user ids; their rows are deleted after the test.
+    provision_user's Supabase email lookup is stubbed out.
+    """
+    from sqlalchemy import delete, select
+
+    from app.db.session import AsyncSessionLocal
+    from app.domains.identity.models import User, UserProfile
+    from app.domains.identity.service import user_service
+    from app.domains.outbox.models import OutboxMessage
+    from app.domains.referrals.models import Referral
+    from app.domains.vibes.models import StorageDeletion, Video, WebhookEvent
+
+    async def fake_email(user_id: str) -> str:
+        return f"user_{user_id}@example.com"
+
+    monkeypatch.setattr(user_service, "_fetch_email", fake_email)
+    user_ids = []
+
+    def factory() -> str:
+        user_ids.append(str(uuid.uuid4()))
+        return user_ids[-1]
+
+    yield factory
+    async with AsyncSessionLocal() as db:
+        video_ids = (await db.scalars(select(Video.id).where(Video.user_id.in_(user_ids)))).all()
+        await db.execute(delete(OutboxMessage).where(OutboxMessage.args[0].as_string().in_(map(str, video_ids))))
+        await db.execute(delete(StorageDeletion).where(StorageDeletion.video_id.in_(video_ids)))
+        await db.execute(delete(WebhookEvent).where(WebhookEvent.video_id.in_(video_ids)))
+        await db.execute(delete(Referral).where(Referral.referee_id.in_(user_ids)))
+        for model, column in ((Video, Video.user_id), (UserProfile, UserProfile.user_id), (User, User.id)):
+            await db.execute(delete(model).where(column.in_(user_ids)))
+        await db.commit()
+
+
+@pytest_asyncio.fixture
+async def api(db_engine):
+    """
+    HTTP client for the app, authenticated as the user id in X-Test-User.
+    """
+    import httpx
+    from fastapi import Request
+
+    from app.core.security import get_current_user_id
+    from app.main import app
+
+    def test_user(request: Request) -> str:
+        return request.headers["x-test-user"]
+
+    app.dependency_overrides[get_current_user_id] = test_user
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.pop(get_current_user_id, None)
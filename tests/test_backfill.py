@@ -0,0 +1,143 @@
+import uuid
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+
+import app.tasks.users as users_tasks
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.models import User, UserProfile
+from app.tasks.users import FileCheckpoint, backfill_users
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.db]
+
+
+@pytest_asyncio.fixture
+async def admin_api(make_user, monkeypatch):
+    """
+    Stubbed Supabase admin users endpoint paging through `.users`; pages in
+    `.rate_limited` answer 429 once. `.pages` records the pages requested.
+    """
+    state = type("AdminAPI", (), {"users": [], "pages": [], "rate_limited": set()})()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/auth/v1/admin/users"
+        page, per_page = int(request.url.params["page"]), int(request.url.params["per_page"])
+        state.pages.append(page)
+        if page in state.rate_limited:
+            state.rate_limited.discard(page)
+            return httpx.Response(429, headers={"Retry-After": "7"}, json={"msg": "rate limited"})
+        users = state.users[(page - 1) * per_page:page * per_page]
+        return httpx.Response(200, json={"users": users, "aud": "authenticated"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://test.supabase.co")
+    monkeypatch.setattr(users_tasks.http_clients, "get", lambda name: client)
+
+    def add_users(count: int) -> list:
+        for _ in range(count):
+            user_id = make_user()
+            state.users.append({
+                "id": user_id,
+                # Phone-only accounts have no email
+                "email": f"{user_id}@example.com" if len(state.users) % 5 else None,
+                "user_metadata": {"full_name": f"User {len(state.users)}"},
+            })
+        return [uuid.UUID(user["id"]) for user in state.users]
+
+    state.add_users = add_users
+    return state
+
+
+async def counts(user_ids) -> tuple:
+    async with AsyncSessionLocal() as db:
+        users = await db.scalar(select(func.count()).select_from(User).where(User.id.in_(user_ids)))
+        profiles = await db.scalar(
+            select(func.count()).select_from(UserProfile).where(UserProfile.user_id.in_(user_ids))
+        )
+    return users, profiles
+
+
+async def test_backfill_imports_every_page(admin_api, tmp_path):
+    user_ids = admin_api.add_users(23)
+    checkpoint = FileCheckpoint(str(tmp_path / "checkpoint.json"))
+
+    result = await backfill_users(per_page=5, concurrency=2, checkpoint=checkpoint)
+
+    assert (result.pages, result.users_seen, result.users_created, result.profiles_created) == (5, 23, 23, 23)
+    assert await counts(user_ids) == (23, 23)
+    # The short page 5 is the last; page 6 was only fetched alongside it
+    assert sorted(admin_api.pages) == [1, 2, 3, 4, 5, 6]
+    assert await checkpoint.load() == 0
+    async with AsyncSessionLocal() as db:
+        phone_only = await db.get(User, user_ids[0])
+    assert phone_only.email == f"user_{user_ids[0]}@example.com"
+    assert phone_only.full_name == "User 0"
+
+
+async def test_backfill_resumes_from_checkpoint(admin_api, tmp_path):
+    user_ids = admin_api.add_users(23)
+    checkpoint = FileCheckpoint(str(tmp_path / "checkpoint.json"))
+
+    first = await backfill_users(per_page=5, concurrency=2, checkpoint=checkpoint, max_pages=2)
+    assert (first.pages, first.users_created) == (2, 10)
+    assert await checkpoint.load() == 2
+
+    admin_api.pages.clear()
+    second = await backfill_users(per_page=5, concurrency=2, checkpoint=checkpoint)
+    assert second.resumed_from == 2
+    assert min(admin_api.pages) == 3
+    assert (second.users_created, second.profiles_created) == (13, 13)
+    assert await counts(user_ids) == (23, 23)
+
+
+async def test_backfill_is_idempotent(admin_api, tmp_path):
+    user_ids = admin_api.add_users(12)
+    checkpoint = FileCheckpoint(str(tmp_path / "checkpoint.json"))
+    await backfill_users(per_page=5, concurrency=3, checkpoint=checkpoint)
+
+    # A user that lost its profile gets a new one; nothing else changes
+    async with AsyncSessionLocal() as db:
+        profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == user_ids[3]))
+        await db.delete(profile)
+        await db.commit()
+
+    result = await backfill_users(per_page=5, concurrency=3, checkpoint=checkpoint)
+    assert (result.users_seen, result.users_created, result.profiles_created) == (12, 0, 1)
+    assert await counts(user_ids) == (12, 12)
+
+
+async def test_backfill_stops_on_rate_limit(admin_api, tmp_path):
+    user_ids = admin_api.add_users(23)
+    admin_api.rate_limited.add(3)
+    checkpoint = FileCheckpoint(str(tmp_path / "checkpoint.json"))
+
+    first = await backfill_users(per_page=5, concurrency=2, checkpoint=checkpoint)
+    assert first.retry_after == 7
+    # Pages 1-2 are done; page 4 was imported too but is not checkpointed
+    assert await checkpoint.load() == 2
+    assert sorted(admin_api.pages) == [1, 2, 3, 4]
+    assert first.users_created == 15
+
+    second = await backfill_users(per_page=5, concurrency=2, checkpoint=checkpoint)
+    assert second.retry_after is None
+    assert second.resumed_from == 2
+    assert second.users_created == 8
+    assert await counts(user_ids) == (23, 23)
+    assert await checkpoint.load() == 0
+
+
+async def test_backfill_raises_other_errors(admin_api, tmp_path, monkeypatch):
+    admin_api.add_users(12)
+    checkpoint = FileCheckpoint(str(tmp_path / "checkpoint.json"))
+    fetch = users_tasks.fetch_admin_users_page
+
+    async def failing_fetch(page: int, per_page: int):
+        if page == 2:
+            raise httpx.ConnectError("connection refused")
+        return await fetch(page, per_page)
+
+    monkeypatch.setattr(users_tasks, "fetch_admin_users_page", failing_fetch)
+    with pytest.raises(httpx.ConnectError):
+        await backfill_users(per_page=5, concurrency=2, checkpoint=checkpoint)
+    assert await checkpoint.load() == 1
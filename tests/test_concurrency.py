@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.models import User, UserProfile
+from app.domains.identity.service import user_service
+from app.domains.vibes.models import Video
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.db]
+
+PARALLEL = 25
+
+
+async def _profile(user_id: str) -> UserProfile:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(UserProfile).where(UserProfile.user_id == user_id))
+
+
+async def test_parallel_generates_never_exceed_storage_limit(api, make_user):
+    user_id = make_user()
+    async with AsyncSessionLocal() as db:
+        await user_service.provision_user(db, user_id=user_id)
+        await db.execute(update(UserProfile).where(UserProfile.user_id == user_id).values(storage_limit=3))
+        await db.commit()
+
+    responses = await asyncio.gather(*(
+        api.post("/api/v1/vibes/generate", json={"prompt": f"video {i}"}, headers={"x-test-user": user_id})
+        for i in range(PARALLEL)
+    ))
+    codes = sorted(response.status_code for response in responses)
+    assert codes == [200] * 3 + [429] * (PARALLEL - 3)
+
+    async with AsyncSessionLocal() as db:
+        videos = await db.scalar(select(func.count()).select_from(Video).where(Video.user_id == user_id))
+    profile = await _profile(user_id)
+    assert videos == 3
+    assert profile.storage_used == 3
+    assert profile.videos_created == 3
+
+
+async def test_parallel_deletes_release_one_slot(api, make_user):
+    user_id = make_user()
+    async with AsyncSessionLocal() as db:
+        await user_service.provision_user(db, user_id=user_id)
+    headers = {"x-test-user": user_id}
+    created = [
+        (await api.post("/api/v1/vibes/generate", json={"prompt": "x"}, headers=headers)).json()["data"]["id"]
+        for _ in range(2)
+    ]
+
+    responses = await asyncio.gather(*(
+        api.delete(f"/api/v1/vibes/{created[0]}", headers=headers) for _ in range(PARALLEL)
+    ))
+    codes = sorted(response.status_code for response in responses)
+    assert codes == [200] + [404] * (PARALLEL - 1)
+
+    profile = await _profile(user_id)
+    assert profile.storage_used == 1
+    # Lifetime counter, not released on delete
+    assert profile.videos_created == 2
+
+
+async def test_parallel_first_logins_provision_one_user(api, make_user):
+    user_id = make_user()
+
+    async def provision():
+        async with AsyncSessionLocal() as db:
+            user = await user_service.provision_user(db, user_id=user_id)
+            return str(user.id), user.profile.referral_code
+
+    # Separate sessions racing on the same INSERTs
+    results = await asyncio.gather(*(provision() for _ in range(PARALLEL)))
+    assert len(set(results)) == 1
+
+    # And the same through GET /users/me for a second new user
+    other_id = make_user()
+    responses = await asyncio.gather(*(
+        api.get("/api/v1/users/me", headers={"x-test-user": other_id}) for _ in range(PARALLEL)
+    ))
+    assert [response.status_code for response in responses] == [200] * PARALLEL
+    assert len({response.json()["data"]["id"] for response in responses}) == 1
+
+    async with AsyncSessionLocal() as db:
+        for uid in (user_id, other_id):
+            assert await db.scalar(select(func.count()).select_from(User).where(User.id == uid)) == 1
+            assert await db.scalar(
+                select(func.count()).select_from(UserProfile).where(UserProfile.user_id == uid)
+            ) == 1
@@ -0,0 +1,164 @@
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import update
+
+import app.api.v1.vibes as vibes_api
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.service import user_service
+from app.domains.vibes.events import VideoEventHub
+from app.domains.vibes.models import Video
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.db, pytest.mark.redis]
+
+
+@pytest_asyncio.fixture
+async def hub(api, monkeypatch):
+    """
+    A fresh event hub behind GET /vibes/{id}/events: its Redis subscription
+    is bound to this test's event loop.
+    """
+    hub = VideoEventHub(
+        history=32, ttl=60, heartbeat=5, max_duration=10, max_connections=3, max_per_user=2
+    )
+    monkeypatch.setattr(vibes_api, "video_event_hub", hub)
+    yield hub
+    await hub.close()
+
+
+@pytest_asyncio.fixture
+async def user_video(make_user):
+    """
+    Factory for (user id, video id) with the video in the given status.
+    """
+    async def factory(status: str, user_id: str = None):
+        if user_id is None:
+            user_id = make_user()
+            async with AsyncSessionLocal() as db:
+                await user_service.provision_user(db, user_id=user_id)
+        async with AsyncSessionLocal() as db:
+            video = Video(user_id=user_id, prompt="events", status=status)
+            db.add(video)
+            await db.commit()
+        return user_id, str(video.id)
+
+    return factory
+
+
+def parse_sse(body: str):
+    """
+    (id, data) of each status event in an SSE body.
+    """
+    events = []
+    for block in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if fields.get("event") == "status":
+            events.append((fields["id"], json.loads(fields["data"])))
+    return events
+
+
+def event(video_id: str, status: str) -> dict:
+    return {"id": video_id, "status": status, "video_url": None, "thumbnail_url": None}
+
+
+async def open_stream(api, user_id: str, video_id: str, **kwargs):
+    ticket = (await api.post(f"/api/v1/vibes/{video_id}/events/ticket", headers={"x-test-user": user_id}))
+    assert ticket.status_code == 200
+    params = {"ticket": ticket.json()["data"]["ticket"], **kwargs.pop("params", {})}
+    return await api.get(f"/api/v1/vibes/{video_id}/events", params=params, **kwargs)
+
+
+async def until(condition, timeout: float = 5):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+async def test_ticket_opens_one_stream(api, hub, user_video):
+    user_id, video_id = await user_video("ready")
+    _, other_video_id = await user_video("ready", user_id=user_id)
+    ticket = (await api.post(f"/api/v1/vibes/{video_id}/events/ticket", headers={"x-test-user": user_id})).json()
+    ticket = ticket["data"]["ticket"]
+    url = f"/api/v1/vibes/{video_id}/events"
+
+    # Only for the video it was issued for
+    assert (await api.get(f"/api/v1/vibes/{other_video_id}/events", params={"ticket": ticket})).status_code == 401
+    # That attempt used it up
+    assert (await api.get(url, params={"ticket": ticket})).status_code == 401
+
+    response = await open_stream(api, user_id, video_id)
+    assert response.status_code == 200
+    assert [data["status"] for _, data in parse_sse(response.text)] == ["ready"]
+
+    assert (await api.get(url)).status_code == 401
+    assert (await api.get(url, params={"ticket": "made-up"})).status_code == 401
+    # Bearer tokens are not taken from the query string
+    assert (await api.get(url, params={"access_token": "token"})).status_code == 401
+
+
+async def test_stream_ends_on_final_status(api, hub, user_video):
+    user_id, video_id = await user_video("processing")
+    stream = asyncio.create_task(open_stream(api, user_id, video_id))
+    await until(lambda: hub._connections == 1)
+
+    await hub.publish(event(video_id, "processing"))
+    await hub.publish(event(video_id, "ready"))
+    response = await asyncio.wait_for(stream, 5)
+    assert [data["status"] for _, data in parse_sse(response.text)] == ["processing", "processing", "ready"]
+    assert hub._connections == 0
+
+    # A final video's stream ends right after its snapshot
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Video).where(Video.id == video_id).values(status="ready"))
+        await db.commit()
+    response = await asyncio.wait_for(open_stream(api, user_id, video_id), 5)
+    assert [data["status"] for _, data in parse_sse(response.text)] == ["ready"]
+
+
+@pytest.mark.parametrize("via", ["header", "query"])
+async def test_resume_replays_missed_events(api, hub, user_video, via):
+    user_id, video_id = await user_video("ready")
+    await hub.publish(event(video_id, "processing"))
+    seen = await hub.latest_id(video_id)
+    await hub.publish(event(video_id, "ready"))
+    last = await hub.latest_id(video_id)
+
+    if via == "header":
+        response = await open_stream(api, user_id, video_id, headers={"Last-Event-ID": seen})
+    else:
+        response = await open_stream(api, user_id, video_id, params={"last_event_id": seen})
+    # Only what came after Last-Event-ID, no snapshot
+    assert [(event_id, data["status"]) for event_id, data in parse_sse(response.text)] == [(last, "ready")]
+
+    # Nothing missed and already final: the stored state closes the stream
+    response = await open_stream(api, user_id, video_id, headers={"Last-Event-ID": last})
+    assert [(event_id, data["status"]) for event_id, data in parse_sse(response.text)] == [(last, "ready")]
+
+
+async def test_connection_caps(api, hub, user_video):
+    user_id, video_id = await user_video("processing")
+    other_id, other_video_id = await user_video("processing")
+    third_id, third_video_id = await user_video("processing")
+
+    streams = [asyncio.create_task(open_stream(api, user_id, video_id)) for _ in range(2)]
+    await until(lambda: hub._connections == 2)
+    # max_per_user
+    assert (await open_stream(api, user_id, video_id)).status_code == 429
+    streams.append(asyncio.create_task(open_stream(api, other_id, other_video_id)))
+    await until(lambda: hub._connections == 3)
+    # max_connections for the process
+    assert (await open_stream(api, third_id, third_video_id)).status_code == 503
+    with pytest.raises(HTTPException) as excinfo:
+        hub.check_capacity(third_id)
+    assert excinfo.value.status_code == 503
+
+    await hub.publish(event(video_id, "failed"), event(other_video_id, "failed"))
+    await asyncio.wait_for(asyncio.gather(*streams), 5)
+    assert hub._connections == 0
+    assert hub.rejected == 3
+    hub.check_capacity(user_id)
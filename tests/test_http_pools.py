@@ -0,0 +1,119 @@
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.core.http import HTTPClientRegistry, UpstreamConfig
+
+pytestmark = pytest.mark.asyncio
+
+REQUESTS = 200
+
+
+@pytest_asyncio.fixture
+async def upstream():
+    """
+    Keep-alive HTTP/1.1 server on localhost answering every request after
+    `.delay` seconds; counts the connections it accepted and the peak
+    number open at once.
+    """
+    state = type("Upstream", (), {"delay": 0.0, "accepted": 0, "open": 0, "peak": 0})()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        state.accepted += 1
+        state.open += 1
+        state.peak = max(state.peak, state.open)
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                await asyncio.sleep(state.delay)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            state.open -= 1
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    state.url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    yield state
+    server.close()
+    await server.wait_closed()
+
+
+def registry(upstream, max_connections: int) -> HTTPClientRegistry:
+    return HTTPClientRegistry({
+        "upstream": UpstreamConfig(
+            base_url=upstream.url, max_connections=max_connections, max_keepalive_connections=max_connections
+        ),
+    })
+
+
+async def test_pooled_client_reuses_connections(upstream):
+    clients = registry(upstream, max_connections=8)
+    upstream.delay = 0.005
+    responses = await asyncio.gather(*(clients.get("upstream").get("/") for _ in range(REQUESTS)))
+    assert {response.status_code for response in responses} == {200}
+
+    stats = clients.stats()["upstream"]
+    # Never more than max_connections, each reused for many requests
+    assert upstream.peak <= 8
+    assert upstream.accepted == stats["connections_opened"] <= 8
+    assert stats["requests"] == REQUESTS
+    assert stats["reuse_ratio"] >= 0.95
+    assert stats["waits"] > 0
+    assert stats["in_use"] == 0
+    await clients.aclose()
+
+
+async def test_client_per_request_opens_a_connection_each(upstream):
+    # The baseline the registry replaces
+    for _ in range(20):
+        async with httpx.AsyncClient(base_url=upstream.url) as client:
+            assert (await client.get("/")).status_code == 200
+    assert upstream.accepted == 20
+
+    upstream.accepted = 0
+    clients = registry(upstream, max_connections=8)
+    for _ in range(20):
+        assert (await clients.get("upstream").get("/")).status_code == 200
+    assert upstream.accepted == 1
+    await clients.aclose()
+
+
+async def test_streamed_responses_release_their_connection(upstream):
+    clients = registry(upstream, max_connections=2)
+    client = clients.get("upstream")
+    async with client.stream("GET", "/"):
+        # Held until the body is read or the response closed
+        assert clients.stats()["upstream"]["in_use"] == 1
+    assert clients.stats()["upstream"]["in_use"] == 0
+
+    # Closed unread, that connection was dropped; read ones are reused and
+    # a pool of 2 is not exhausted by them
+    for _ in range(5):
+        async with client.stream("GET", "/") as response:
+            await response.aread()
+    assert upstream.accepted == 2
+    await clients.aclose()
+
+
+async def test_each_event_loop_gets_its_own_clients(upstream):
+    clients = registry(upstream, max_connections=4)
+    client = clients.get("upstream")
+    assert clients.get("upstream") is client
+
+    def other_loop():
+        async def fetch():
+            other = clients.get("upstream")
+            assert (await other.get("/")).status_code == 200
+            await clients.aclose()
+            return other
+
+        return asyncio.run(fetch())
+
+    assert await asyncio.to_thread(other_loop) is not client
+    # Back on this loop the registry builds a fresh client again
+    assert (await clients.get("upstream").get("/")).status_code == 200
+    await clients.aclose()
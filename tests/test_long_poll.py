@@ -0,0 +1,163 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import update
+
+import app.api.v1.users as users_api
+import app.api.v1.vibes as vibes_api
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.cache import profile_cache
+from app.domains.identity.service import user_service
+from app.domains.vibes.events import VideoEventHub
+from app.domains.vibes.models import Video
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.db, pytest.mark.redis]
+
+
+@pytest_asyncio.fixture
+async def hub(api, monkeypatch):
+    """
+    A fresh event hub behind the long-polls, bound to this test's loop.
+    """
+    hub = VideoEventHub(
+        history=32, ttl=60, heartbeat=5, max_duration=10, max_connections=3, max_per_user=2
+    )
+    monkeypatch.setattr(vibes_api, "video_event_hub", hub)
+    monkeypatch.setattr(users_api, "video_event_hub", hub)
+    yield hub
+    await hub.close()
+
+
+@pytest_asyncio.fixture
+async def user_id(make_user):
+    user_id = make_user()
+    async with AsyncSessionLocal() as db:
+        await user_service.provision_user(db, user_id=user_id)
+    return user_id
+
+
+async def add_video(user_id: str, status: str = "processing") -> str:
+    async with AsyncSessionLocal() as db:
+        video = Video(user_id=user_id, prompt="poll", status=status)
+        db.add(video)
+        await db.commit()
+    return str(video.id)
+
+
+async def until(condition, timeout: float = 5):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+async def test_video_etag(api, hub, user_id):
+    video_id = await add_video(user_id)
+    headers = {"x-test-user": user_id}
+    url = f"/api/v1/vibes/{video_id}"
+
+    first = await api.get(url, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    for if_none_match in (etag, etag.removeprefix("W/"), f'W/"other", {etag}', "*"):
+        response = await api.get(url, headers={**headers, "if-none-match": if_none_match})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert not response.content
+
+    # A change gives a new ETag
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Video).where(Video.id == video_id).values(status="ready"))
+        await db.commit()
+    response = await api.get(url, headers={**headers, "if-none-match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["data"]["status"] == "ready"
+
+    # Someone else's video is not found, whatever the ETag
+    response = await api.get(url, headers={"x-test-user": str(uuid.uuid4()), "if-none-match": "*"})
+    assert response.status_code == 404
+
+
+async def test_video_wait_returns_on_change(api, hub, user_id):
+    video_id = await add_video(user_id)
+    url = f"/api/v1/vibes/{video_id}"
+    etag = (await api.get(url, headers={"x-test-user": user_id})).headers["etag"]
+
+    started = time.monotonic()
+    poll = asyncio.create_task(
+        api.get(url, params={"wait": 10}, headers={"x-test-user": user_id, "if-none-match": etag})
+    )
+    await until(lambda: hub._connections == 1)
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Video).where(Video.id == video_id).values(status="ready"))
+        await db.commit()
+    await hub.publish({"id": video_id, "status": "ready", "video_url": None, "thumbnail_url": None})
+
+    response = await asyncio.wait_for(poll, 5)
+    assert response.status_code == 200
+    assert response.json()["data"]["status"] == "ready"
+    assert response.headers["etag"] != etag
+    assert time.monotonic() - started < 5
+    assert hub._connections == 0
+
+
+async def test_video_wait_times_out(api, hub, user_id):
+    video_id = await add_video(user_id)
+    url = f"/api/v1/vibes/{video_id}"
+    etag = (await api.get(url, headers={"x-test-user": user_id})).headers["etag"]
+    headers = {"x-test-user": user_id, "if-none-match": etag}
+
+    started = time.monotonic()
+    response = await api.get(url, params={"wait": 0.5}, headers=headers)
+    assert response.status_code == 304
+    assert 0.45 <= time.monotonic() - started < 3
+
+    # Without a matching ETag there is nothing to wait for
+    started = time.monotonic()
+    response = await api.get(url, params={"wait": 10}, headers={"x-test-user": user_id, "if-none-match": 'W/"old"'})
+    assert response.status_code == 200
+    assert time.monotonic() - started < 1
+    assert hub._connections == 0
+
+    # Over the limit for the user, it is answered right away
+    async with hub.subscribe("other", user_id), hub.subscribe("other", user_id):
+        started = time.monotonic()
+        response = await api.get(url, params={"wait": 10}, headers=headers)
+        assert response.status_code == 304
+        assert time.monotonic() - started < 1
+
+
+async def test_profile_etag_and_wait(api, hub, user_id):
+    headers = {"x-test-user": user_id}
+    first = await api.get("/api/v1/users/me", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+    response = await api.get("/api/v1/users/me", headers={**headers, "if-none-match": etag})
+    assert response.status_code == 304
+
+    started = time.monotonic()
+    response = await api.get("/api/v1/users/me", params={"wait": 0.5}, headers={**headers, "if-none-match": etag})
+    assert response.status_code == 304
+    assert time.monotonic() - started >= 0.45
+
+    poll = asyncio.create_task(
+        api.get("/api/v1/users/me", params={"wait": 10}, headers={**headers, "if-none-match": etag})
+    )
+    await until(lambda: hub._connections == 1)
+    video_id = await add_video(user_id)
+    await profile_cache.invalidate(user_id)
+
+    response = await asyncio.wait_for(poll, 5)
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [video["id"] for video in response.json()["data"]["videos"]] == [video_id]
+    assert hub._connections == 0
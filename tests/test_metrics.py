@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.core.config import settings
+from app.core.metrics import MetricsRegistry, metrics_registry
+from app.main import app
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_ttl_source_runs_once_per_ttl():
+    registry = MetricsRegistry()
+    calls = 0
+
+    async def expensive():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"calls": calls}
+
+    registry.register("cheap", lambda: {"ok": True})
+    registry.register("expensive", expensive, ttl=60)
+    snapshots = await asyncio.gather(*(registry.snapshot() for _ in range(10)))
+    assert calls == 1
+    assert all(snapshot == {"cheap": {"ok": True}, "expensive": {"calls": 1}} for snapshot in snapshots)
+
+
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    monkeypatch.setattr(metrics_registry, "_sources", {"test": lambda: {"ok": True}})
+    monkeypatch.setattr(metrics_registry, "_ttls", {"test": 0})
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def test_metrics_disabled_without_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    assert (await client.get("/metrics")).status_code == 404
+
+
+async def test_metrics_requires_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "s3cret")
+    assert (await client.get("/metrics")).status_code == 401
+    assert (await client.get("/metrics", headers={"Authorization": "Bearer wrong"})).status_code == 401
+    response = await client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.json()["data"] == {"test": {"ok": True}}
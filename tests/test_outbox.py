@@ -0,0 +1,135 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, func, select, text
+
+import app.tasks.outbox as outbox
+from app.core.redis import get_redis
+from app.db.session import AsyncSessionLocal
+from app.domains.outbox.models import OutboxMessage
+from app.domains.outbox.service import outbox_service
+from app.tasks.outbox import OutboxRelay, task_message
+from app.tasks.vibes import run_video_generation_task
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.db]
+
+# Not routed anywhere, so it lands on Celery's default queue
+NOOP_TASK = SimpleNamespace(name="tests.outbox.noop")
+
+
+@pytest_asyncio.fixture
+async def broker(db_engine):
+    """
+    The broker's Redis; messages and dedup markers of the task ids added to
+    `sent` are removed afterwards. Skips when Redis is unreachable.
+    """
+    redis = get_redis()
+    try:
+        await redis.ping()
+    except Exception as e:
+        pytest.skip(f"Redis is unreachable: {e}")
+    sent = SimpleNamespace(task_ids=set(), queues={"celery", "vibe-queue"})
+    yield SimpleNamespace(redis=redis, sent=sent)
+    for queue in sent.queues:
+        for raw in await redis.lrange(queue, 0, -1):
+            if json.loads(raw)["headers"]["id"] in sent.task_ids:
+                await redis.lrem(queue, 0, raw)
+    for task_id in sent.task_ids:
+        await redis.delete(f"outbox:sent:{task_id}")
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(OutboxMessage).where(OutboxMessage.task_id.in_(sent.task_ids)))
+        await db.commit()
+
+
+async def _queued(broker, queue: str) -> list:
+    return [
+        json.loads(raw)["headers"]["id"]
+        for raw in await broker.redis.lrange(queue, 0, -1)
+        if json.loads(raw)["headers"]["id"] in broker.sent.task_ids
+    ]
+
+
+async def test_task_message_matches_apply_async(broker):
+    task_id = "outbox-test-apply-async"
+    broker.sent.task_ids.add(task_id)
+    run_video_generation_task.apply_async(kwargs={"video_id": "v1"}, task_id=task_id)
+    raw = next(
+        json.loads(raw) for raw in await broker.redis.lrange("vibe-queue", 0, -1)
+        if json.loads(raw)["headers"]["id"] == task_id
+    )
+
+    queue, payload = task_message(task_id, run_video_generation_task.name, [], {"video_id": "v1"})
+    message = json.loads(payload)
+    # Random per message
+    del raw["properties"]["delivery_tag"], message["properties"]["delivery_tag"]
+    assert queue == "vibe-queue"
+    assert message == raw
+
+
+async def test_relay_publishes_once_across_a_crash(broker, monkeypatch):
+    relay = OutboxRelay(batch_size=1000, poll_interval=1.0, dedup_ttl=60)
+    async with AsyncSessionLocal() as db:
+        for i in range(20):
+            broker.sent.task_ids.add(await outbox_service.enqueue(db, NOOP_TASK, i))
+        await db.commit()
+
+    # Crash after the batch reached the broker but before it left the outbox
+    def crash(*args, **kwargs):
+        raise RuntimeError("relay crashed")
+
+    with monkeypatch.context() as m:
+        m.setattr(outbox, "delete", crash)
+        with pytest.raises(RuntimeError):
+            await relay.relay_batch()
+    assert sorted(await _queued(broker, "celery")) == sorted(broker.sent.task_ids)
+
+    # The retried batch is deleted without publishing anything twice
+    await relay.relay_batch()
+    assert sorted(await _queued(broker, "celery")) == sorted(broker.sent.task_ids)
+    assert relay.duplicates >= 20
+    async with AsyncSessionLocal() as db:
+        left = await db.scalar(
+            select(func.count()).select_from(OutboxMessage).where(OutboxMessage.task_id.in_(broker.sent.task_ids))
+        )
+    assert left == 0
+
+
+async def test_relay_relistens_after_losing_its_connection(broker):
+    # Polling alone would take a minute; only NOTIFY can wake the relay in time
+    relay = OutboxRelay(batch_size=1000, poll_interval=60, dedup_ttl=60)
+    stop = asyncio.Event()
+    run = asyncio.create_task(relay.run(stop))
+
+    async def until(condition):
+        for _ in range(500):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError("condition not reached")
+
+    async def enqueue_and_wait(value):
+        async with AsyncSessionLocal() as db:
+            task_id = await outbox_service.enqueue(db, NOOP_TASK, value)
+            await db.commit()
+        broker.sent.task_ids.add(task_id)
+        await until(lambda: relay.published >= len(broker.sent.task_ids))
+
+    try:
+        await until(lambda: relay.listens == 1)
+        await enqueue_and_wait(1)
+
+        # The server drops the LISTEN connection (restart, failover, idle kill)
+        pid = relay._listener.get_server_pid()
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": pid})
+        await until(lambda: relay.listens == 2)
+        assert relay._listener.get_server_pid() != pid
+        await enqueue_and_wait(2)
+    finally:
+        stop.set()
+        await asyncio.wait_for(run, 5)
+    assert relay._listener is None
+    assert sorted(await _queued(broker, "celery")) == sorted(broker.sent.task_ids)
@@ -0,0 +1,98 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.service import user_service
+from app.domains.vibes.models import Video
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.db]
+
+URL = "/api/v1/vibes"
+
+
+async def user_with_videos(make_user, created_at: list, **columns) -> tuple:
+    """
+    A user with one video per created_at, and the video ids newest first
+    (ties broken by id, descending).
+    """
+    user_id = make_user()
+    async with AsyncSessionLocal() as db:
+        await user_service.provision_user(db, user_id=user_id)
+        videos = [Video(user_id=user_id, prompt="page", status="ready", created_at=at, **columns) for at in created_at]
+        db.add_all(videos)
+        await db.commit()
+    ordered = sorted(videos, key=lambda video: (video.created_at, video.id), reverse=True)
+    return user_id, [str(video.id) for video in ordered]
+
+
+async def walk(api, user_id: str, limit: int, **params) -> list:
+    """
+    Every page's ids, following next_cursor to the last page.
+    """
+    pages, cursor = [], None
+    while True:
+        query = {"limit": limit, **params, **({"cursor": cursor} if cursor else {})}
+        response = await api.get(URL, params=query, headers={"x-test-user": user_id})
+        assert response.status_code == 200
+        data = response.json()["data"]
+        pages.append([item["id"] for item in data["items"]])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return pages
+        assert len(pages) < 50
+
+
+async def test_pages_split_tied_created_at(api, make_user):
+    base = datetime(2026, 1, 1, 12, 0, 0)
+    # Seven videos sharing one created_at, between two others
+    created_at = [base + timedelta(minutes=1)] + [base] * 7 + [base - timedelta(minutes=1)]
+    user_id, expected = await user_with_videos(make_user, created_at)
+
+    pages = await walk(api, user_id, limit=3)
+    assert [len(page) for page in pages] == [3, 3, 3]
+    assert [video_id for page in pages for video_id in page] == expected
+
+
+async def test_last_page_has_no_cursor(api, make_user):
+    base = datetime(2026, 1, 1)
+    user_id, expected = await user_with_videos(make_user, [base + timedelta(seconds=i) for i in range(4)])
+
+    # A full last page is not followed by an empty one
+    assert await walk(api, user_id, limit=2) == [expected[:2], expected[2:]]
+    assert await walk(api, user_id, limit=4) == [expected]
+    assert await walk(api, user_id, limit=5) == [expected]
+
+    other_id = make_user()
+    async with AsyncSessionLocal() as db:
+        await user_service.provision_user(db, user_id=other_id)
+    assert await walk(api, other_id, limit=2) == [[]]
+
+
+async def test_deleted_and_filtered_videos_are_skipped(api, make_user):
+    base = datetime(2026, 1, 1)
+    user_id, expected = await user_with_videos(make_user, [base + timedelta(seconds=i) for i in range(3)])
+    async with AsyncSessionLocal() as db:
+        db.add(Video(user_id=user_id, prompt="page", status="failed", created_at=base + timedelta(seconds=1)))
+        db.add(Video(user_id=user_id, prompt="page", status="ready", created_at=base, deleted_at=base))
+        await db.commit()
+
+    pages = await walk(api, user_id, limit=2, status="ready")
+    assert [video_id for page in pages for video_id in page] == expected
+    assert len(sum(await walk(api, user_id, limit=2), [])) == 4
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    "%%%",
+    base64.urlsafe_b64encode(b"2026-01-01T00:00:00").decode(),
+    base64.urlsafe_b64encode(b"yesterday|00000000-0000-0000-0000-000000000000").decode(),
+    base64.urlsafe_b64encode(b"2026-01-01T00:00:00|not-a-uuid").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe|\x00").decode(),
+])
+async def test_invalid_cursor(api, make_user, cursor):
+    user_id = make_user()
+    response = await api.get(URL, params={"cursor": cursor}, headers={"x-test-user": user_id})
+    assert response.status_code == 400
+    assert response.json()["message"] == "Invalid cursor"
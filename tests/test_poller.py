@@ -0,0 +1,226 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+import app.tasks.poller as poller_module
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.service import user_service
+from app.domains.vibes.models import Video
+from app.tasks.poller import FalPoller, RateLimiter, _Job, _Outcome
+
+pytestmark = pytest.mark.asyncio
+
+VIDEO_URL = "https://fal.media/out.mp4"
+
+
+@pytest.fixture
+def fal(monkeypatch):
+    """
+    Stubbed fal.ai queue: `.statuses[request_id]` is the list of statuses
+    successive status checks return (the last one repeats); an int is
+    answered as that HTTP error. `.requests` records (time, request id) of
+    every status check. Results of request ids starting with "novideo"
+    have no video.
+    """
+    state = type("Fal", (), {"statuses": {}, "requests": []})()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        parts = request.url.path.strip("/").split("/")
+        request_id = parts[3]
+        if parts[-1] != "status":
+            return httpx.Response(200, json={} if request_id.startswith("novideo") else {"video": {"url": VIDEO_URL}})
+        state.requests.append((time.monotonic(), request_id))
+        statuses = state.statuses[request_id]
+        status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        if isinstance(status, int):
+            return httpx.Response(status, json={"detail": "error"})
+        return httpx.Response(200, json={"status": status})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://queue.fal.run")
+    monkeypatch.setattr(poller_module.http_clients, "get", lambda name: client)
+    return state
+
+
+def make_poller(**kwargs) -> FalPoller:
+    options = dict(
+        model="fal-ai/kling-video/v2.5-turbo/pro/text-to-video",
+        scan_interval=0.05,
+        min_interval=1.0,
+        max_interval=8.0,
+        backoff=2.0,
+        max_rps=1000,
+        concurrency=16,
+        flush_interval=0.05,
+        job_timeout=3600,
+    )
+    return FalPoller(**{**options, **kwargs})
+
+
+def make_job(request_id: str, interval: float = 1.0, age: float = 0) -> _Job:
+    return _Job(
+        next_poll_at=time.monotonic(),
+        video_id=request_id,
+        user_id=None,
+        request_id=request_id,
+        submitted_at=time.time() - age,
+        interval=interval,
+    )
+
+
+async def poll(poller: FalPoller, job: _Job) -> None:
+    # _dispatch takes a slot that _poll gives back
+    await poller._slots.acquire()
+    await poller._poll(job)
+
+
+async def test_interval_backs_off_while_status_is_unchanged(fal):
+    poller = make_poller()
+    fal.statuses["job"] = ["IN_QUEUE"] * 5 + ["IN_PROGRESS"] * 2 + [503, "IN_PROGRESS"]
+    job = make_job("job")
+    intervals = []
+    for _ in range(9):
+        await poll(poller, job)
+        intervals.append(job.interval)
+    # Unchanged statuses back off up to max_interval, a change resets the
+    # interval and a failed check backs off as well
+    assert intervals == [1.0, 2.0, 4.0, 8.0, 8.0, 1.0, 2.0, 4.0, 8.0]
+    assert poller.poll_errors == 1
+    assert job.errors == 1
+    assert not poller._outcomes
+    assert len(poller._schedule) == 9
+
+
+async def test_outcomes(fal):
+    poller = make_poller()
+    fal.statuses.update({"done": ["COMPLETED"], "error": ["FAILED"], "novideo": ["OK"]})
+    for request_id in fal.statuses:
+        await poll(poller, make_job(request_id))
+    outcomes = {outcome.video_id: (outcome.status, outcome.video_url) for outcome in poller._outcomes}
+    assert outcomes == {
+        "done": ("ready", VIDEO_URL),
+        "error": ("failed", None),
+        "novideo": ("failed", None),
+    }
+    assert (poller.completed, poller.failed) == (1, 2)
+    assert not poller._schedule
+
+
+@pytest.mark.parametrize("status", ["IN_PROGRESS", 503])
+async def test_job_fails_after_timeout(fal, status):
+    poller = make_poller(job_timeout=60)
+    fal.statuses["job"] = [status]
+    job = make_job("job", age=61)
+    await poll(poller, job)
+    assert [(o.video_id, o.status) for o in poller._outcomes] == [("job", "failed")]
+    assert not poller._schedule
+
+    # Still within the timeout it is just checked again later
+    poller = make_poller(job_timeout=60)
+    await poll(poller, make_job("job", age=30))
+    assert not poller._outcomes
+    assert len(poller._schedule) == 1
+
+
+async def test_rate_limiter():
+    limiter = RateLimiter(rate=20)
+    started = time.monotonic()
+    for _ in range(30):
+        await limiter.acquire()
+    # A burst of 20, then 20 per second
+    assert 0.45 <= time.monotonic() - started < 1.0
+
+
+async def test_dispatch_respects_rate_cap(fal):
+    poller = make_poller(min_interval=0.001, max_interval=0.001, max_rps=20)
+    for i in range(50):
+        fal.statuses[f"job{i}"] = ["IN_QUEUE"]
+        job = make_job(f"job{i}", interval=0.001)
+        poller._jobs[job.video_id] = job
+        poller._schedule.append(job)
+
+    stop = asyncio.Event()
+    started = time.monotonic()
+    dispatcher = asyncio.create_task(poller._dispatch(stop))
+    await asyncio.sleep(1.0)
+    stop.set()
+    poller._wakeup.set()
+    await dispatcher
+    await asyncio.gather(*poller._polling)
+
+    # A burst of max_rps, then max_rps per second
+    times = [at for at, _ in fal.requests]
+    assert 30 <= len(times) <= 20 + 20 * (time.monotonic() - started) + 1
+    assert times[19] - times[0] < 0.1
+    assert times[-1] - times[19] >= (len(times) - 20) / 20 * 0.9
+
+
+@pytest.mark.db
+async def test_flush_only_writes_processing_videos(make_user, fal):
+    poller = make_poller()
+    user_id = make_user()
+    async with AsyncSessionLocal() as db:
+        await user_service.provision_user(db, user_id=user_id)
+        videos = {
+            "processing": Video(user_id=user_id, prompt="p", status="processing"),
+            "deleted": Video(user_id=user_id, prompt="p", status="processing", deleted_at=datetime.utcnow()),
+            # Already completed by the webhook
+            "webhook": Video(user_id=user_id, prompt="p", status="ready", video_url="users/x/webhook.mp4"),
+        }
+        db.add_all(videos.values())
+        await db.commit()
+
+    for video in videos.values():
+        poller._jobs[video.id] = make_job(str(video.id))
+        poller._outcomes.append(_Outcome(video.id, "ready", VIDEO_URL))
+    await poller.flush()
+
+    async with AsyncSessionLocal() as db:
+        rows = {
+            video.id: (video.status, video.video_url)
+            for video in await db.scalars(select(Video).where(Video.user_id == user_id))
+        }
+    assert {name: rows[video.id] for name, video in videos.items()} == {
+        "processing": ("ready", VIDEO_URL),
+        "deleted": ("processing", None),
+        "webhook": ("ready", "users/x/webhook.mp4"),
+    }
+    assert not poller._outcomes
+    assert not poller._jobs
+
+
+@pytest.mark.db
+async def test_run_tracks_jobs_to_completion(make_user, fal):
+    poller = make_poller(min_interval=0.05, max_interval=0.1)
+    user_id = make_user()
+    async with AsyncSessionLocal() as db:
+        await user_service.provision_user(db, user_id=user_id)
+        video = Video(
+            user_id=user_id,
+            prompt="p",
+            status="processing",
+            replicate_job_id=f"run-{user_id}",
+            created_at=datetime.utcnow() - timedelta(seconds=5),
+        )
+        db.add(video)
+        await db.commit()
+    fal.statuses[video.replicate_job_id] = ["IN_QUEUE", "IN_PROGRESS", "IN_PROGRESS", "COMPLETED"]
+
+    stop = asyncio.Event()
+    run = asyncio.create_task(poller.run(stop))
+    for _ in range(100):
+        async with AsyncSessionLocal() as db:
+            status = await db.scalar(select(Video.status).where(Video.id == video.id))
+        if status != "processing":
+            break
+        await asyncio.sleep(0.05)
+    stop.set()
+    await asyncio.wait_for(run, 5)
+
+    assert status == "ready"
+    assert [request_id for _, request_id in fal.requests if request_id == video.replicate_job_id] == [
+        video.replicate_job_id
+    ] * 4
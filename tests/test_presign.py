@@ -0,0 +1,123 @@
+from datetime import datetime
+
+import pytest
+from loguru import logger
+
+import app.core.cache as cache_module
+import app.core.presign as presign_module
+import app.schemas.vibes as vibes_schemas
+from app.core.presign import PresignedURLCache
+from app.schemas.vibes import presign_video_url, warm_video_urls
+
+START = 1_700_000_000.0
+
+
+class Clock:
+    """
+    Stands in for the time module: wall and monotonic time move together.
+    """
+
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    monotonic = perf_counter = time
+
+
+class Storage:
+    """
+    Presigns `https://media/<key>?signed=<signing time>`; `.failing` makes
+    every signature raise.
+    """
+
+    def __init__(self):
+        self.signed = []
+        self.failing = False
+
+    def _sign(self, key: str, signing_time: datetime) -> str:
+        if self.failing:
+            raise RuntimeError("signing failed")
+        self.signed.append(key)
+        return f"https://media/{key}?signed={signing_time.isoformat()}"
+
+    def generate_presigned_url(self, key, expiration, signing_time):
+        return self._sign(key, signing_time)
+
+    def generate_presigned_urls(self, keys, expiration, signing_time):
+        return {key: self._sign(key, signing_time) for key in keys}
+
+    def object_key(self, url):
+        return url.split("/", 3)[3] if url and url.startswith("https://bucket/") else None
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    storage, clock = Storage(), Clock(START)
+    monkeypatch.setattr(presign_module, "storage_service", storage)
+    monkeypatch.setattr(presign_module, "time", clock)
+    monkeypatch.setattr(cache_module, "time", clock)
+    storage.clock = clock
+    return storage
+
+
+@pytest.fixture
+def warnings():
+    messages = []
+    handler = logger.add(lambda message: messages.append(message.record["message"]), level="WARNING")
+    yield messages
+    logger.remove(handler)
+
+
+def test_url_is_reused_within_its_window(storage):
+    cache = PresignedURLCache(expiration=3600, window=600, maxsize=100)
+    first = cache.get("clips/a.mp4")
+    assert first.endswith(f"signed={datetime.utcfromtimestamp(START - START % 600).isoformat()}")
+
+    storage.clock.now = START - START % 600 + 599
+    assert cache.get("clips/a.mp4") == first
+    assert storage.signed == ["clips/a.mp4"]
+
+    # The next window signs again, from its own start
+    storage.clock.now += 1
+    second = cache.get("clips/a.mp4")
+    assert second != first
+    assert second.endswith(f"signed={datetime.utcfromtimestamp(storage.clock.now).isoformat()}")
+    assert storage.signed == ["clips/a.mp4"] * 2
+    assert cache.stats()["signed"] == 2
+
+
+def test_same_window_gives_identical_urls_across_caches(storage):
+    first = PresignedURLCache(expiration=3600, window=600, maxsize=100).get("clips/a.mp4")
+    storage.clock.now += 1
+    # Another process signing later in the window
+    assert PresignedURLCache(expiration=3600, window=600, maxsize=100).get("clips/a.mp4") == first
+
+
+def test_warm_signs_only_missing_keys(storage):
+    cache = PresignedURLCache(expiration=3600, window=600, maxsize=100)
+    cache.get("clips/a.mp4")
+    cache.warm(["clips/a.mp4", "clips/b.mp4", "clips/b.mp4", "clips/c.mp4"])
+    assert storage.signed == ["clips/a.mp4", "clips/b.mp4", "clips/c.mp4"]
+    cache.get("clips/b.mp4")
+    assert len(storage.signed) == 3
+
+
+def test_window_must_be_shorter_than_expiration():
+    with pytest.raises(ValueError):
+        PresignedURLCache(expiration=600, window=600, maxsize=100)
+
+
+def test_signing_failures_are_logged(storage, monkeypatch, warnings):
+    cache = PresignedURLCache(expiration=3600, window=600, maxsize=100)
+    monkeypatch.setattr(vibes_schemas, "presigned_url_cache", cache)
+    monkeypatch.setattr(vibes_schemas, "storage_object_key", storage.object_key)
+    storage.failing = True
+
+    warm_video_urls([{"video_url": "https://bucket/clips/a.mp4"}, {"video_url": "https://fal.media/out.mp4"}])
+    # Unsigned, but still served
+    assert presign_video_url("https://bucket/clips/a.mp4") == "https://bucket/clips/a.mp4"
+    assert presign_video_url("https://fal.media/out.mp4") == "https://fal.media/out.mp4"
+    assert len(warnings) == 2
+    assert "signing failed" in warnings[0] and "clips/a.mp4" in warnings[1]
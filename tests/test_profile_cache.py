@@ -0,0 +1,171 @@
+import asyncio
+import uuid
+
+import pytest
+import pytest_asyncio
+
+import app.db.session as session_module
+import app.domains.vibes.events as events_module
+from app.domains.identity.cache import PROFILE_CHANGES_CHANNEL, ProfileCache
+from app.domains.vibes.events import VideoEventHub
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def redis_cache():
+    """
+    Factory for Redis-backed caches, each standing in for one process.
+    """
+    from app.core.redis import close_redis
+
+    yield lambda local_ttl=60: ProfileCache(maxsize=100, ttl=300, local_ttl=local_ttl, use_redis=True)
+    await close_redis()
+
+
+class Loader:
+    """
+    Loader returning the current `.payload` and counting its calls.
+    """
+
+    def __init__(self, payload: str):
+        self.payload = payload
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.payload
+
+
+async def test_local_entry_is_served_until_invalidated():
+    cache = ProfileCache(maxsize=100, ttl=300, local_ttl=60)
+    user_id = str(uuid.uuid4())
+    loader = Loader("v1")
+    assert await cache.get_or_load(user_id, 3, loader) == "v1"
+    loader.payload = "v2"
+    assert await cache.get_or_load(user_id, 3, loader) == "v1"
+    # Variants are cached separately
+    assert await cache.get_or_load(user_id, 0, loader) == "v2"
+
+    await cache.invalidate(user_id)
+    assert await cache.get_or_load(user_id, 3, loader) == "v2"
+    assert loader.calls == 3
+    assert (cache.local_hits, cache.loads, cache.invalidations) == (1, 3, 1)
+
+
+async def test_load_racing_an_invalidation_is_not_stored():
+    cache = ProfileCache(maxsize=100, ttl=300, local_ttl=60)
+    user_id = str(uuid.uuid4())
+    loading, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_loader():
+        loading.set()
+        await release.wait()
+        return "old"
+
+    load = asyncio.create_task(cache.get_or_load(user_id, 0, slow_loader))
+    await loading.wait()
+    cache.drop_local(user_id)
+    release.set()
+    assert await load == "old"
+    # The result read before the change is not served afterwards
+    assert await cache.get_or_load(user_id, 0, Loader("new")) == "new"
+
+
+@pytest.mark.redis
+async def test_version_bump_reaches_other_processes(redis_cache):
+    api, worker = redis_cache(local_ttl=0.2), redis_cache(local_ttl=0.2)
+    user_id = str(uuid.uuid4())
+    loader = Loader("v1")
+
+    assert await api.get_or_load(user_id, 0, loader) == "v1"
+    # Shared through Redis under the current version
+    assert await worker.get_or_load(user_id, 0, Loader("unused")) == "v1"
+    assert (api.loads, worker.redis_hits) == (1, 1)
+
+    loader.payload = "v2"
+    await worker.invalidate(user_id)
+    # Within local_ttl the entry is served without asking Redis
+    assert await api.get_or_load(user_id, 0, loader) == "v1"
+    await asyncio.sleep(0.25)
+    # Past it, the bumped version makes it stale
+    assert await api.get_or_load(user_id, 0, loader) == "v2"
+    assert (api.stale, api.loads) == (1, 2)
+
+    # An unchanged version only revalidates the entry
+    await asyncio.sleep(0.25)
+    assert await api.get_or_load(user_id, 0, loader) == "v2"
+    assert (api.revalidated, api.loads) == (1, 2)
+
+
+@pytest.mark.redis
+async def test_profile_change_message_drops_local_entry(redis_cache, monkeypatch):
+    cache = redis_cache(local_ttl=60)
+    monkeypatch.setattr(events_module, "profile_cache", cache)
+    hub = VideoEventHub(history=32, ttl=60, heartbeat=5, max_duration=10, max_connections=3, max_per_user=2)
+    user_id = str(uuid.uuid4())
+    loader = Loader("v1")
+    await cache.get_or_load(user_id, 0, loader)
+
+    # Another process committed a change and bumped the version
+    await redis_cache().invalidate(user_id)
+    loader.payload = "v2"
+    assert await cache.get_or_load(user_id, 0, loader) == "v1"
+
+    hub._dispatch(PROFILE_CHANGES_CHANNEL, user_id)
+    # Not served from the local tier again, however recent
+    assert await cache.get_or_load(user_id, 0, loader) == "v2"
+    assert (cache.local_hits, cache.loads) == (1, 2)
+
+
+async def test_marked_users_are_invalidated_after_commit(monkeypatch):
+    cache = ProfileCache(maxsize=100, ttl=300, local_ttl=60)
+    monkeypatch.setattr(session_module, "profile_cache", cache)
+    invalidated = []
+    committed = []
+
+    async def invalidate(*user_ids):
+        invalidated.append((set(user_ids), bool(committed)))
+
+    class Session:
+        def __init__(self):
+            self.info = {}
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            pass
+
+        async def commit(self):
+            committed.append(True)
+
+        async def rollback(self):
+            pass
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr(cache, "invalidate", invalidate)
+    monkeypatch.setattr(session_module, "AsyncSessionLocal", Session)
+    user_id, other_id = str(uuid.uuid4()), uuid.uuid4()
+
+    db_session = session_module.get_db()
+    db = await db_session.__anext__()
+    cache.mark(db, user_id, other_id, None)
+    cache.mark(db, user_id)
+    assert not invalidated
+    with pytest.raises(StopAsyncIteration):
+        await db_session.__anext__()
+    assert invalidated == [({user_id, str(other_id)}, True)]
+    assert "profile_cache_users" not in db.info
+
+    # A request that fails rolls back and invalidates nothing
+    committed.clear()
+    db_session = session_module.get_db()
+    db = await db_session.__anext__()
+    cache.mark(db, user_id)
+    with pytest.raises(RuntimeError):
+        await db_session.athrow(RuntimeError("request failed"))
+    assert not committed
+    assert len(invalidated) == 1
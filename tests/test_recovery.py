@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+import app.tasks.recovery as recovery
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.service import user_service
+from app.domains.outbox.models import OutboxMessage
+from app.domains.vibes.models import Video
+from app.tasks import vibes as vibe_tasks
+from app.tasks.recovery import StuckJobReaper
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.db]
+
+# fal.ai state per job id prefix; "boom" fails to answer
+JOB_STATES = {
+    "done": ("COMPLETED", "https://fal.media/out.mp4"),
+    "running": ("IN_PROGRESS", None),
+    "error": ("FAILED", None),
+    "novideo": ("COMPLETED", None),
+}
+
+
+async def fake_job_state(app_id: str, request_id: str):
+    state = request_id.split(":")[0]
+    if state == "boom":
+        raise RuntimeError("fal.ai returned 503")
+    return JOB_STATES[state]
+
+
+class Claimed(Exception):
+    pass
+
+
+async def test_reaper_resumes_redispatches_and_expires(make_user, monkeypatch):
+    monkeypatch.setattr(recovery, "fal_job_state", fake_job_state)
+    reaper = StuckJobReaper(model="fal-ai/test", stale_after=600, deadline=3600, batch_size=1000, concurrency=4)
+    user_id = make_user()
+    async with AsyncSessionLocal() as db:
+        await user_service.provision_user(db, user_id=user_id)
+
+    now = datetime.utcnow()
+    stale, expired, fresh = now - timedelta(minutes=20), now - timedelta(hours=2), now - timedelta(minutes=1)
+    cases = {
+        # name: (status, job state, created_at, updated_at)
+        "done": ("processing", "done", stale, stale),
+        "running": ("processing", "running", stale, stale),
+        "running_expired": ("processing", "running", expired, stale),
+        "error": ("processing", "error", stale, stale),
+        "novideo": ("processing", "novideo", stale, stale),
+        "boom": ("processing", "boom", stale, stale),
+        "pending_nojob": ("pending", None, stale, stale),
+        "processing_nojob": ("processing", None, stale, stale),
+        "nojob_expired": ("pending", None, expired, stale),
+        "fresh": ("pending", None, fresh, fresh),
+        "deleted": ("pending", None, stale, stale),
+    }
+    ids = {}
+    async with AsyncSessionLocal() as db:
+        for name, (status, job, created_at, updated_at) in cases.items():
+            video = Video(
+                user_id=user_id,
+                prompt=name,
+                status=status,
+                replicate_job_id=f"{job}:{name}:{user_id}" if job else None,
+                created_at=created_at,
+                updated_at=updated_at,
+                deleted_at=now if name == "deleted" else None,
+            )
+            db.add(video)
+            await db.flush()
+            ids[name] = video.id
+        await db.commit()
+
+    await reaper.run()
+
+    async with AsyncSessionLocal() as db:
+        videos = {video.id: video for video in await db.scalars(select(Video).where(Video.user_id == user_id))}
+        dispatched = {
+            message.args[0] for message in await db.scalars(
+                select(OutboxMessage).where(OutboxMessage.task_name == vibe_tasks.run_video_generation_task.name)
+            )
+        }
+    outcome = {name: (videos[video_id].status, videos[video_id].updated_at > now) for name, video_id in ids.items()}
+    assert outcome == {
+        "done": ("ready", True),
+        "running": ("processing", True),
+        "running_expired": ("failed", True),
+        "error": ("failed", True),
+        "novideo": ("failed", True),
+        # Checked again after another stale_after
+        "boom": ("processing", True),
+        "pending_nojob": ("pending", True),
+        "processing_nojob": ("pending", True),
+        "nojob_expired": ("failed", True),
+        "fresh": ("pending", False),
+        "deleted": ("pending", False),
+    }
+    assert videos[ids["done"]].video_url == "https://fal.media/out.mp4"
+    redispatched = {str(ids["pending_nojob"]), str(ids["processing_nojob"])}
+    assert {str(video_id) for video_id in ids.values()} & dispatched == redispatched
+
+    # The re-dispatched task can claim the video the dead run left in processing
+    async def claimed(db, video):
+        raise Claimed(video.status)
+
+    monkeypatch.setattr(vibe_tasks, "_commit_video", claimed)
+    with pytest.raises(Claimed) as excinfo:
+        await vibe_tasks._run_video_generation(str(ids["processing_nojob"]))
+    assert excinfo.value.args == ("processing",)
+
+    # Everything written is fresh again: a second pass leaves it alone
+    await reaper.run()
+    async with AsyncSessionLocal() as db:
+        statuses = {
+            video.id: video.status for video in await db.scalars(select(Video).where(Video.user_id == user_id))
+        }
+    assert {name: statuses[video_id] for name, video_id in ids.items()} == {
+        name: status for name, (status, _) in outcome.items()
+    }
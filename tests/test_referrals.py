@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select, update
+
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.models import UserProfile
+from app.domains.identity.service import user_service
+from app.domains.referrals.models import Referral
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.db]
+
+
+async def referred_user(make_user) -> tuple:
+    """
+    (referrer id, referee id), the referee signed up with the referrer's code.
+    """
+    referrer_id, referee_id = make_user(), make_user()
+    async with AsyncSessionLocal() as db:
+        referrer = await user_service.provision_user(db, user_id=referrer_id)
+    async with AsyncSessionLocal() as db:
+        await user_service.provision_user(db, user_id=referee_id, referred_by_code=referrer.profile.referral_code)
+    return referrer_id, referee_id
+
+
+async def referral(referee_id: str) -> Referral:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(Referral).where(Referral.referee_id == referee_id))
+
+
+async def profile(user_id: str) -> UserProfile:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(UserProfile).where(UserProfile.user_id == user_id))
+
+
+async def generate(api, user_id: str):
+    return await api.post("/api/v1/vibes/generate", json={"prompt": "referral"}, headers={"x-test-user": user_id})
+
+
+async def successful_referrals(api, user_id: str) -> int:
+    response = await api.get("/api/v1/referrals/me", headers={"x-test-user": user_id})
+    return response.json()["data"]["successful_referrals"]
+
+
+async def test_first_video_activates_the_referral(api, make_user):
+    referrer_id, referee_id = await referred_user(make_user)
+    pending = await referral(referee_id)
+    assert str(pending.referrer_id) == referrer_id
+    assert (pending.is_successful, pending.successful_at) == (False, None)
+    assert await successful_referrals(api, referrer_id) == 0
+
+    first = await generate(api, referee_id)
+    assert first.status_code == 200
+    activated = await referral(referee_id)
+    assert activated.is_successful
+    assert activated.successful_at is not None
+    assert await successful_referrals(api, referrer_id) == 1
+
+    # Deleting the video and making another does not activate it again
+    deleted = await api.delete(f"/api/v1/vibes/{first.json()['data']['id']}", headers={"x-test-user": referee_id})
+    assert deleted.status_code == 200
+    assert (await generate(api, referee_id)).status_code == 200
+    assert (await referral(referee_id)).successful_at == activated.successful_at
+    referee = await profile(referee_id)
+    assert (referee.videos_created, referee.storage_used) == (2, 1)
+    assert await successful_referrals(api, referrer_id) == 1
+
+
+async def test_parallel_first_videos_activate_once(api, make_user):
+    referrer_id, referee_id = await referred_user(make_user)
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(UserProfile).where(UserProfile.user_id == referee_id).values(storage_limit=5))
+        await db.commit()
+
+    responses = await asyncio.gather(*(generate(api, referee_id) for _ in range(8)))
+    assert sorted(response.status_code for response in responses) == [200] * 5 + [429] * 3
+    referee = await profile(referee_id)
+    assert (referee.videos_created, referee.storage_used) == (5, 5)
+    assert (await referral(referee_id)).is_successful
+    assert await successful_referrals(api, referrer_id) == 1
+
+
+async def test_rejected_generate_does_not_activate(api, make_user):
+    _, referee_id = await referred_user(make_user)
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(UserProfile).where(UserProfile.user_id == referee_id).values(storage_limit=0))
+        await db.commit()
+
+    assert (await generate(api, referee_id)).status_code == 429
+    assert not (await referral(referee_id)).is_successful
+    assert (await profile(referee_id)).videos_created == 0
+
+
+async def test_unreferred_users_generate_as_before(api, make_user):
+    user_id = make_user()
+    async with AsyncSessionLocal() as db:
+        await user_service.provision_user(db, user_id=user_id)
+    assert (await generate(api, user_id)).status_code == 200
+    assert await referral(user_id) is None
+    assert (await profile(user_id)).videos_created == 1
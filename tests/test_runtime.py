@@ -0,0 +1,152 @@
+import asyncio
+import gc
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.db.session import AsyncSessionLocal, engine
+from app.tasks.runtime import MemoryBudget, WorkerRuntime
+
+
+def test_stop_leaves_a_blocked_loop_running():
+    runtime = WorkerRuntime()
+    runtime.start()
+    release = threading.Event()
+    try:
+        # A callback that ignores shutdown, e.g. stuck in blocking I/O
+        runtime.loop.call_soon_threadsafe(release.wait, 5)
+        time.sleep(0.05)
+        loop, thread = runtime.loop, runtime._thread
+        runtime.stop(timeout=0.2)
+        assert not runtime.running
+        assert not loop.is_closed()
+    finally:
+        release.set()
+        AsyncSessionLocal.configure(bind=engine)
+
+    # Once unblocked the loop unwinds the cancelled shutdown and closes itself
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        thread.join(5)
+        gc.collect()
+    assert loop.is_closed()
+    assert not [w for w in caught if issubclass(w.category, (RuntimeWarning, ResourceWarning))]
+
+
+def test_stop_closes_an_idle_loop():
+    runtime = WorkerRuntime()
+    runtime.start()
+    try:
+        loop = runtime.loop
+        runtime.stop(timeout=5)
+        assert loop.is_closed()
+    finally:
+        AsyncSessionLocal.configure(bind=engine)
+
+
+def test_pool_threads_share_the_loop():
+    # What the threads pool does: each pool thread blocks on runtime.run
+    # while its job waits on I/O on the shared loop
+    runtime = WorkerRuntime()
+    runtime.start()
+    jobs, delay = 32, 0.2
+    try:
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(lambda i: runtime.run(asyncio.sleep(delay, i), name=f"job {i}"), range(jobs)))
+        elapsed = time.monotonic() - started
+        assert results == list(range(jobs))
+        assert runtime.completed == jobs
+        # One at a time this would take jobs * delay = 6.4s
+        assert elapsed < delay * 4
+    finally:
+        runtime.stop(timeout=5)
+        AsyncSessionLocal.configure(bind=engine)
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_bounds_concurrent_downloads():
+    budget = MemoryBudget(limit=30, max_holders=2)
+    holders = []
+
+    async def download(nbytes: int) -> None:
+        await budget.acquire(nbytes)
+        holders.append(budget.holders)
+        await asyncio.sleep(0.01)
+        await budget.release(nbytes)
+
+    await asyncio.gather(*(download(10) for _ in range(8)), download(100))
+    assert max(holders) == 2
+    # The oversized reservation still got through, alone
+    assert budget.peak == 100
+    assert budget.waits > 0
+    assert (budget.used, budget.holders) == (0, 0)
+
+
+@pytest.mark.db
+def test_tasks_reuse_the_loop_and_connections():
+    from sqlalchemy import text
+
+    from app.core.http import http_clients
+
+    runtime = WorkerRuntime()
+    runtime.start()
+
+    async def job():
+        async with AsyncSessionLocal() as db:
+            pid = await db.scalar(text("SELECT pg_backend_pid()"))
+        return asyncio.get_running_loop(), pid, http_clients.get("supabase")
+
+    try:
+        first, second = (runtime.run(job(), name="job") for _ in range(2))
+        assert AsyncSessionLocal.kw["bind"] is runtime.engine
+        # Same loop, same pooled DB connection and HTTP client
+        assert first[0] is second[0] is runtime.loop
+        assert first[1] == second[1]
+        assert first[2] is second[2]
+        assert runtime.engine.pool.checkedout() == 0
+    finally:
+        runtime.stop(timeout=5)
+        AsyncSessionLocal.configure(bind=engine)
+
+
+def test_errors_reach_the_caller():
+    runtime = WorkerRuntime()
+    runtime.start()
+
+    async def job():
+        raise ValueError("bad input")
+
+    try:
+        with pytest.raises(ValueError):
+            runtime.run(job(), name="failing")
+        assert runtime.run(asyncio.sleep(0, "ok")) == "ok"
+        assert runtime.completed == 2
+    finally:
+        runtime.stop(timeout=5)
+        AsyncSessionLocal.configure(bind=engine)
+
+
+def test_drain_requeues_jobs_still_running():
+    from celery.exceptions import Reject
+
+    runtime = WorkerRuntime()
+    runtime.start()
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            quick = pool.submit(runtime.run, asyncio.sleep(0.05, "done"), name="quick")
+            slow = pool.submit(runtime.run, asyncio.sleep(30), name="slow")
+            time.sleep(0.02)
+            runtime.drain(timeout=0.3)
+            assert quick.result(5) == "done"
+            with pytest.raises(Reject) as excinfo:
+                slow.result(5)
+        assert excinfo.value.requeue
+        assert runtime.requeued == 1
+        assert not runtime._active
+    finally:
+        runtime.stop(timeout=5)
+        AsyncSessionLocal.configure(bind=engine)
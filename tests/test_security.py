@@ -0,0 +1,206 @@
+import time
+
+import httpx
+import pytest
+
+from app.core import security
+from app.core.security import AuthUnavailable, SupabaseJWKS, TokenVerificationCache
+
+pytestmark = pytest.mark.asyncio
+
+USER = {"id": "6f1f9d1e-0000-4000-8000-000000000001", "email": "a@example.com", "role": "authenticated"}
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    """
+    Stubbed Supabase Auth: set `.response` to a status code, a JSON body or
+    an exception; `.calls` counts requests.
+    """
+    state = type("Supabase", (), {"response": 200, "calls": 0})()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state.calls += 1
+        if isinstance(state.response, Exception):
+            raise state.response
+        if state.response == 200:
+            return httpx.Response(200, json=USER)
+        return httpx.Response(state.response, json={"msg": "error"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://test.supabase.co")
+    monkeypatch.setattr(security.http_clients, "get", lambda name: client)
+    monkeypatch.setattr(security.settings, "SUPABASE_JWT_VERIFICATION", "remote")
+    return state
+
+
+@pytest.fixture
+def cache():
+    return TokenVerificationCache(maxsize=100, max_ttl=300, negative_ttl=60)
+
+
+async def test_valid_token(supabase, cache):
+    payload = await cache.verify("token")
+    assert payload.sub == USER["id"]
+
+
+@pytest.mark.parametrize("status", [401, 403])
+async def test_rejection_is_cached(supabase, cache, status):
+    supabase.response = status
+    assert await cache.verify("token") is None
+    assert await cache.verify("token") is None
+    assert supabase.calls == 1
+
+
+@pytest.mark.parametrize(
+    "response", [500, 502, 503, 429, httpx.ConnectTimeout("timed out"), httpx.ConnectError("refused")]
+)
+async def test_outage_is_not_cached(supabase, cache, response):
+    supabase.response = response
+    with pytest.raises(AuthUnavailable):
+        await cache.verify("token")
+    assert cache.rejections == 0
+
+    # Supabase is back: the token is verified again and accepted
+    supabase.response = 200
+    payload = await cache.verify("token")
+    assert payload.sub == USER["id"]
+    assert supabase.calls == 2
+
+
+async def test_outage_is_503(supabase, monkeypatch):
+    monkeypatch.setattr(security, "token_cache", TokenVerificationCache(maxsize=100, max_ttl=300, negative_ttl=60))
+    supabase.response = 503
+    with pytest.raises(security.HTTPException) as excinfo:
+        await security.get_current_user_id("token")
+    assert excinfo.value.status_code == 503
+
+
+def signing_key(algorithm: str, kid: str):
+    """
+    A fresh private key in PEM and its public half as a JWKS entry.
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+    from jose import jwk
+
+    if algorithm == "ES256":
+        private = ec.generate_private_key(ec.SECP256R1())
+    else:
+        private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public = private.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return pem, {**jwk.construct(public, algorithm).to_dict(), "kid": kid}
+
+
+def make_token(pem, algorithm: str, kid: str, **claims) -> str:
+    from jose import jwt
+
+    claims = {
+        "sub": USER["id"],
+        "email": USER["email"],
+        "aud": "authenticated",
+        "role": "authenticated",
+        "exp": int(time.time()) + 3600,
+        **claims,
+    }
+    return jwt.encode(claims, pem, algorithm=algorithm, headers={"kid": kid})
+
+
+@pytest.fixture
+def jwks(monkeypatch):
+    """
+    Stubbed Supabase project verifying locally: `.keys` is the published
+    JWKS, `.fetches` counts JWKS requests and `.remote` /auth/v1/user calls.
+    """
+    state = type("JWKS", (), {"keys": [], "fetches": 0, "remote": 0})()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/jwks.json"):
+            state.fetches += 1
+            return httpx.Response(200, json={"keys": state.keys})
+        state.remote += 1
+        return httpx.Response(200, json=USER)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://test.supabase.co")
+    monkeypatch.setattr(security.http_clients, "get", lambda name: client)
+    monkeypatch.setattr(security.settings, "SUPABASE_JWT_VERIFICATION", "local")
+    monkeypatch.setattr(security.settings, "SUPABASE_JWT_SECRET", None)
+    monkeypatch.setattr(security.settings, "SUPABASE_JWT_REMOTE_FALLBACK", True)
+    monkeypatch.setattr(
+        security,
+        "supabase_jwks",
+        SupabaseJWKS("https://test.supabase.co/auth/v1/.well-known/jwks.json", ttl=600, min_refresh_interval=0),
+    )
+    return state
+
+
+@pytest.mark.parametrize("algorithm", ["ES256", "RS256"])
+async def test_local_verification(jwks, algorithm):
+    pem, public = signing_key(algorithm, "k1")
+    jwks.keys = [public]
+    for _ in range(3):
+        payload = await security.verify_supabase_jwt(make_token(pem, algorithm, "k1"))
+        assert payload.sub == USER["id"]
+        assert payload.email == USER["email"]
+    assert jwks.fetches == 1
+    assert jwks.remote == 0
+
+
+async def test_unknown_kid_refetches_jwks(jwks):
+    old_pem, old_public = signing_key("ES256", "old")
+    new_pem, new_public = signing_key("ES256", "new")
+    jwks.keys = [old_public]
+    assert await security.verify_supabase_jwt(make_token(old_pem, "ES256", "old"))
+    assert jwks.fetches == 1
+
+    # Supabase rotates its signing key
+    jwks.keys = [old_public, new_public]
+    payload = await security.verify_supabase_jwt(make_token(new_pem, "ES256", "new"))
+    assert payload.sub == USER["id"]
+    assert jwks.fetches == 2
+    assert jwks.remote == 0
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [
+        {"exp": int(time.time()) - 3600},
+        {"aud": "someone-else"},
+        {"role": "anon"},
+        {"role": "service_role"},
+    ],
+)
+async def test_local_verification_rejects_claims(jwks, claims):
+    pem, public = signing_key("ES256", "k1")
+    jwks.keys = [public]
+    assert await security.verify_supabase_jwt(make_token(pem, "ES256", "k1", **claims)) is None
+    assert jwks.remote == 0
+
+
+async def test_local_verification_rejects_foreign_signature(jwks):
+    _, public = signing_key("ES256", "k1")
+    forged, _ = signing_key("ES256", "k1")
+    jwks.keys = [public]
+    assert await security.verify_supabase_jwt(make_token(forged, "ES256", "k1")) is None
+
+
+async def test_hs256_without_secret_falls_back_to_remote(jwks, monkeypatch):
+    token = make_token("legacy-secret", "HS256", "k1")
+    payload = await security.verify_supabase_jwt(token)
+    assert payload.sub == USER["id"]
+    assert jwks.remote == 1
+
+    # Checked locally once the secret is configured
+    monkeypatch.setattr(security.settings, "SUPABASE_JWT_SECRET", "legacy-secret")
+    assert (await security.verify_supabase_jwt(token)).sub == USER["id"]
+    assert jwks.remote == 1
+
+
+async def test_hs256_without_secret_or_fallback_is_rejected(jwks, monkeypatch):
+    monkeypatch.setattr(security.settings, "SUPABASE_JWT_REMOTE_FALLBACK", False)
+    assert await security.verify_supabase_jwt(make_token("legacy-secret", "HS256", "k1")) is None
+    assert jwks.remote == 0
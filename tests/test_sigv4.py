@@ -0,0 +1,106 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import boto3
+import botocore.auth
+import pytest
+from botocore.config import Config
+
+from app.core.sigv4 import SigV4Presigner
+
+ACCESS_KEY = "0051a2b3c4d5e6f0000000001"
+SECRET_KEY = "K005abcdefghijklmnopqrstuvwxyz0123456"
+REGION = "us-west-004"
+BUCKET = "vibe-bucket"
+SIGNING_TIME = datetime(2026, 3, 9, 23, 59, 58)
+
+ENDPOINTS = [
+    "https://s3.us-west-004.backblazeb2.com",
+    "http://127.0.0.1:9000",
+    "https://s3.example.com:443",
+]
+
+KEYS = [
+    "vibe_outputs/3f1c2a9e-video.mp4",
+    "users/u1/uploads/My Holiday (final) v2.mp4",
+    "users/u1/uploads/naïve café 🎉.mov",
+    "users/u1/uploads/日本語/ファイル.mp4",
+    "users/u1/uploads/a+b=c&d;e,f@g$h!i'j*k.mp4",
+    "users/u1/uploads/tilde~percent%20hash#question?.mp4",
+    "users/u1/uploads//double//slash/",
+]
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def utcnow(cls):
+        return SIGNING_TIME
+
+
+@pytest.fixture(autouse=True)
+def frozen_botocore_clock(monkeypatch):
+    monkeypatch.setattr(botocore.auth, "datetime", SimpleNamespace(datetime=_FrozenDatetime))
+
+
+def _clients(endpoint):
+    s3 = boto3.client(
+        "s3",
+        endpoint_url=endpoint,
+        aws_access_key_id=ACCESS_KEY,
+        aws_secret_access_key=SECRET_KEY,
+        config=Config(signature_version="s3v4"),
+        region_name=REGION,
+    )
+    presigner = SigV4Presigner(
+        access_key=ACCESS_KEY, secret_key=SECRET_KEY, region=REGION, endpoint=endpoint, bucket=BUCKET
+    )
+    return s3, presigner
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+@pytest.mark.parametrize("key", KEYS)
+def test_get_matches_boto3(endpoint, key):
+    s3, presigner = _clients(endpoint)
+    expected = s3.generate_presigned_url(
+        "get_object", Params={"Bucket": BUCKET, "Key": key}, ExpiresIn=900
+    )
+    assert presigner.presign_get(key, 900, signing_time=SIGNING_TIME) == expected
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+@pytest.mark.parametrize("key", KEYS)
+def test_put_matches_boto3(endpoint, key):
+    s3, presigner = _clients(endpoint)
+    expected = s3.generate_presigned_url(
+        "put_object", Params={"Bucket": BUCKET, "Key": key, "ContentType": "video/mp4"}, ExpiresIn=3600
+    )
+    assert presigner.presign_put(key, "video/mp4", 3600, signing_time=SIGNING_TIME) == expected
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+@pytest.mark.parametrize("key", KEYS)
+def test_upload_part_matches_boto3(endpoint, key):
+    s3, presigner = _clients(endpoint)
+    upload_id = "4_z1a2b3c4d5e6f_f2000000000000001_d20260309_m235958_c004_v0402001_t0001_u01700000000000"
+    expected = s3.generate_presigned_url(
+        "upload_part",
+        Params={"Bucket": BUCKET, "Key": key, "UploadId": upload_id, "PartNumber": 17},
+        ExpiresIn=3600,
+    )
+    url = presigner.presign(
+        "PUT", key, 3600, params=[("uploadId", upload_id), ("partNumber", 17)], signing_time=SIGNING_TIME
+    )
+    assert url == expected
+
+
+def test_presign_many_matches_single():
+    _, presigner = _clients(ENDPOINTS[0])
+    many = presigner.presign_get_many(KEYS, 600, signing_time=SIGNING_TIME)
+    assert many == [presigner.presign_get(key, 600, signing_time=SIGNING_TIME) for key in KEYS]
+
+
+def test_signing_key_cache_is_bounded():
+    _, presigner = _clients(ENDPOINTS[0])
+    for day in range(1, 10):
+        presigner.signing_key(f"202603{day:02d}")
+    assert len(presigner._signing_keys) <= 4
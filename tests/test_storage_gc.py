@@ -0,0 +1,204 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, func, select, update
+
+import app.tasks.storage as storage_tasks
+from app.core.storage import AsyncStorageService, StorageService
+from app.core.storage.base import LocalURLSigner
+from app.core.storage.memory import MemoryBackend
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.models import UserProfile
+from app.domains.identity.service import user_service
+from app.domains.outbox.models import OutboxMessage
+from app.domains.vibes.models import StorageDeletion, Video
+from app.tasks.storage import StorageCollector, collect_storage_task
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.db]
+
+FOREIGN_URL = "https://fal.media/files/out.mp4"
+
+
+class FlakyBackend(MemoryBackend):
+    """
+    Memory backend whose deletes of keys in `.failing` fail.
+    """
+
+    def __init__(self):
+        super().__init__(LocalURLSigner("http://test/api/v1/storage/local", "gc"))
+        self.failing = set()
+        self.delete_calls = []
+
+    def delete_many(self, keys):
+        self.delete_calls.append(list(keys))
+        return [key for key in keys if key in self.failing] + super().delete_many(
+            [key for key in keys if key not in self.failing]
+        )
+
+
+@pytest_asyncio.fixture
+async def storage(db_engine, monkeypatch):
+    """
+    The collector's storage, backed by a FlakyBackend; swept orphan rows and
+    GC tasks queued during the test are removed afterwards.
+    """
+    backend = FlakyBackend()
+    service = StorageService(backend)
+    async_service = AsyncStorageService(service, max_concurrency=2)
+    monkeypatch.setattr(storage_tasks, "storage_service", service)
+    monkeypatch.setattr(storage_tasks, "async_storage_service", async_service)
+    monkeypatch.setattr(storage_tasks, "storage_object_key", backend.object_key)
+    started = datetime.utcnow()
+    yield backend
+    async_service.shutdown()
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(StorageDeletion).where(StorageDeletion.url.startswith(backend.signer.base_url)))
+        await db.execute(delete(OutboxMessage).where(
+            OutboxMessage.task_name == collect_storage_task.name, OutboxMessage.created_at >= started
+        ))
+        await db.commit()
+
+
+def collector(**kwargs) -> StorageCollector:
+    options = dict(batch_size=2, max_attempts=3, retry_base=60, retry_max=600, purge_delay=0)
+    return StorageCollector(**{**options, **kwargs})
+
+
+async def stored_video(make_user, backend: FlakyBackend, name: str) -> Video:
+    """
+    A ready video whose file and thumbnail are in the backend.
+    """
+    user_id = make_user()
+    async with AsyncSessionLocal() as db:
+        await user_service.provision_user(db, user_id=user_id)
+        await db.execute(update(UserProfile).where(UserProfile.user_id == user_id).values(storage_used=1))
+        for key in (f"users/{user_id}/{name}.mp4", f"users/{user_id}/{name}.jpg"):
+            backend.put_object(b"data", key, "application/octet-stream")
+        video = Video(
+            user_id=user_id,
+            prompt="gc",
+            status="ready",
+            video_url=backend.file_url(f"users/{user_id}/{name}.mp4"),
+            thumbnail_url=backend.file_url(f"users/{user_id}/{name}.jpg"),
+        )
+        db.add(video)
+        await db.commit()
+    return video
+
+
+async def queued(video_id) -> list:
+    async with AsyncSessionLocal() as db:
+        return (await db.scalars(
+            select(StorageDeletion).where(StorageDeletion.video_id == video_id).order_by(StorageDeletion.url)
+        )).all()
+
+
+async def test_delete_soft_deletes_and_queues_files(api, storage, make_user):
+    video = await stored_video(make_user, storage, "clip")
+    headers = {"x-test-user": str(video.user_id)}
+    async with AsyncSessionLocal() as db:
+        gc_tasks = await db.scalar(
+            select(func.count()).select_from(OutboxMessage).where(OutboxMessage.task_name == collect_storage_task.name)
+        )
+
+    assert (await api.delete(f"/api/v1/vibes/{video.id}", headers=headers)).status_code == 200
+
+    async with AsyncSessionLocal() as db:
+        row = await db.get(Video, video.id)
+        profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == video.user_id))
+        assert await db.scalar(
+            select(func.count()).select_from(OutboxMessage).where(OutboxMessage.task_name == collect_storage_task.name)
+        ) == gc_tasks + 1
+    assert row.deleted_at is not None
+    assert profile.storage_used == 0
+    assert sorted(deletion.url for deletion in await queued(video.id)) == sorted([video.thumbnail_url, video.video_url])
+    # Files stay until the collector runs
+    assert len(storage.list_keys(f"users/{video.user_id}/")) == 2
+
+    assert (await api.get(f"/api/v1/vibes/{video.id}", headers=headers)).status_code == 404
+    assert (await api.get("/api/v1/vibes", headers=headers)).json()["data"]["items"] == []
+    # Deleting it again neither releases nor queues anything
+    assert (await api.delete(f"/api/v1/vibes/{video.id}", headers=headers)).status_code == 404
+    assert len(await queued(video.id)) == 2
+
+
+async def test_collector_deletes_files_then_purges(api, storage, make_user):
+    videos = [await stored_video(make_user, storage, f"clip{i}") for i in range(2)]
+    for video in videos:
+        response = await api.delete(f"/api/v1/vibes/{video.id}", headers={"x-test-user": str(video.user_id)})
+        assert response.status_code == 200
+    async with AsyncSessionLocal() as db:
+        db.add(StorageDeletion(url=FOREIGN_URL, video_id=videos[0].id, next_attempt_at=datetime.utcnow()))
+        await db.commit()
+
+    gc = collector()
+    result = await gc.collect()
+    assert result["batches"] >= 3
+    assert result["purged"] >= 2
+    for video in videos:
+        assert storage.list_keys(f"users/{video.user_id}/") == []
+        assert await queued(video.id) == []
+        async with AsyncSessionLocal() as db:
+            assert await db.get(Video, video.id) is None
+    # Batched deletes, and the foreign URL never reached the store
+    assert all(len(keys) <= 2 for keys in storage.delete_calls)
+    assert FOREIGN_URL not in sum(storage.delete_calls, [])
+    assert gc.deleted >= 5
+
+
+async def test_failed_deletes_back_off_then_dead_letter(storage, make_user):
+    video = await stored_video(make_user, storage, "stuck")
+    key = storage.object_key(video.video_url)
+    storage.failing.add(key)
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Video).where(Video.id == video.id).values(deleted_at=datetime.utcnow()))
+        db.add_all([
+            StorageDeletion(url=url, video_id=video.id, next_attempt_at=datetime.utcnow())
+            for url in (video.video_url, video.thumbnail_url)
+        ])
+        await db.commit()
+
+    gc = collector(max_attempts=2)
+    await gc.collect()
+    [row] = await queued(video.id)
+    assert (row.url, row.attempts, row.dead_at) == (video.video_url, 1, None)
+    assert row.last_error == "DeleteObjects reported an error"
+    assert row.next_attempt_at > datetime.utcnow() + timedelta(seconds=50)
+    # Still pending: the video row is kept
+    async with AsyncSessionLocal() as db:
+        assert await db.get(Video, video.id) is not None
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(StorageDeletion).where(StorageDeletion.id == row.id).values(
+            next_attempt_at=datetime.utcnow()
+        ))
+        await db.commit()
+    await gc.collect()
+    [row] = await queued(video.id)
+    assert row.attempts == 2
+    assert row.dead_at is not None
+    assert (gc.retried, gc.dead) == (1, 1)
+    # A dead letter no longer holds back the purge
+    async with AsyncSessionLocal() as db:
+        assert await db.get(Video, video.id) is None
+    assert [listed for listed, _ in storage.list_keys(f"users/{video.user_id}/")] == [key]
+
+
+async def test_sweep_queues_unreferenced_objects(storage, make_user):
+    video = await stored_video(make_user, storage, "kept")
+    prefix = f"users/{video.user_id}/"
+    storage.put_object(b"orphan", f"{prefix}orphan.mp4", "video/mp4")
+
+    gc = collector(batch_size=1)
+    # Too recent: may belong to a video row not written yet
+    assert await gc.sweep([prefix], min_age=3600) == 0
+    assert await gc.sweep([prefix], min_age=-60) == 1
+    async with AsyncSessionLocal() as db:
+        urls = (await db.scalars(select(StorageDeletion.url).where(StorageDeletion.url.startswith(
+            storage.file_url(prefix)
+        )))).all()
+    assert urls == [storage.file_url(f"{prefix}orphan.mp4")]
+
+    await gc.collect()
+    assert [key for key, _ in storage.list_keys(prefix)] == sorted([f"{prefix}kept.jpg", f"{prefix}kept.mp4"])
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.storage import AsyncStorageService, StorageService
+from app.core.storage.base import LocalURLSigner
+from app.core.storage.memory import MemoryBackend
+
+pytestmark = pytest.mark.asyncio
+
+CALLS = 64
+LATENCY = 0.05
+
+
+class SlowBackend(MemoryBackend):
+    """
+    Memory backend whose writes block for LATENCY, like a round trip to the
+    object store; records the peak number of writes running at once.
+    """
+
+    def __init__(self):
+        super().__init__(LocalURLSigner("http://test/storage", "load"))
+        self.running = 0
+        self.peak = 0
+        self.counter = threading.Lock()
+
+    def put_object(self, body: bytes, key: str, content_type: str) -> None:
+        if body == b"fail":
+            raise RuntimeError("upload failed")
+        with self.counter:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(LATENCY)
+            super().put_object(body, key, content_type)
+        finally:
+            with self.counter:
+                self.running -= 1
+
+
+async def max_loop_lag(stop: asyncio.Event) -> float:
+    """
+    Longest the event loop took to wake a 10ms sleep beyond those 10ms.
+    """
+    lag = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lag = max(lag, time.perf_counter() - started - 0.01)
+    return lag
+
+
+async def test_transfers_are_bounded_and_off_the_loop():
+    backend = SlowBackend()
+    service = AsyncStorageService(StorageService(backend), max_concurrency=4)
+    stop = asyncio.Event()
+    lag = asyncio.create_task(max_loop_lag(stop))
+
+    started = time.perf_counter()
+    urls = await asyncio.gather(*(
+        service.put_object(b"x" * 1024, f"users/load/{i}.bin", "application/octet-stream") for i in range(CALLS)
+    ))
+    elapsed = time.perf_counter() - started
+    stop.set()
+
+    assert urls == [backend.file_url(f"users/load/{i}.bin") for i in range(CALLS)]
+    assert backend.peak == 4
+    # 16 rounds of 4 parallel writes
+    assert CALLS / 4 * LATENCY <= elapsed < CALLS * LATENCY / 2
+    # The loop kept running while every write blocked its thread
+    assert await lag < LATENCY
+    assert (service.completed, service.failed, service.in_flight) == (CALLS, 0, 0)
+    service.shutdown()
+
+
+async def test_failures_are_counted_and_raised():
+    service = AsyncStorageService(StorageService(SlowBackend()), max_concurrency=2)
+    results = await asyncio.gather(
+        *(service.put_object(b"fail" if i % 4 == 0 else b"ok", f"k{i}", "text/plain") for i in range(8)),
+        return_exceptions=True,
+    )
+    assert sum(isinstance(result, RuntimeError) for result in results) == 2
+    assert (service.completed, service.failed, service.in_flight) == (6, 2, 0)
+    service.shutdown()
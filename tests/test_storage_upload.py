@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+import uuid
+
+import pytest
+from moto import mock_aws
+
+import app.api.v1.storage as storage_api
+from app.core.config import settings
+from app.core.storage import AsyncStorageService, MultipartUploadWriter, StorageService
+from app.core.storage.s3 import S3Backend
+
+pytestmark = pytest.mark.asyncio
+
+MiB = 1024 * 1024
+BUCKET = "uploads"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """
+    AsyncStorageService over a moto S3 bucket, also behind /storage.
+    """
+    with mock_aws():
+        backend = S3Backend(
+            key_id="test",
+            application_key="test",
+            endpoint="https://s3.us-east-1.amazonaws.com",
+            bucket=BUCKET,
+            region="us-east-1",
+        )
+        backend.s3.create_bucket(Bucket=BUCKET)
+        service = AsyncStorageService(StorageService(backend), max_concurrency=8)
+        monkeypatch.setattr(storage_api, "async_storage_service", service)
+        yield service
+        service.shutdown()
+
+
+def stored(service: AsyncStorageService, key: str) -> bytes:
+    return service.storage.backend.s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+
+def open_uploads(service: AsyncStorageService) -> list:
+    return service.storage.backend.s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", [])
+
+
+def writer(service: AsyncStorageService, key: str, max_parallel_parts: int = 2) -> MultipartUploadWriter:
+    return MultipartUploadWriter(
+        service, key, "video/mp4", part_size=5 * MiB, max_parallel_parts=max_parallel_parts
+    )
+
+
+def body(size: int) -> bytes:
+    return (bytes(range(251)) * (size // 251 + 1))[:size]
+
+
+async def test_streamed_multipart_upload(s3):
+    data = body(12 * MiB + 17)
+    upload = writer(s3, "clips/a.mp4")
+    async with upload:
+        for offset in range(0, len(data), MiB // 3):
+            await upload.write(data[offset:offset + MiB // 3])
+        url = await upload.complete()
+
+    assert url == s3.storage.file_url("clips/a.mp4")
+    assert stored(s3, "clips/a.mp4") == data
+    head = s3.storage.backend.s3.head_object(Bucket=BUCKET, Key="clips/a.mp4")
+    assert head["ETag"].endswith('-3"')
+    assert upload.bytes_written == len(data)
+    assert not open_uploads(s3)
+
+
+async def test_small_body_is_a_single_put(s3):
+    upload = writer(s3, "clips/small.mp4")
+    await upload.write(b"tiny")
+    await upload.complete()
+    assert upload.upload_id is None
+    assert stored(s3, "clips/small.mp4") == b"tiny"
+
+
+async def test_failure_aborts_the_upload(s3):
+    with pytest.raises(RuntimeError):
+        async with writer(s3, "clips/broken.mp4") as upload:
+            await upload.write(body(11 * MiB))
+            raise RuntimeError("client went away")
+    assert upload.upload_id is not None
+    assert not open_uploads(s3)
+    assert not s3.storage.backend.s3.list_objects_v2(Bucket=BUCKET).get("Contents")
+
+
+async def test_parallel_parts_are_bounded(s3, monkeypatch):
+    in_flight, peak, lock = 0, 0, threading.Lock()
+    upload_part = s3.storage.upload_part
+
+    def slow_upload_part(*args):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        try:
+            time.sleep(0.1)
+            return upload_part(*args)
+        finally:
+            with lock:
+                in_flight -= 1
+
+    monkeypatch.setattr(s3.storage, "upload_part", slow_upload_part)
+    data = body(40 * MiB)
+    upload = writer(s3, "clips/big.mp4", max_parallel_parts=3)
+    for offset in range(0, len(data), MiB):
+        await upload.write(data[offset:offset + MiB])
+        # Never more than the part being filled plus the uploading ones
+        assert len(upload._buffer) < upload.part_size
+    await upload.complete()
+
+    assert peak == 3
+    assert stored(s3, "clips/big.mp4") == data
+
+
+async def test_stream_endpoint(api, s3):
+    user_id = str(uuid.uuid4())
+    data = body(6 * MiB)
+    response = await api.post(
+        "/api/v1/storage/upload/stream",
+        params={"filename": "clip..final.mp4"},
+        content=data,
+        headers={"x-test-user": user_id, "content-type": "video/mp4"},
+    )
+    assert response.status_code == 200
+    assert response.json()["data"]["size"] == len(data)
+    assert stored(s3, f"users/{user_id}/uploads/clip..final.mp4") == data
+
+    for filename in ("../escape.mp4", "nested/../../escape.mp4", ".."):
+        response = await api.post(
+            "/api/v1/storage/upload/stream",
+            params={"filename": filename},
+            content=b"x",
+            headers={"x-test-user": user_id},
+        )
+        assert response.status_code == 403
+
+
+async def test_stream_endpoint_aborts_on_disconnect(api, s3, monkeypatch):
+    from app.main import app
+
+    monkeypatch.setattr(settings, "STORAGE_STREAM_PART_SIZE", 5 * MiB)
+    aborted = []
+    abort = s3.storage.abort_multipart_upload
+
+    def track_abort(object_name, upload_id):
+        aborted.append(object_name)
+        abort(object_name, upload_id)
+
+    monkeypatch.setattr(s3.storage, "abort_multipart_upload", track_abort)
+    user_id = str(uuid.uuid4())
+    # Enough for one part to be uploading when the client goes away
+    incoming = [{"type": "http.request", "body": body(MiB), "more_body": True} for _ in range(7)]
+    incoming.append({"type": "http.disconnect"})
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(0)
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/v1/storage/upload/stream",
+        "raw_path": b"/api/v1/storage/upload/stream",
+        "query_string": b"filename=clip.mp4",
+        "root_path": "",
+        "headers": [(b"host", b"test"), (b"x-test-user", user_id.encode()), (b"content-type", b"video/mp4")],
+        "server": ("test", 80),
+        "client": ("127.0.0.1", 1234),
+    }
+    await app(scope, receive, send)
+
+    assert sent[0]["status"] == 400
+    assert aborted == [f"users/{user_id}/uploads/clip.mp4"]
+    assert not open_uploads(s3)
+    assert not s3.storage.backend.s3.list_objects_v2(Bucket=BUCKET).get("Contents")
@@ -0,0 +1,109 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import select, text
+
+from app.core.security import webhook_token
+from app.db.session import AsyncSessionLocal
+from app.domains.identity.service import user_service
+from app.domains.vibes.models import Video
+from app.domains.vibes.service import vibe_service
+from app.schemas.vibes import WebhookData
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.db]
+
+VIDEO_URL = "https://fal.media/out.mp4"
+
+
+async def make_video(make_user, replicate_job_id=None, status="processing") -> Video:
+    user_id = make_user()
+    async with AsyncSessionLocal() as db:
+        await user_service.provision_user(db, user_id=user_id)
+        video = Video(user_id=user_id, prompt="p", status=status, replicate_job_id=replicate_job_id)
+        db.add(video)
+        await db.commit()
+    return video
+
+
+async def stored(video_id) -> Video:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(Video).where(Video.id == video_id))
+
+
+def completion(request_id: str, ok: bool = True) -> dict:
+    if ok:
+        return {"request_id": request_id, "status": "OK", "payload": {"video": {"url": VIDEO_URL}}}
+    return {"request_id": request_id, "status": "ERROR", "error": "content policy"}
+
+
+async def post(api, video_id, body: dict, token: str = None):
+    params = {"video_id": str(video_id), "token": token or webhook_token(str(video_id))}
+    return await api.post("/api/v1/vibes/webhook", params=params, json=body)
+
+
+async def test_webhook_completes_the_video_once(api, make_user):
+    request_id = f"req-{uuid.uuid4()}"
+    video = await make_video(make_user, replicate_job_id=request_id)
+
+    assert (await post(api, video.id, completion(request_id))).status_code == 200
+    row = await stored(video.id)
+    assert (row.status, row.video_url) == ("ready", VIDEO_URL)
+
+    # A redelivery, even with another outcome, is dropped
+    assert (await post(api, video.id, completion(request_id, ok=False))).status_code == 200
+    assert (await stored(video.id)).status == "ready"
+
+
+async def test_webhook_rejects_bad_tokens(api, make_user):
+    request_id = f"req-{uuid.uuid4()}"
+    video = await make_video(make_user, replicate_job_id=request_id)
+    other = await make_video(make_user)
+
+    # A token for another video, or none at all
+    assert (await post(api, video.id, completion(request_id), token=webhook_token(str(other.id)))).status_code == 401
+    assert (await post(api, video.id, completion(request_id), token="x")).status_code == 401
+    assert (await stored(video.id)).status == "processing"
+
+
+async def test_webhook_for_another_job_is_ignored(make_user):
+    video = await make_video(make_user, replicate_job_id=f"req-{uuid.uuid4()}")
+    async with AsyncSessionLocal() as db:
+        applied = await vibe_service.process_webhook(
+            db, video_id=video.id, data=WebhookData(**completion(f"req-{uuid.uuid4()}"))
+        )
+    assert not applied
+    assert (await stored(video.id)).status == "processing"
+
+
+async def test_webhook_can_beat_the_worker(make_user):
+    # fal.ai answered before the worker committed the request id
+    request_id = f"req-{uuid.uuid4()}"
+    video = await make_video(make_user, status="pending")
+    async with AsyncSessionLocal() as db:
+        assert await vibe_service.process_webhook(db, video_id=video.id, data=WebhookData(**completion(request_id)))
+    row = await stored(video.id)
+    assert (row.status, row.replicate_job_id) == ("ready", request_id)
+
+
+async def test_concurrent_deliveries_apply_once(make_user):
+    request_id = f"req-{uuid.uuid4()}"
+    video = await make_video(make_user, replicate_job_id=request_id)
+
+    async def deliver(ok: bool) -> bool:
+        async with AsyncSessionLocal() as db:
+            return await vibe_service.process_webhook(
+                db, video_id=video.id, data=WebhookData(**completion(request_id, ok=ok))
+            )
+
+    applied = await asyncio.gather(*(deliver(ok=i % 2 == 0) for i in range(8)))
+    assert applied.count(True) == 1
+    assert (await stored(video.id)).status in ("ready", "failed")
+
+
+async def test_job_id_index_is_unique_and_valid(db_engine):
+    async with AsyncSessionLocal() as db:
+        index = (await db.execute(text(
+            "SELECT indisunique, indisvalid FROM pg_index WHERE indexrelid = to_regclass('ix_video_replicate_job_id')"
+        ))).one()
+    assert tuple(index) == (True, True)